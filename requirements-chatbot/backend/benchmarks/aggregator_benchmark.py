@@ -0,0 +1,108 @@
+"""
+Benchmark of the aggregation of streamed model calls by the Gemini wrapper.
+
+The wrapper sees LangChain AIMessageChunks. Each traced streamed call feeds
+its chunks one by one to a GeminiStreamAggregator, compared here with merging
+them with `+` (how LangChain combines chunks) and with collecting them in a
+list and aggregating them at the end (the previous wrapper).
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.aggregator_benchmark
+"""
+import argparse
+import time
+from typing import Any, Callable, Dict, List
+
+from langchain_core.messages import AIMessageChunk
+
+from src.gemini_langsmith_wrapper import GeminiStreamAggregator, gemini_aggregator
+
+
+def build_chunks(count: int, tool_calls: int) -> List[AIMessageChunk]:
+    """A streamed response of `count` text chunks followed by tool call fragments and usage."""
+    chunks = [
+        AIMessageChunk(content=f"token{index} ", response_metadata={"model_name": "gemini-2.5-flash"} if index == 0 else {})
+        for index in range(count)
+    ]
+    for call in range(tool_calls):
+        chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+            {"name": "tavily_search", "id": f"call-{call}", "args": '{"query": "EARS ', "index": call}
+        ]))
+        chunks.append(AIMessageChunk(content="", tool_call_chunks=[
+            {"name": None, "id": None, "args": f'notation {call}"}}', "index": call}
+        ]))
+    chunks.append(AIMessageChunk(
+        content="",
+        usage_metadata={"input_tokens": 1200, "output_tokens": count, "total_tokens": 1200 + count},
+        response_metadata={"finish_reason": "STOP"},
+    ))
+    return chunks
+
+
+def merge(chunks: List[AIMessageChunk]) -> AIMessageChunk:
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged = merged + chunk
+    return merged
+
+
+def collect(chunks: List[AIMessageChunk]) -> Any:
+    collected = []
+    for chunk in chunks:
+        collected.append(chunk)
+    return gemini_aggregator(collected)
+
+
+def incremental(chunks: List[AIMessageChunk]) -> Any:
+    aggregator = GeminiStreamAggregator()
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator.result()
+
+
+def best_times(functions: Dict[str, Callable[[], Any]], rounds: int) -> Dict[str, float]:
+    """Best time of each function, run interleaved so they see the same machine state."""
+    best = {name: float("inf") for name in functions}
+    for _ in range(rounds):
+        for name, function in functions.items():
+            started = time.perf_counter()
+            function()
+            best[name] = min(best[name], time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[200, 1000, 5000])
+    parser.add_argument("--tool-calls", type=int, default=2)
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'merge ms':>9} {'collect ms':>11} {'incremental ms':>15} {'vs merge':>9} {'vs collect':>11}")
+    for count in args.chunks:
+        chunks = build_chunks(count, args.tool_calls)
+        times = best_times(
+            {
+                "merge": lambda: merge(chunks),
+                "collect": lambda: collect(chunks),
+                "incremental": lambda: incremental(chunks),
+            },
+            args.rounds,
+        )
+        print(
+            f"{count:>8} {times['merge'] * 1000:>9.2f} {times['collect'] * 1000:>11.2f} "
+            f"{times['incremental'] * 1000:>15.2f} {times['merge'] / times['incremental']:>8.1f}x "
+            f"{times['collect'] / times['incremental']:>10.2f}x"
+        )
+
+    aggregated = incremental(build_chunks(10, args.tool_calls))
+    merged = merge(build_chunks(10, args.tool_calls))
+    print(
+        f"\ntool calls: incremental {[call['args'] for call in aggregated.tool_calls]}, "
+        f"merge {[call['args'] for call in merged.tool_calls]}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Offline stand-ins for Gemini and Tavily, used by the benchmarks.
+"""
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import BaseTool, StructuredTool
+
+
+class FakeGeminiChatModel(BaseChatModel):
+    """Chat model with Gemini-like timing: `latency` seconds to the first token,
+    then `tokens_per_second` for the remaining `response_tokens` tokens.
+
+    When the last message is a user turn, a share `tool_rate` of the requests
+    (chosen by a hash of the message, so it is stable across runs) first
+    answer with a `tavily_search` tool call, followed by `tool_call_tokens`
+    tokens of text.
+    """
+
+    latency: float = 0.3
+    tokens_per_second: float = 200.0
+    response_tokens: int = 120
+    tool_rate: float = 0.0
+    tool_call_tokens: int = 0
+    # Tokens per streamed chunk; Gemini streams a few tokens at a time
+    tokens_per_chunk: int = 4
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeGeminiChatModel":
+        return self
+
+    def _wants_tool_call(self, messages: List[BaseMessage]) -> bool:
+        if not self.tool_rate or not messages or not isinstance(messages[-1], HumanMessage):
+            return False
+        digest = hashlib.sha256(str(messages[-1].content).encode("utf-8")).digest()
+        return digest[0] / 256 < self.tool_rate
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        if self._wants_tool_call(messages):
+            tool_call = AIMessageChunk(
+                content="",
+                tool_call_chunks=[{
+                    "name": "tavily_search",
+                    "args": json.dumps({"query": str(messages[-1].content)[:80]}),
+                    "id": str(uuid.uuid4()),
+                    "index": 0,
+                }],
+            )
+            return [tool_call, *self._text_chunks(messages, self.tool_call_tokens)]
+        return self._text_chunks(messages, self.response_tokens)
+
+    def _text_chunks(self, messages: List[BaseMessage], tokens: int) -> List[AIMessageChunk]:
+        if not tokens:
+            return []
+        words = [f"word{index} " for index in range(tokens)]
+        chunks = [
+            AIMessageChunk(content="".join(words[start:start + self.tokens_per_chunk]))
+            for start in range(0, len(words), self.tokens_per_chunk)
+        ]
+        input_tokens = sum(len(str(message.content)) for message in messages) // 4
+        chunks[-1].usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": tokens,
+            "total_tokens": input_tokens + tokens,
+        }
+        return chunks
+
+    def _delays(self, count: int) -> Iterator[float]:
+        yield self.latency
+        for _ in range(count - 1):
+            yield self.tokens_per_chunk / self.tokens_per_second
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        chunks = self._chunks(messages)
+        for chunk, delay in zip(chunks, self._delays(len(chunks))):
+            time.sleep(delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        chunks = self._chunks(messages)
+        for chunk, delay in zip(chunks, self._delays(len(chunks))):
+            # Token callbacks are sent by BaseChatModel for each yielded chunk
+            await asyncio.sleep(delay)
+            yield ChatGenerationChunk(message=chunk)
+
+    @staticmethod
+    def _result(chunks: List[ChatGenerationChunk]) -> ChatResult:
+        message = chunks[0].message
+        for chunk in chunks[1:]:
+            message = message + chunk.message
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(
+            content=message.content,
+            tool_calls=message.tool_calls,
+            usage_metadata=message.usage_metadata,
+            id=str(uuid.uuid4()),
+        ))])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._result(list(self._stream(messages, stop, None, **kwargs)))
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self._result([chunk async for chunk in self._astream(messages, stop, None, **kwargs)])
+
+
+def fake_tavily_search(latency: float = 0.5) -> BaseTool:
+    """Local stub with the name and result shape of `TavilySearch`."""
+
+    def result(query: str) -> str:
+        return json.dumps({
+            "query": query,
+            "results": [{
+                "title": f"Result for {query}",
+                "url": "https://example.com/result",
+                "content": "EARS notation keeps acceptance criteria testable. " * 8,
+                "score": 0.9,
+            }],
+            "response_time": latency,
+        })
+
+    def search(query: str) -> str:
+        time.sleep(latency)
+        return result(query)
+
+    async def asearch(query: str) -> str:
+        await asyncio.sleep(latency)
+        return result(query)
+
+    return StructuredTool.from_function(
+        func=search,
+        coroutine=asearch,
+        name="tavily_search",
+        description="A search engine optimized for comprehensive, accurate, and trusted results.",
+    )
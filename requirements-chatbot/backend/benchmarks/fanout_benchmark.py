@@ -0,0 +1,91 @@
+"""
+Time to write a long document in one model call against writing its sections
+in parallel (`write_document`), per DOCUMENT_FANOUT_CONCURRENCY.
+
+Uses FakeGeminiChatModel timing: every call waits `--latency` seconds, then
+decodes at `--tokens-per-second`. Reports the time to the first streamed part
+of the document (token or section) and to the complete document on /chat/stream.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.fanout_benchmark --sections 8 --concurrency 0 2 4 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import List
+
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage
+
+from benchmarks.fakes import FakeGeminiChatModel
+from benchmarks.load_benchmark import configure_environment
+
+
+class OutlineModel(FakeGeminiChatModel):
+    """Answers with a `write_document` outline of `sections` sections, or with the whole
+    document when `fan_out` is off; each section is `response_tokens` tokens."""
+
+    sections: int = 8
+    fan_out: bool = True
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and str(last.content).startswith("Write section"):
+            return self._text_chunks(messages, self.response_tokens)
+        if not self.fan_out:
+            return self._text_chunks(messages, self.response_tokens * self.sections)
+        outline = [{"title": f"Task group {index}", "brief": "Tasks of one component"} for index in range(self.sections)]
+        return [AIMessageChunk(
+            content="",
+            tool_call_chunks=[{
+                "name": "write_document",
+                "args": json.dumps({"title": "Implementation plan", "sections": outline}),
+                "id": str(uuid.uuid4()),
+                "index": 0,
+            }],
+        )]
+
+
+async def measure(args: argparse.Namespace, concurrency: int) -> tuple:
+    from src.agent import ChatStreamRequest, LangGraphChatbot
+
+    os.environ["DOCUMENT_FANOUT_CONCURRENCY"] = str(concurrency)
+    model = OutlineModel(
+        latency=args.latency,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.section_tokens,
+        sections=args.sections,
+        fan_out=concurrency > 0,
+    )
+    bot = LangGraphChatbot(chat_model=model, tools=[])
+    started = time.perf_counter()
+    first = None
+    async for event in bot.stream_events(ChatStreamRequest(message="Write the implementation plan")):
+        # With fan-out the first token event is the write_document tool result, not document text
+        if first is None and event["type"] == ("section" if model.fan_out else "token"):
+            first = time.perf_counter() - started
+    return first, time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sections", type=int, default=8)
+    parser.add_argument("--section-tokens", type=int, default=300, help="tokens per section")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[0, 2, 4, 8], help="0 writes in one call")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds to the first token of a call")
+    parser.add_argument("--tokens-per-second", type=float, default=150.0)
+    args = parser.parse_args()
+    configure_environment()
+    os.environ.setdefault("CONTEXT_TOKEN_BUDGET", "0")
+
+    print(f"{'concurrency':>11} {'first part s':>12} {'document s':>10}")
+    for concurrency in args.concurrency:
+        first, total = asyncio.run(measure(args, concurrency))
+        print(f"{concurrency or 'single':>11} {first:>12.2f} {total:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
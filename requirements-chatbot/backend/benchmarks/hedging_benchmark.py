@@ -0,0 +1,97 @@
+"""
+Tail latency of /chat-style turns with and without LLM_HEDGING.
+
+The model is a FakeGeminiChatModel whose first token takes `--latency`
+seconds, except for a random share `--stall-rate` of the attempts, which
+stall for `--stall-seconds` first. Each attempt draws independently, so a
+hedge of a stalled call usually answers in time. Turns are sent to
+LangGraphChatbot.chat, `--concurrency` at a time.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.hedging_benchmark --turns 400 --stall-rate 0.03
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+from benchmarks.fakes import FakeGeminiChatModel
+from benchmarks.load_benchmark import configure_environment, percentile
+
+
+class StallingModel(FakeGeminiChatModel):
+    """Stalls a random share `stall_rate` of the calls for `stall_seconds` before the first token."""
+
+    stall_rate: float = 0.03
+    stall_seconds: float = 5.0
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if random.random() < self.stall_rate:
+            await asyncio.sleep(self.stall_seconds)
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+
+
+async def run(args: argparse.Namespace, hedging: bool) -> tuple:
+    from src.agent import ChatRequest, LangGraphChatbot
+
+    os.environ["LLM_HEDGING"] = "true" if hedging else "false"
+    random.seed(args.seed)
+    model = StallingModel(
+        latency=args.latency,
+        response_tokens=40,
+        stall_rate=args.stall_rate,
+        stall_seconds=args.stall_seconds,
+    )
+    bot = LangGraphChatbot(chat_model=model, tools=[])
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+
+    async def turn(index: int) -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            await bot.chat(ChatRequest(message=f"Turn {index}", bypass_cache=True))
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(turn(index) for index in range(args.turns)))
+    return latencies, bot.hedger.stats() if bot.hedger else None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.3, help="usual seconds to the first token")
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-seconds", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    configure_environment()
+    os.environ.setdefault("CONTEXT_TOKEN_BUDGET", "0")
+
+    print(f"{'hedging':<8} {'p50 s':>6} {'p95 s':>6} {'p99 s':>6} {'max s':>6} {'hedges':>7} {'won':>5} {'extra load':>10}")
+    for hedging in (False, True):
+        latencies, stats = asyncio.run(run(args, hedging))
+        fired = stats["fired"] if stats else 0
+        print(
+            f"{'on' if hedging else 'off':<8} {percentile(latencies, 0.5):>6.2f} {percentile(latencies, 0.95):>6.2f} "
+            f"{percentile(latencies, 0.99):>6.2f} {max(latencies):>6.2f} {fired:>7} "
+            f"{stats['won'] if stats else 0:>5} {fired / args.turns:>10.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Offline load and latency benchmark of the FastAPI app.
+
+Runs the real app from `main.py` and the real LangGraphChatbot graph in a
+local uvicorn server. Gemini is replaced by FakeGeminiChatModel (configurable
+latency and token rate) and TavilySearch by a local stub, so no API quota is
+used. Reports requests per second, p50/p95/p99 latency and, for
+/chat/stream, time to first token, per endpoint, concurrency level and
+history length.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.load_benchmark --concurrency 1 8 32 --history 0 20
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+def configure_environment() -> None:
+    """Settings for an offline run; must be applied before `main` is imported."""
+    defaults = {
+        "GOOGLE_API_KEY": "offline",
+        "TAVILY_API_KEY": "offline",
+        "LANGSMITH_TRACING": "false",
+        "PROMPT_CONTEXT_CACHE": "none",
+        "CHATBOT_WARMUP": "eager",
+        "TOOL_CACHE": "false",
+        "LLM_CACHE": "false",
+        "ADMISSION_MAX_CONCURRENCY": "1024",
+        "ADMISSION_MAX_QUEUE": "1024",
+        "EAGER_TOOL_CALLS": "true",
+        "ATTACHMENT_STORE_PATH": os.path.join(tempfile.gettempdir(), "chatbot-benchmark-attachments"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+
+def build_history(turns: int) -> List[Dict[str, str]]:
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"Turn {turn}: " + "please refine the requirements. " * 10})
+        history.append({"role": "assistant", "content": "Here is the refined requirements section. " * 30})
+    return history
+
+
+def start_server(app: Any) -> str:
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run_request(client: Any, endpoint: str, payload: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    started = time.perf_counter()
+    if endpoint != "/chat/stream":
+        response = await client.post(endpoint, json=payload)
+        response.raise_for_status()
+        return {"latency": time.perf_counter() - started, "ttft": None}
+    ttft = None
+    async with client.stream("POST", endpoint, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if ttft is None and line.startswith("data: ") and json.loads(line[6:]).get("type") == "token":
+                ttft = time.perf_counter() - started
+    return {"latency": time.perf_counter() - started, "ttft": ttft}
+
+
+async def run_scenario(
+    base_url: str, endpoint: str, concurrency: int, history_turns: int, requests: int
+) -> Dict[str, Any]:
+    import httpx
+
+    history = build_history(history_turns)
+    results: List[Dict[str, Optional[float]]] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient) -> None:
+        nonlocal errors
+        for index in counter:
+            payload = {
+                "message": f"Request {index}: gather requirements for feature {index}",
+                "conversation_history": history,
+            }
+            try:
+                results.append(await run_request(client, endpoint, payload))
+            except httpx.HTTPError:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [result["latency"] for result in results]
+    ttfts = [result["ttft"] for result in results if result["ttft"] is not None]
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "history": history_turns,
+        "requests": len(results),
+        "errors": errors,
+        "rps": len(results) / elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "ttft_p50": percentile(ttfts, 0.5) if ttfts else None,
+        "ttft_p95": percentile(ttfts, 0.95) if ttfts else None,
+    }
+
+
+def format_row(row: Dict[str, Any]) -> str:
+    def ms(value: Optional[float]) -> str:
+        return f"{value * 1000:>8.0f}" if value is not None else f"{'-':>8}"
+
+    return (
+        f"{row['endpoint']:<13} {row['concurrency']:>5} {row['history']:>7} {row['requests']:>6} {row['errors']:>4} "
+        f"{row['rps']:>8.1f} {ms(row['p50'])} {ms(row['p95'])} {ms(row['p99'])} "
+        f"{ms(row['ttft_p50'])} {ms(row['ttft_p95'])}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--endpoints", nargs="+", default=["/chat", "/chat/stream", "/chat/sync"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 20], help="conversation turns sent along")
+    parser.add_argument("--requests", type=int, default=64, help="requests per scenario (at least 2x concurrency)")
+    parser.add_argument("--latency-ms", type=float, default=300, help="fake Gemini time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--response-tokens", type=int, default=120)
+    parser.add_argument("--tool-rate", type=float, default=0.3, help="share of turns starting with a search")
+    parser.add_argument("--tool-latency-ms", type=float, default=500, help="fake Tavily latency")
+    parser.add_argument("--tool-call-tokens", type=int, default=0, help="text tokens streamed after a tool call")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    configure_environment()
+    import main as app_main
+    from src.agent import LangGraphChatbot
+    from src.startup import LazyInstance
+    from benchmarks.fakes import FakeGeminiChatModel, fake_tavily_search
+
+    chat_model = FakeGeminiChatModel(
+        latency=args.latency_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        tool_rate=args.tool_rate,
+        tool_call_tokens=args.tool_call_tokens,
+    )
+    search = fake_tavily_search(args.tool_latency_ms / 1000)
+    app_main.chatbot = LazyInstance(
+        lambda timer: LangGraphChatbot(chat_model=chat_model, tools=[search], timer=timer),
+        app_main.startup_timer,
+    )
+    base_url = start_server(app_main.app)
+
+    print(
+        f"fake Gemini: {args.latency_ms:.0f} ms to first token, {args.tokens_per_second:.0f} tokens/s, "
+        f"{args.response_tokens} tokens; tool rate {args.tool_rate} ({args.tool_call_tokens} tokens after the call), "
+        f"Tavily {args.tool_latency_ms:.0f} ms, eager tool calls {os.environ['EAGER_TOOL_CALLS']}\n"
+    )
+    print(
+        f"{'endpoint':<13} {'conc':>5} {'history':>7} {'reqs':>6} {'err':>4} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft50':>8} {'ttft95':>8}"
+    )
+    rows = []
+    for endpoint in args.endpoints:
+        for history_turns in args.history:
+            for concurrency in args.concurrency:
+                requests = max(args.requests, concurrency * 2)
+                row = asyncio.run(run_scenario(base_url, endpoint, concurrency, history_turns, requests))
+                rows.append(row)
+                print(format_row(row), flush=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
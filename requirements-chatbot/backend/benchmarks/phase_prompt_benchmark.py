@@ -0,0 +1,39 @@
+"""
+System prompt size per model call: the "single" workflow, which sends every
+prompt file, against each node of the "phased" workflow, which sends the
+core guide, its own prompt and the artifacts it works from.
+
+Token counts are estimated at 4 characters per token. Artifacts are stand-in
+documents of `--artifact-chars` characters each.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.phase_prompt_benchmark
+"""
+import argparse
+
+from src.planning import PHASE_ORDER, PHASES, artifacts_message
+from src.prompts import DEFAULT_SYSTEM_PROMPTS, PromptRegistry
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--artifact-chars", type=int, default=6000, help="size of each approved document")
+    args = parser.parse_args()
+
+    prompts = PromptRegistry()
+    artifacts = {phase: "x" * args.artifact_chars for phase in PHASE_ORDER}
+    single = len(prompts.system_prefix(DEFAULT_SYSTEM_PROMPTS)[0])
+
+    print(f"{'node':<14} {'prompt chars':>12} {'artifact chars':>14} {'~tokens':>8} {'vs single':>9}")
+    print(f"{'single':<14} {single:>12} {0:>14} {single // 4:>8} {1:>9.2f}")
+    for phase in PHASE_ORDER:
+        prefix = len(prompts.system_prefix(PHASES[phase].prompts)[0])
+        message = artifacts_message(phase, artifacts)
+        artifact_chars = len(message.content) if message is not None else 0
+        total = prefix + artifact_chars
+        print(f"{phase:<14} {prefix:>12} {artifact_chars:>14} {total // 4:>8} {total / single:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
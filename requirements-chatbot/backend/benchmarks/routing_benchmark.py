@@ -0,0 +1,88 @@
+"""
+Latency and estimated cost of a conversation mix per MODEL_ROUTING mode.
+
+The strong and fast models are FakeGeminiChatModel instances with their own
+timing; a share `--fast-failure-rate` of the fast model's answers are empty,
+so "auto" escalates them to the strong model. Costs use the Gemini prices of
+MODEL and FAST_MODEL. Turns are sent to LangGraphChatbot.chat one at a time.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.routing_benchmark --turns 30 --modes strong auto
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from typing import List
+
+from langchain_core.messages import AIMessageChunk, BaseMessage
+
+from benchmarks.fakes import FakeGeminiChatModel
+from benchmarks.load_benchmark import configure_environment, percentile
+
+SIMPLE_TURNS = ["yes, continue", "looks good", "ok", "thanks!", "sounds right to me", "go on"]
+COMPLEX_TURNS = [
+    "Write the design document for the export service",
+    "Please rewrite requirement 3 so it covers offline mode",
+    "Generate the implementation plan for the login flow",
+]
+
+
+class FlakyModel(FakeGeminiChatModel):
+    """Answers a stable share `failure_rate` of the conversations with an empty message."""
+
+    failure_rate: float = 0.0
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        digest = hashlib.sha256(str(messages[-1].content).encode("utf-8")).digest()
+        if digest[1] / 256 < self.failure_rate:
+            return [AIMessageChunk(content="")]
+        return super()._chunks(messages)
+
+
+async def run(args: argparse.Namespace, mode: str) -> tuple:
+    from src.agent import ChatRequest, LangGraphChatbot
+
+    strong = FakeGeminiChatModel(latency=args.strong_latency, tokens_per_second=150, response_tokens=200)
+    fast = FlakyModel(
+        latency=args.fast_latency, tokens_per_second=400, response_tokens=200, failure_rate=args.fast_failure_rate
+    )
+    os.environ["MODEL_ROUTING"] = mode
+    bot = LangGraphChatbot(chat_model=strong, fast_chat_model=fast, tools=[])
+    turns = [*SIMPLE_TURNS * 3, *COMPLEX_TURNS * 2]
+    latencies = []
+    for index in range(args.turns):
+        message = f"{turns[index % len(turns)]} ({index})"
+        started = time.perf_counter()
+        await bot.chat(ChatRequest(message=message, bypass_cache=True))
+        latencies.append(time.perf_counter() - started)
+    return latencies, bot.router.stats()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--modes", nargs="+", default=["strong", "auto", "fast"])
+    parser.add_argument("--strong-latency", type=float, default=0.6, help="seconds to the first token")
+    parser.add_argument("--fast-latency", type=float, default=0.25, help="seconds to the first token")
+    parser.add_argument("--fast-failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+    configure_environment()
+    os.environ.setdefault("CONTEXT_TOKEN_BUDGET", "0")
+
+    print(f"{'mode':<7} {'p50 s':>6} {'p95 s':>6} {'fast calls':>10} {'strong calls':>12} {'escalations':>11} {'cost $':>9}")
+    for mode in args.modes:
+        latencies, stats = asyncio.run(run(args, mode))
+        routes = stats["routes"]
+        cost = sum(route["cost_usd"] for route in routes.values())
+        print(
+            f"{mode:<7} {percentile(latencies, 0.5):>6.2f} {percentile(latencies, 0.95):>6.2f} "
+            f"{routes['fast']['calls']:>10} {routes['strong']['calls']:>12} "
+            f"{sum(stats['escalations'].values()):>11} {cost:>9.5f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Micro-benchmark of the type-dispatched serializer against the former
+reflective `_serialize_value` chain, on graph "updates" payloads.
+
+The new serializer also emits tool calls, ToolMessage IDs and nested
+additional_kwargs, which the legacy chain dropped. Timings alternate between
+the two and keep the fastest of many rounds, so a busy machine skews both
+alike.
+
+Run from the backend directory:
+
+    poetry run python -m benchmarks.serializer_benchmark
+"""
+import argparse
+import datetime
+import json
+import timeit
+import uuid
+from typing import Any, Dict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.serializer import serialize
+
+
+def legacy_serialize_value(value: Any) -> Any:
+    """The reflective if/elif chain `LangGraphChatbot._serialize_value` used before."""
+    if value is None:
+        return None
+    elif isinstance(value, (str, int, float, bool)):
+        return value
+    elif hasattr(value, '__class__') and 'Message' in value.__class__.__name__:
+        return {
+            "type": value.__class__.__name__,
+            "content": getattr(value, 'content', ''),
+            "role": getattr(value, 'type', 'unknown'),
+            "additional_kwargs": getattr(value, 'additional_kwargs', {}),
+            "id": getattr(value, 'id', None)
+        }
+    elif isinstance(value, (list, tuple)):
+        return [legacy_serialize_value(item) for item in value]
+    elif isinstance(value, dict):
+        return {k: legacy_serialize_value(v) for k, v in value.items()}
+    elif isinstance(value, set):
+        return list(value)
+    elif hasattr(value, 'isoformat'):
+        return value.isoformat()
+    elif hasattr(value, 'hex'):
+        return str(value)
+    elif hasattr(value, '__dict__'):
+        try:
+            return {
+                "type": value.__class__.__name__,
+                "data": legacy_serialize_value(value.__dict__)
+            }
+        except:
+            return str(value)
+    elif callable(value):
+        return f"<function: {getattr(value, '__name__', str(value))}>"
+    else:
+        try:
+            return str(value)
+        except Exception:
+            return f"<non-serializable: {type(value).__name__}>"
+
+
+def build_payloads(turns: int) -> Dict[str, Any]:
+    """Realistic "updates" chunks: a chatbot turn with tool calls and the tools node result."""
+    search_results = {
+        "query": "best practices for requirements documents",
+        "results": [
+            {
+                "title": "Writing good requirements",
+                "url": "https://example.com/requirements",
+                "content": "EARS notation keeps acceptance criteria testable. " * 8,
+                "score": 0.91,
+            }
+        ],
+        "response_time": 1.23,
+    }
+    history = []
+    for turn in range(turns):
+        history.append(HumanMessage(content=f"Question {turn}: " + "please refine the design. " * 10))
+        history.append(AIMessage(content="Here is the refined section. " * 30, id=str(uuid.uuid4())))
+    tool_call_id = str(uuid.uuid4())
+    return {
+        "chatbot": {
+            "messages": [
+                AIMessage(
+                    content="",
+                    tool_calls=[{"name": "tavily_search", "args": {"query": "EARS notation"}, "id": tool_call_id}],
+                    id=str(uuid.uuid4()),
+                )
+            ],
+            "summary": "The user is planning a task tracker.",
+            "summary_upto": 0,
+        },
+        "tools": {
+            "messages": [
+                ToolMessage(
+                    content=json.dumps(search_results),
+                    name="tavily_search",
+                    tool_call_id=tool_call_id,
+                )
+            ],
+        },
+        "values": {
+            "messages": history,
+            "created_at": datetime.datetime.now(),
+            "run_id": uuid.uuid4(),
+            "tags": {"requirements", "design"},
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--turns", type=int, default=20, help="conversation turns in the values payload")
+    parser.add_argument("--repeat", type=int, default=40)
+    parser.add_argument("--number", type=int, default=1000)
+    args = parser.parse_args()
+
+    payloads = build_payloads(args.turns)
+    # Make sure both produce JSON-encodable output before timing them
+    json.dumps(serialize(payloads))
+    json.dumps(legacy_serialize_value(payloads), default=str)
+
+    print(f"{'payload':<10} {'legacy ops/s':>14} {'dispatch ops/s':>16} {'speedup':>9}")
+    for name in ("chatbot", "tools", "values"):
+        payload = payloads[name]
+        legacy = dispatch = float("inf")
+        for _ in range(args.repeat):
+            legacy = min(legacy, timeit.timeit(lambda: legacy_serialize_value(payload), number=args.number))
+            dispatch = min(dispatch, timeit.timeit(lambda: serialize(payload), number=args.number))
+        print(
+            f"{name:<10} {args.number / legacy:>14,.0f} {args.number / dispatch:>16,.0f} "
+            f"{legacy / dispatch:>8.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,51 @@
-from fastapi import FastAPI
-from src.agent import LangGraphChatbot, ChatRequest, ChatResponse, ChatStreamRequest
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from src.agent import LangGraphChatbot, BatchChatRequest, ChatRequest, ChatResponse, ChatStreamRequest
+from src.admission import AdmissionRejected, Slot, create_admission_controller
+from src.attachments import Attachment, AttachmentTooLarge, UnknownAttachment
+from src.metrics import REGISTRY
+from src.sse import cancel_on_disconnect
+from src.startup import LazyInstance, StartupTimer
 from dotenv import load_dotenv
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv()
 
+startup_timer = StartupTimer()
+startup_timer.phases["app_import"] = time.perf_counter() - _import_started
+
+# The chatbot (provider SDKs, clients, compiled graphs) is built on first use or by
+# the warmup at startup, so the server accepts connections right away
+chatbot = LazyInstance(lambda timer: LangGraphChatbot(timer=timer), startup_timer)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # "background" (default): build after startup, "eager": before serving, "lazy": on first request
+    warmup = os.getenv("CHATBOT_WARMUP", "background")
+    task = None
+    if warmup == "eager":
+        await chatbot.warmup()
+    elif warmup == "background":
+        task = asyncio.create_task(chatbot.warmup())
+    yield
+    if task is not None:
+        task.cancel()
+
+
 # FastAPI application
-app = FastAPI(title="LangGraph Chatbot API")
+app = FastAPI(title="LangGraph Chatbot API", lifespan=lifespan)
 
 # Allow all cors
 app.add_middleware(
@@ -18,19 +56,64 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize the chatbot
-chatbot = LangGraphChatbot()
+# Bounds the requests running in the graph; excess requests queue briefly, then get a 429
+admission = create_admission_controller()
+
+requests_in_flight = REGISTRY.gauge(
+    "chatbot_requests_in_flight", "Admitted requests holding a slot.", ["endpoint"]
+)
+requests_queued = REGISTRY.gauge(
+    "chatbot_requests_queued", "Requests waiting for admission.", ["endpoint"]
+)
+client_disconnects = REGISTRY.counter(
+    "chatbot_client_disconnects_total", "Streaming responses cancelled before completion.", ["endpoint"]
+)
+
+
+async def wait_for_disconnect(http_request: Request) -> None:
+    """Return once the client of a streaming response has disconnected."""
+    while (await http_request.receive())["type"] != "http.disconnect":
+        pass
+
+
+def streamed(
+    http_request: Request, endpoint: str, slot: Optional[Slot], iterator: AsyncIterator[Any]
+) -> AsyncIterator[Any]:
+    """Response body holding an admission slot (if any), with the run cancelled on client disconnect."""
+    return cancel_on_disconnect(
+        admission.hold(slot, iterator) if slot is not None else iterator,
+        wait_for_disconnect(http_request),
+        lambda: client_disconnects.inc(endpoint=endpoint),
+    )
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(UnknownAttachment)
+async def unknown_attachment_handler(request: Request, exc: UnknownAttachment):
+    return JSONResponse(status_code=400, content={"detail": f"Unknown attachment: {exc.args[0]}"})
+
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     """
     Async Chat endpoint that processes user messages and returns bot responses.
     """
-    return await chatbot.chat(request)
+    bot = await chatbot.aget()
+    bot.check_attachments(request)
+    async with await admission.acquire("chat"):
+        return await bot.chat(request)
 
 
 @app.post("/chat/stream")
-async def chat_stream_endpoint(request: ChatStreamRequest):
+async def chat_stream_endpoint(request: ChatStreamRequest, http_request: Request):
     """
     Streaming chat endpoint that returns Server-Sent Events (SSE).
     
@@ -38,30 +121,57 @@ async def chat_stream_endpoint(request: ChatStreamRequest):
     - "messages": Stream LLM tokens as they're generated
     - "updates": Stream node execution updates
     - "values": Stream full state after each node
+    - "deltas": Stream state changes since the previous frame, with periodic snapshots
     """
+    bot = await chatbot.aget()
+    bot.check_attachments(request)
+    slot = await admission.acquire("stream")
     return StreamingResponse(
-        chatbot.stream_chat(request),
-        media_type="text/plain",
+        streamed(http_request, "stream", slot, bot.stream_chat(request)),
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
             "Access-Control-Allow-Origin": "*",
-        }
+            # Keep reverse proxies (nginx) from buffering the stream
+            "X-Accel-Buffering": "no",
+        },
+        # Also frees the slot when the stream never started
+        background=BackgroundTask(slot.release),
+    )
+
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: BatchChatRequest, http_request: Request):
+    """
+    Batch chat endpoint that streams one NDJSON result per request as it finishes.
+
+    Each request of the batch is admitted on its own, so a batch counts as many
+    requests as it runs at the same time.
+    """
+    bot = await chatbot.aget()
+    return StreamingResponse(
+        streamed(http_request, "batch", None, bot.chat_batch(request, admission)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
     )
 
 
 @app.post("/chat/sync", response_model=ChatResponse)
-def chat_sync_endpoint(request: ChatRequest):
+async def chat_sync_endpoint(request: ChatRequest):
     """
     Synchronous chat endpoint for simpler use cases.
     """
-    return chatbot.chat_sync(request)
+    bot = await chatbot.aget()
+    bot.check_attachments(request)
+    async with await admission.acquire("sync"):
+        return await run_in_threadpool(bot.chat_sync, request)
 
 
 @app.get("/health")
 def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return {"status": "healthy", "ready": chatbot.ready}
 
     """Serve a simple demo page for testing the streaming chat."""
     return """
@@ -90,6 +200,7 @@ def health_check():
                     <option value="messages">Messages (LLM Tokens)</option>
                     <option value="updates">Updates (Node Progress)</option>
                     <option value="values">Values (Full State)</option>
+                    <option value="deltas">Deltas (State Changes)</option>
                 </select>
             </label>
         </div>
@@ -165,7 +276,7 @@ def health_check():
                                     if (data.type === 'token') {
                                         currentResponse += data.content;
                                         streamingDiv.textContent = currentResponse;
-                                    } else if (data.type === 'update' || data.type === 'values') {
+                                    } else if (data.type === 'update' || data.type === 'values' || data.type === 'snapshot' || data.type === 'delta') {
                                         streamingDiv.textContent = JSON.stringify(data.content, null, 2);
                                     } else if (data.type === 'done') {
                                         // Convert streaming div to assistant message
@@ -199,6 +310,111 @@ def health_check():
     </body>
     </html>
     """
+
+
+@app.get("/store/stats")
+def store_stats():
+    """Conversation store size and thread lookup hit/miss counters."""
+    return chatbot.get().store.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and sizes of the response caches."""
+    bot = chatbot.get()
+    tool_cache = bot.tool_node.cache
+    return {
+        "tools": tool_cache.stats() if tool_cache else None,
+        "llm": bot.llm_cache.stats() if bot.llm_cache else None,
+        "context": bot.context_cache.stats() if bot.context_cache else None,
+    }
+
+
+@app.get("/context/stats")
+def context_stats():
+    """Context window budget, summarizations and tokens saved."""
+    context_window = chatbot.get().context_window
+    return context_window.stats() if context_window else None
+
+
+@app.get("/routing/stats")
+def routing_stats():
+    """Model calls, time and estimated cost per route, and escalations to the strong model."""
+    return chatbot.get().router.stats()
+
+
+@app.get("/hedging/stats")
+def hedging_stats():
+    """Hedged model calls: calls seen, hedges fired and won, and the remaining hedge budget."""
+    hedger = chatbot.get().hedger
+    return hedger.stats() if hedger else None
+
+
+@app.post("/attachments", response_model=Attachment)
+async def upload_attachment(request: Request):
+    """
+    Store the raw request body as an attachment; its Content-Type is the attachment's type.
+    
+    Returns the attachment ID (sha256 of the content) to send in `attachments`.
+    """
+    store = (await chatbot.aget()).attachments
+    mime_type = request.headers.get("content-type", "application/octet-stream").split(";")[0].strip()
+    try:
+        return await store.asave(request.stream(), mime_type)
+    except AttachmentTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+
+@app.get("/attachments/{attachment_id}")
+async def get_attachment(attachment_id: str):
+    """Serve a stored attachment straight from disk."""
+    store = (await chatbot.aget()).attachments
+    attachment = store.get(attachment_id)
+    if attachment is None:
+        raise HTTPException(status_code=404, detail=f"Unknown attachment: {attachment_id}")
+    return FileResponse(store.path(attachment_id), media_type=attachment.mime_type)
+
+
+@app.get("/startup")
+def startup_report():
+    """Startup time broken down by import, client construction and graph compile."""
+    return chatbot.report()
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    """Requests in flight and queued, rejections and queue wait times."""
+    return admission.stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Prometheus metrics: graph node, tool and model latencies, tokens and in-flight requests."""
+    stats = admission.stats()
+    requests_in_flight.set(stats["in_flight"], endpoint="all")
+    requests_queued.set(stats["queued"], endpoint="all")
+    for endpoint, endpoint_stats in stats["endpoints"].items():
+        requests_in_flight.set(endpoint_stats["in_flight"], endpoint=endpoint)
+        requests_queued.set(endpoint_stats["queued"], endpoint=endpoint)
+    return PlainTextResponse(REGISTRY.render(), media_type=REGISTRY.CONTENT_TYPE)
+
+
+@app.get("/chat/threads/{thread_id}/snapshot")
+async def thread_snapshot(thread_id: str):
+    """Full thread state, to resynchronize a "deltas" stream client."""
+    snapshot = await (await chatbot.aget()).thread_snapshot(thread_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"Unknown thread: {thread_id}")
+    return snapshot
+
+
+@app.delete("/chat/threads/{thread_id}")
+def delete_thread(thread_id: str):
+    """Drop the server-side state of a conversation thread."""
+    chatbot.get().store.delete(thread_id)
+    return {"thread_id": thread_id, "deleted": True}
+
+
 # Example usage
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,208 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """The request was not admitted; clients should retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int) -> None:
+        super().__init__(f"Server busy ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Endpoint:
+    def __init__(self, limit: Optional[int]) -> None:
+        self.limit = limit
+        self.semaphore = asyncio.Semaphore(limit) if limit else None
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+
+
+class Slot:
+    """An admitted request; `release` frees its place and may be called more than once."""
+
+    def __init__(self, controller: "AdmissionController", endpoint: str) -> None:
+        self._controller = controller
+        self._endpoint = endpoint
+        self._admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(self._endpoint, time.monotonic() - self._admitted_at)
+
+    async def __aenter__(self) -> "Slot":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Bounds the requests running in the LangGraph engine.
+
+    A request needs a place under its endpoint's limit (if any) and under the
+    global limit. When none is free it waits in a bounded queue for at most
+    `queue_timeout` seconds. It is rejected right away when the queue is full,
+    or when its wait deadline passes, with an estimated `retry_after` based on
+    recent service times.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 32,
+        max_queue: int = 64,
+        queue_timeout: float = 10.0,
+        endpoint_limits: Optional[Dict[str, int]] = None,
+        wait_window: int = 1024,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.endpoint_limits = dict(endpoint_limits or {})
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._endpoints: Dict[str, _Endpoint] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        self._waits: deque = deque(maxlen=wait_window)
+        self._max_wait = 0.0
+        # Moving average of how long admitted requests hold their place
+        self._service_time = 1.0
+
+    def _endpoint(self, name: str) -> _Endpoint:
+        endpoint = self._endpoints.get(name)
+        if endpoint is None:
+            endpoint = self._endpoints[name] = _Endpoint(self.endpoint_limits.get(name))
+        return endpoint
+
+    def retry_after(self) -> int:
+        """Seconds until a place is likely to be free, at least 1."""
+        return max(1, math.ceil(self._service_time * (self.queued + 1) / self.max_concurrency))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason, self.retry_after())
+
+    async def acquire(self, name: str) -> Slot:
+        """
+        Wait for a place for a request to `name`.
+
+        Raises:
+            AdmissionRejected: When the queue is full or the wait deadline passed
+        """
+        endpoint = self._endpoint(name)
+        semaphores = [s for s in (endpoint.semaphore, self._semaphore) if s is not None]
+        must_wait = any(s.locked() for s in semaphores)
+        if must_wait and self.queued >= self.max_queue:
+            raise self._reject("queue_full")
+
+        self.queued += 1
+        endpoint.queued += 1
+        started = time.monotonic()
+        acquired = []
+        try:
+            # The endpoint limit is taken first so a request never holds a
+            # global place while it waits for its endpoint
+            async with asyncio.timeout(self.queue_timeout):
+                for semaphore in semaphores:
+                    await semaphore.acquire()
+                    acquired.append(semaphore)
+        except TimeoutError:
+            for semaphore in acquired:
+                semaphore.release()
+            raise self._reject("timeout")
+        except BaseException:
+            for semaphore in acquired:
+                semaphore.release()
+            raise
+        finally:
+            self.queued -= 1
+            endpoint.queued -= 1
+
+        wait = time.monotonic() - started
+        self._waits.append(wait)
+        self._max_wait = max(self._max_wait, wait)
+        self.in_flight += 1
+        self.admitted += 1
+        endpoint.in_flight += 1
+        endpoint.admitted += 1
+        return Slot(self, name)
+
+    def _release(self, name: str, held: float) -> None:
+        endpoint = self._endpoints[name]
+        if endpoint.semaphore is not None:
+            endpoint.semaphore.release()
+        self._semaphore.release()
+        self.in_flight -= 1
+        endpoint.in_flight -= 1
+        self._service_time = 0.9 * self._service_time + 0.1 * held
+
+    async def hold(self, slot: Slot, iterator: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """Yield from a streaming response and release `slot` when it ends."""
+        try:
+            async with aclosing(iterator):
+                async for item in iterator:
+                    yield item
+        finally:
+            slot.release()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return waits[min(int(len(waits) * p), len(waits) - 1)] if waits else 0.0
+
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_seconds": {
+                "avg": sum(waits) / len(waits) if waits else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": self._max_wait,
+            },
+            "endpoints": {
+                name: {
+                    "limit": endpoint.limit,
+                    "in_flight": endpoint.in_flight,
+                    "queued": endpoint.queued,
+                    "admitted": endpoint.admitted,
+                }
+                for name, endpoint in self._endpoints.items()
+            },
+        }
+
+
+def _parse_limits(value: str) -> Dict[str, int]:
+    """Parse "stream=16,batch=2" into {"stream": 16, "batch": 2}."""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, limit = item.partition("=")
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+def create_admission_controller() -> AdmissionController:
+    """
+    Build the admission controller from the ADMISSION_* environment variables.
+    """
+    return AdmissionController(
+        max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "32")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "64")),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10")),
+        endpoint_limits=_parse_limits(os.getenv("ADMISSION_ENDPOINT_LIMITS", "")),
+    )
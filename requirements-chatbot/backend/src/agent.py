@@ -1,60 +1,263 @@
-from typing import Annotated, List, Dict, Any, AsyncIterator
+import asyncio
+import importlib
+import os
+from contextlib import aclosing, nullcontext
+from typing import Annotated, List, Dict, Any, AsyncIterator, Callable, Optional, Tuple, Union
 from typing_extensions import TypedDict
 
-from fastapi import HTTPException
 from pydantic import BaseModel
-import json
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain.chat_models import init_chat_model
-from langchain_core.messages import HumanMessage, AIMessage
-from langchain_tavily import TavilySearch
-from .graph_node import BasicToolNode
-from .gemini_langsmith_wrapper import wrap_gemini
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.types import Send
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, message_chunk_to_message
+from langchain_core.messages.ai import add_ai_message_chunks
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from .admission import AdmissionController, AdmissionRejected
+from .graph_node import EAGER_TOOL_CALLS_KEY, BasicToolNode, EagerToolCalls, StreamingToolCalls
+from .conversation_store import ConversationStore, create_conversation_store
+from .cache import LLMResponseCache, MemoryCache, ToolResultCache, create_llm_cache, create_tool_cache
+from .prompts import DEFAULT_SYSTEM_PROMPTS, ContextCache, PromptRegistry, create_context_cache
+from .context_window import ContextWindowManager, create_context_window_manager
+from .sse import SSEStream, dumps
+from .serializer import serialize
+from .state_delta import StateDeltaEncoder, encode_snapshot
+from .startup import StartupTimer
+from .attachments import AttachmentStore, create_attachment_store
+from .planning import (
+    FIRST_PHASE,
+    PHASE_ORDER,
+    PHASES,
+    PhaseName,
+    advance,
+    advance_phase,
+    artifacts_message,
+    calls_advance,
+    calls_edit,
+    edit,
+    edit_section,
+)
+from .sections import SectionRegenerator
+from .drafting import create_document_writer, merge_drafts, write_document
+from .routing import GEMINI_FLASH_LITE, MODEL_ROUTE_KEY, ModelRoute, RouteName, create_model_router
+from .hedging import create_llm_hedger
+from .metrics import GraphMetrics
 
 GEMINI_FLASH="gemini-2.0-flash"
 MODEL=GEMINI_FLASH
+TEMPERATURE=0.5
+# Concurrent tool execution in async graph runs
+TOOL_MAX_CONCURRENCY=4
+TOOL_TIMEOUT_SECONDS=30.0
+# Imported when the chatbot is built rather than when this module is
+PROVIDER_MODULES=("langchain_google_genai", "langchain_tavily", "langsmith")
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    # Context window: summary of messages[:summary_upto], the model sees the rest
+    summary: str
+    summary_upto: int
+    context_tokens_saved: int
+    # Planning workflow: current phase and the documents approved in earlier phases,
+    # as sections linked to the sections they cite (see sections.py)
+    phase: str
+    artifacts: Dict[str, List[Dict[str, Any]]]
+    # Sections of a long answer written in parallel, until they are merged
+    drafts: Annotated[List[Dict[str, Any]], merge_drafts]
 
 class ChatMessage(BaseModel):
     role: str  # "user" or "assistant"
     content: str
+    # IDs of uploaded attachments (user messages)
+    attachments: List[str] = []
 
 
 class ChatRequest(BaseModel):
     message: str
     conversation_history: List[ChatMessage] = []
+    # When set, history is kept server-side and only `message` needs to be sent
+    thread_id: Optional[str] = None
+    # Skip the LLM response cache for this request
+    bypass_cache: bool = False
+    # IDs from POST /attachments sent along with `message`
+    attachments: List[str] = []
+    # Planning phase to answer in; threads keep track of it themselves
+    phase: Optional[PhaseName] = None
+    # "fast", "strong" or "auto" model for this turn; MODEL_ROUTING when unset
+    model_route: Optional[RouteName] = None
+    # False opts this request out of LangSmith tracing; otherwise it is sampled
+    trace: bool = True
 
 
 class ChatStreamRequest(BaseModel):
     message: str
     conversation_history: List[ChatMessage] = []
-    stream_mode: str = "messages"  # "messages", "updates", "values", "custom"
+    thread_id: Optional[str] = None
+    bypass_cache: bool = False
+    attachments: List[str] = []
+    phase: Optional[PhaseName] = None
+    model_route: Optional[RouteName] = None
+    trace: bool = True
+    stream_mode: str = "messages"  # "messages", "updates", "values", "deltas", "custom"
+    # "deltas" mode: send a full snapshot every N frames (0: only the first frame)
+    snapshot_interval: int = 0
+
+
+class BatchChatRequest(BaseModel):
+    requests: List[ChatRequest]
+    # Requests run at the same time, capped by BATCH_MAX_CONCURRENCY
+    max_concurrency: Optional[int] = None
 
 
 class ChatResponse(BaseModel):
     response: str
     conversation_history: List[ChatMessage]
+    thread_id: Optional[str] = None
+    # Tokens kept out of this turn's model context by the rolling summary
+    context_tokens_saved: int = 0
+    # Planning phase after this turn ("phased" workflow)
+    phase: Optional[str] = None
 
 
 class LangGraphChatbot:
-    def __init__(self, model_name: str = MODEL):
-        self.llm = wrap_gemini(ChatGoogleGenerativeAI(
+    def __init__(
+        self,
+        model_name: str = MODEL,
+        store: Optional[ConversationStore] = None,
+        tool_cache: Optional[ToolResultCache] = None,
+        llm_cache: Optional[LLMResponseCache] = None,
+        prompts: Optional[PromptRegistry] = None,
+        context_cache: Optional[ContextCache] = None,
+        context_window: Optional[ContextWindowManager] = None,
+        attachments: Optional[AttachmentStore] = None,
+        chat_model: Optional[Any] = None,
+        tools: Optional[List] = None,
+        timer: Optional[StartupTimer] = None,
+        fast_chat_model: Optional[Any] = None,
+    ):
+        self.startup = timer or StartupTimer()
+        with self.startup.phase("import"):
+            # Provider SDKs are the slowest imports, only load them when a chatbot is built
+            for module in PROVIDER_MODULES:
+                importlib.import_module(module)
+        with self.startup.phase("clients"):
+            self._init_clients(
+                model_name, store, tool_cache, llm_cache, prompts, context_cache, context_window, attachments,
+                chat_model, tools, fast_chat_model,
+            )
+        with self.startup.phase("graph_compile"):
+            graph_builder = self._build_graph()
+            # Stateless graph for requests carrying their own history,
+            # checkpointed graph for requests identified by a thread ID
+            self.graph = graph_builder.compile()
+            self.threaded_graph = graph_builder.compile(checkpointer=self.store.checkpointer)
+    
+    def _init_clients(
+        self,
+        model_name: str,
+        store: Optional[ConversationStore],
+        tool_cache: Optional[ToolResultCache],
+        llm_cache: Optional[LLMResponseCache],
+        prompts: Optional[PromptRegistry],
+        context_cache: Optional[ContextCache],
+        context_window: Optional[ContextWindowManager],
+        attachments: Optional[AttachmentStore],
+        chat_model: Optional[Any],
+        tools: Optional[List],
+        fast_chat_model: Optional[Any],
+    ) -> None:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        from .gemini_langsmith_wrapper import create_trace_sampler, wrap_gemini
+        
+        self.model_name = model_name
+        self.chat_model = chat_model or ChatGoogleGenerativeAI(
             model=model_name,
-            temperature=0.5,
+            temperature=TEMPERATURE,
             max_retries=2,
-            )).bind_tools(self._init_tools())
-        self.tool_node = BasicToolNode(self._init_tools())  
-        self.graph = self._build_graph()
+            )
+        # "phased": one node per planning phase, each sending only its own prompt;
+        # "single": one node sending every prompt
+        self.workflow = os.getenv("CHATBOT_WORKFLOW", "single")
+        if self.workflow not in ("phased", "single"):
+            raise ValueError(f"Unsupported chatbot workflow: {self.workflow}")
+        # Traced model without tools, for provider-cached calls; `llm` has the tools bound
+        self.traced_model = wrap_gemini(self.chat_model)
+        # One tool instance set, shared by the model binding and the tool node
+        self.tools = tools if tools is not None else self._init_tools()
+        if self.workflow == "phased":
+            self.tools = [*self.tools, advance_phase, edit_section]
+            # Updates the sections of approved documents that an edited section invalidates
+            self.sections = SectionRegenerator(self.chat_model, PHASE_ORDER)
+        # Writes long documents section by section in parallel, from an outline
+        self.document_writer = create_document_writer(self.traced_model, self._writer_context)
+        if self.document_writer is not None:
+            self.tools = [*self.tools, write_document]
+        self.llm = self.traced_model.bind_tools(self.tools)
+        self.tool_node = BasicToolNode(
+            self.tools,
+            max_concurrency=TOOL_MAX_CONCURRENCY,
+            timeout=TOOL_TIMEOUT_SECONDS,
+            cache=tool_cache or create_tool_cache(),
+        )
+        # Cheaper, lower-latency model for simple turns, see ModelRouter
+        fast_model_name = os.getenv("FAST_MODEL", GEMINI_FLASH_LITE)
+        if fast_chat_model is None and chat_model is not None:
+            # An injected model (tests, benchmarks) serves both routes unless a fast one is given too
+            fast_chat_model = chat_model
+        fast_chat_model = fast_chat_model or ChatGoogleGenerativeAI(
+            model=fast_model_name,
+            temperature=TEMPERATURE,
+            max_retries=2,
+            )
+        traced_fast_model = wrap_gemini(fast_chat_model)
+        self.router = create_model_router(
+            ModelRoute("fast", fast_model_name, traced_fast_model, traced_fast_model.bind_tools(self.tools)),
+            ModelRoute("strong", model_name, self.traced_model, self.llm),
+            list(self.tool_node.tools_by_name),
+        )
+        # Start tool calls as soon as their arguments have streamed (async runs only)
+        self.eager_tool_calls = os.getenv("EAGER_TOOL_CALLS", "false").lower() == "true"
+        # Duplicate model calls whose first token is late (async runs only)
+        self.hedger = create_llm_hedger()
+        self.llm_cache = llm_cache or create_llm_cache()
+        # Everything besides the messages that determines the model's answer
+        self.llm_cache_scope = {
+            "model": model_name,
+            "temperature": TEMPERATURE,
+            "tools": sorted(
+                (tool.name, tool.description) for tool in self.tool_node.tools_by_name.values()
+            ),
+        }
+        self.prompts = prompts or PromptRegistry()
+        self.system_prompts = DEFAULT_SYSTEM_PROMPTS
+        self.context_cache = context_cache or create_context_cache()
+        self.context_window = context_window or create_context_window_manager(self.chat_model)
+        self.store = store or create_conversation_store()
+        self.attachments = attachments or create_attachment_store()
+        # Seq of the latest "deltas" frame sent per thread, so a snapshot tells where to resume
+        self.delta_seqs = MemoryCache(max_entries=1024)
+        # Decides per request whether its LangSmith trace is recorded
+        self.trace_sampler = create_trace_sampler()
     
     def _build_graph(self) -> StateGraph:
         graph_builder = StateGraph(State)
         
-        graph_builder.add_node("chatbot", self._chatbot_node)
-        graph_builder.add_node("tools", self.tool_node) 
+        if self.context_window is not None:
+            graph_builder.add_node(
+                "context",
+                RunnableLambda(self.context_window.node, afunc=self.context_window.anode, name="context"),
+            )
+        if self.workflow == "phased":
+            return self._build_phased_graph(graph_builder)
+        # Async runs (ainvoke/astream) use the async node, chat_sync the sync one
+        graph_builder.add_node(
+            "chatbot",
+            RunnableLambda(self._chatbot_node_sync, afunc=self._chatbot_node, name="chatbot"),
+        )
+        graph_builder.add_node(
+            "tools",
+            RunnableLambda(self.tool_node, afunc=self.tool_node.acall, name="tools"),
+        )
         
         graph_builder.add_conditional_edges(
             "chatbot",
@@ -65,12 +268,107 @@ class LangGraphChatbot:
             },
         )
         
-        graph_builder.add_edge(START, "chatbot")
-        graph_builder.add_edge("tools", "chatbot")
+        if self.context_window is not None:
+            graph_builder.add_edge(START, "context")
+            graph_builder.add_edge("context", "chatbot")
+        else:
+            graph_builder.add_edge(START, "chatbot")
+        if self.document_writer is not None:
+            self._add_document_nodes(graph_builder)
+            graph_builder.add_conditional_edges(
+                "tools", self._route_after_tools, {"chatbot": "chatbot", "write_section": "write_section"}
+            )
+        else:
+            graph_builder.add_edge("tools", "chatbot")
+        
+        return graph_builder
+    
+    def _add_document_nodes(self, graph_builder: StateGraph) -> None:
+        """
+        Parallel document writing: a `write_document` outline fans out to one
+        write_section task per section (see DocumentWriter), merged into the answer.
+        """
+        writer = self.document_writer
+        graph_builder.add_node("write_section", RunnableLambda(writer.node, afunc=writer.anode, name="write_section"))
+        graph_builder.add_node("merge", RunnableLambda(writer.merge, name="merge"))
+        graph_builder.add_edge("write_section", "merge")
+        graph_builder.add_edge("merge", END)
+    
+    def _build_phased_graph(self, graph_builder: StateGraph) -> StateGraph:
+        """
+        One model node per planning phase; the phase in the state picks the node.
+        
+        The tools node applies `advance_phase` calls to the state, so the turn
+        continues in the next phase's node with that phase's prompt. After an
+        `edit_section` call, the "regenerate" node first updates the sections of
+        approved documents that depend on the edited one.
+        """
+        for phase in PHASE_ORDER:
+            graph_builder.add_node(phase, self._phase_node(phase))
+            graph_builder.add_conditional_edges(phase, self._route_tools, {"tools": "tools", END: END})
+        graph_builder.add_node(
+            "tools",
+            RunnableLambda(self._phased_tools_node_sync, afunc=self._phased_tools_node, name="tools"),
+        )
+        phase_nodes = {phase: phase for phase in PHASE_ORDER}
+        if self.context_window is not None:
+            graph_builder.add_edge(START, "context")
+            graph_builder.add_conditional_edges("context", self._route_phase, phase_nodes)
+        else:
+            graph_builder.add_conditional_edges(START, self._route_phase, phase_nodes)
+        graph_builder.add_node(
+            "regenerate",
+            RunnableLambda(self.sections.node, afunc=self.sections.anode, name="regenerate"),
+        )
+        after_tools = {**phase_nodes, "regenerate": "regenerate"}
+        if self.document_writer is not None:
+            self._add_document_nodes(graph_builder)
+            after_tools["write_section"] = "write_section"
+        graph_builder.add_conditional_edges("tools", self._route_after_tools, after_tools)
+        graph_builder.add_conditional_edges("regenerate", self._route_phase, phase_nodes)
+        
+        return graph_builder
+    
+    def _phase_node(self, phase: str) -> RunnableLambda:
+        async def node(state: State, config: RunnableConfig) -> Dict[str, Any]:
+            return await self._chatbot_node(state, config, phase)
+        
+        def node_sync(state: State, config: RunnableConfig) -> Dict[str, Any]:
+            return self._chatbot_node_sync(state, config, phase)
         
-        return graph_builder.compile()
+        return RunnableLambda(node_sync, afunc=node, name=phase)
+    
+    @staticmethod
+    def _route_phase(state: State) -> str:
+        return state.get("phase") or FIRST_PHASE
+    
+    def _route_after_tools(self, state: State) -> Union[str, List[Send]]:
+        if self.document_writer is not None and (sends := self.document_writer.fan_out(state)):
+            return sends
+        if self.workflow == "single":
+            return "chatbot"
+        if self.sections.stale(state.get("artifacts") or {}):
+            return "regenerate"
+        return self._route_phase(state)
+    
+    @staticmethod
+    def _apply_planning_calls(state: State, update: Dict[str, Any]) -> Dict[str, Any]:
+        # Edits first, so a document approved in the same turn builds on them
+        if calls_edit(state["messages"][-1]):
+            update.update(edit(state, update["messages"]))
+        if calls_advance(state["messages"][-1]):
+            update.update(advance({**state, **update, "messages": state["messages"]}))
+        return update
+    
+    async def _phased_tools_node(self, state: State, config: RunnableConfig) -> Dict[str, Any]:
+        return self._apply_planning_calls(state, await self.tool_node.acall(state, config))
+    
+    def _phased_tools_node_sync(self, state: State) -> Dict[str, Any]:
+        return self._apply_planning_calls(state, self.tool_node(state))
     
     def _init_tools(self) -> List:
+        from langchain_tavily import TavilySearch
+        
         search_tool = TavilySearch(max_results=1)
         return [search_tool]
     
@@ -85,15 +383,211 @@ class LangGraphChatbot:
             return "tools"
         return END
     
-    def _chatbot_node(self, state: State) -> Dict[str, Any]:
-        response = self.llm.invoke(state["messages"])
+    def _context_messages(self, state: State) -> List:
+        if self.context_window is None:
+            return state["messages"]
+        return self.context_window.context_messages(state)
+    
+    def _model_context(self, state: State, phase: Optional[str]) -> Tuple[str, str, List]:
+        """
+        System prefix, its hash and the messages for a model call.
+        
+        A planning phase sends only the core guide and its own prompt, plus the
+        approved artifacts of earlier phases it works from.
+        
+        Returns:
+            (prefix text, prefix hash, messages)
+        """
+        if phase is None:
+            prefix, prefix_hash = self.prompts.system_prefix(self.system_prompts)
+            return prefix, prefix_hash, self._context_messages(state)
+        prefix, prefix_hash = self.prompts.system_prefix(PHASES[phase].prompts)
+        context = self._context_messages(state)
+        if artifacts := artifacts_message(phase, state.get("artifacts") or {}):
+            context = [artifacts, *context]
+        return prefix, prefix_hash, context
+    
+    def _writer_context(self, state: State) -> Tuple[str, str, List]:
+        phase = (state.get("phase") or FIRST_PHASE) if self.workflow == "phased" else None
+        return self._model_context(state, phase)
+    
+    def _llm_cache_keys(
+        self, messages: List, config: RunnableConfig, prefix_hash: str, routes: List[ModelRoute]
+    ) -> Optional[Dict[str, str]]:
+        """
+        Cache key per route name, or None when the call is not cached.
+        
+        An answer is cached under the model of the route that gave it, and
+        looked up on the routes in the order they are tried: an escalated answer
+        is found again for an "auto" request, but a fast answer is never
+        returned for a "strong" one.
+        """
+        if self.llm_cache is None or config.get("configurable", {}).get("bypass_cache"):
+            return None
+        return {
+            route.name: self.llm_cache.key_for(
+                messages, {**self.llm_cache_scope, "model": route.model_name, "prompt": prefix_hash}
+            )
+            for route in routes
+        }
+    
+    def _llm_call(
+        self, messages: List, prefix: str, cache_name: Optional[str], route: ModelRoute
+    ) -> Tuple[Any, List, Dict[str, Any]]:
+        """
+        Pick the runnable, input and call kwargs for a model call.
+        
+        With a context cache the static prefix and tools live provider-side and
+        only the conversation is sent; otherwise the prefix goes first, inline.
+        `messages` are already materialized by the caller, see
+        AttachmentStore.materialize, so file contents never enter the graph state.
+        """
+        if cache_name:
+            # Cached requests may not set a system instruction, so the summary goes in as a user turn
+            messages = [
+                HumanMessage(content=message.content) if isinstance(message, SystemMessage) else message
+                for message in messages
+            ]
+            return route.chat_model, messages, {"cached_content": cache_name}
+        return route.llm, [SystemMessage(content=prefix), *messages], {}
+    
+    async def _chatbot_node(
+        self, state: State, config: RunnableConfig, phase: Optional[str] = None
+    ) -> Dict[str, Any]:
+        prefix, prefix_hash, context = self._model_context(state, phase)
+        routes = self.router.routes(state["messages"], config)
+        cache_keys = self._llm_cache_keys(context, config, prefix_hash, routes)
+        if cache_keys is not None:
+            # A cached message returned by the node is still emitted by the "messages" stream mode
+            for route in routes:
+                if cached := await self.llm_cache.aget_message(cache_keys[route.name]):
+                    return {"messages": [cached]}
+        for route in routes:
+            # An answer that may still be escalated is not streamed; once accepted it is emitted whole
+            buffered = route is not routes[-1]
+            response = await self._acall_route(route, context, prefix, prefix_hash, config, buffered)
+            # Escalate a failed answer to the next route, the last one's answer stands
+            reason = self.router.check(response) if route is not routes[-1] else None
+            if reason is None:
+                break
+            self.router.escalate(route, reason)
+        if cache_keys is not None:
+            await self.llm_cache.aset_message(cache_keys[route.name], response)
+        return {"messages": [response]}
+    
+    async def _acall_route(
+        self,
+        route: ModelRoute,
+        context: List,
+        prefix: str,
+        prefix_hash: str,
+        config: RunnableConfig,
+        buffered: bool = False,
+    ) -> AIMessage:
+        cache_name = None
+        if self.context_cache is not None:
+            cache_name = await self.context_cache.aget_or_create(
+                route.model_name, prefix, prefix_hash, self.tool_node.tools_by_name.values()
+            )
+        context = await self.attachments.amaterialize(context)
+        llm, messages, kwargs = self._llm_call(context, prefix, cache_name, route)
+        if buffered:
+            # The "messages" stream mode still emits the message the node returns
+            kwargs = {**kwargs, "config": {"tags": [TAG_NOSTREAM]}}
+        eager = config.get("configurable", {}).get(EAGER_TOOL_CALLS_KEY)
+        with self.router.observe(route) as call:
+            if eager is not None or self.hedger is not None:
+                call["response"] = await self._astream_response(llm, messages, kwargs, route, eager)
+            else:
+                # ainvoke streams internally when the graph runs with stream_mode="messages",
+                # so tokens reach the client as they are generated
+                call["response"] = await llm.ainvoke(messages, **kwargs)
+        return call["response"]
+    
+    async def _astream_response(
+        self,
+        llm: Any,
+        messages: List,
+        kwargs: Dict[str, Any],
+        route: ModelRoute,
+        eager: Optional[EagerToolCalls] = None,
+    ) -> AIMessage:
+        """
+        Stream a model call, hedged when LLM_HEDGING is on.
+        
+        With `eager`, each tool call is started once its arguments are complete;
+        the tools node then reuses the running calls, so tool latency overlaps
+        with the rest of the generation.
+        
+        Returns:
+            The aggregated response message, empty when the stream yielded nothing
+        """
+        if self.hedger is not None:
+            # Each attempt gets the callbacks the hedger gates until the race is decided
+            stream = self.hedger.astream(
+                route.model_name,
+                lambda callbacks: llm.astream(
+                    messages, **{**kwargs, "config": {**kwargs.get("config", {}), "callbacks": callbacks}}
+                ),
+            )
+        else:
+            stream = llm.astream(messages, **kwargs)
+        tool_calls = StreamingToolCalls()
+        chunks = []
+        try:
+            async with aclosing(stream) as stream:
+                async for chunk in stream:
+                    chunks.append(chunk)
+                    if eager is not None:
+                        for tool_call in tool_calls.add(chunk):
+                            self.tool_node.start(tool_call, eager)
+        except BaseException:
+            if eager is not None:
+                eager.cancel()
+            raise
+        if not chunks:
+            return AIMessage(content="")
+        return message_chunk_to_message(add_ai_message_chunks(chunks[0], *chunks[1:]))
+    
+    def _chatbot_node_sync(self, state: State, config: RunnableConfig, phase: Optional[str] = None) -> Dict[str, Any]:
+        prefix, prefix_hash, context = self._model_context(state, phase)
+        routes = self.router.routes(state["messages"], config)
+        cache_keys = self._llm_cache_keys(context, config, prefix_hash, routes)
+        if cache_keys is not None:
+            for route in routes:
+                if cached := self.llm_cache.get_message(cache_keys[route.name]):
+                    return {"messages": [cached]}
+        for route in routes:
+            response = self._call_route(route, context, prefix, prefix_hash, buffered=route is not routes[-1])
+            reason = self.router.check(response) if route is not routes[-1] else None
+            if reason is None:
+                break
+            self.router.escalate(route, reason)
+        if cache_keys is not None:
+            self.llm_cache.set_message(cache_keys[route.name], response)
         return {"messages": [response]}
     
+    def _call_route(
+        self, route: ModelRoute, context: List, prefix: str, prefix_hash: str, buffered: bool = False
+    ) -> AIMessage:
+        cache_name = None
+        if self.context_cache is not None:
+            cache_name = self.context_cache.get_or_create(
+                route.model_name, prefix, prefix_hash, self.tool_node.tools_by_name.values()
+            )
+        context = self.attachments.materialize(context)
+        llm, messages, kwargs = self._llm_call(context, prefix, cache_name, route)
+        if buffered:
+            kwargs = {**kwargs, "config": {"tags": [TAG_NOSTREAM]}}
+        with self.router.observe(route) as call:
+            call["response"] = llm.invoke(messages, **kwargs)
+        return call["response"]
+    
     def _convert_to_langchain_messages(self, messages: List[ChatMessage]) -> List:
         langchain_messages = []
         for msg in messages:
             if msg.role == "user":
-                langchain_messages.append(HumanMessage(content=msg.content))
+                langchain_messages.append(self._human_message(msg.content, msg.attachments))
             elif msg.role == "assistant":
                 langchain_messages.append(AIMessage(content=msg.content))
         return langchain_messages
@@ -102,18 +596,129 @@ class LangGraphChatbot:
         chat_messages = []
         for msg in messages:
             if isinstance(msg, HumanMessage):
-                chat_messages.append(ChatMessage(role="user", content=msg.content))
+                chat_messages.append(ChatMessage(
+                    role="user",
+                    content=msg.content,
+                    attachments=msg.additional_kwargs.get("attachments", []),
+                ))
             elif isinstance(msg, AIMessage):
                 chat_messages.append(ChatMessage(role="assistant", content=msg.content))
         return chat_messages
     
-    async def chat(self, request: ChatRequest) -> ChatResponse:
-        langchain_messages = self._convert_to_langchain_messages(request.conversation_history)
-        langchain_messages.append(HumanMessage(content=request.message))
+    def _build_input(self, request: ChatRequest, has_thread: bool) -> Dict[str, Any]:
+        """
+        Build the graph input for a request.
+        
+        Threads already in the store only receive the new message; otherwise the
+        client-provided history is used (and seeds the thread, if any). Threads
+        keep their planning phase unless the request sets one.
+        """
+        if has_thread:
+            langchain_messages = []
+        else:
+            langchain_messages = self._convert_to_langchain_messages(request.conversation_history)
+        langchain_messages.append(self._human_message(request.message, request.attachments))
+        graph_input = {"messages": langchain_messages}
+        if self.workflow == "phased" and (request.phase is not None or not has_thread):
+            graph_input["phase"] = request.phase or FIRST_PHASE
+        return graph_input
+    
+    @staticmethod
+    def _human_message(content: str, attachments: List[str]) -> HumanMessage:
+        # Only the attachment IDs are kept in the conversation, see AttachmentStore.materialize
+        if attachments:
+            return HumanMessage(content=content, additional_kwargs={"attachments": list(attachments)})
+        return HumanMessage(content=content)
+    
+    def check_attachments(self, request: ChatRequest) -> None:
+        """Raise UnknownAttachment when the request refers to an attachment that is not stored."""
+        attachment_ids = list(request.attachments)
+        for message in request.conversation_history:
+            attachment_ids.extend(message.attachments)
+        self.attachments.check(attachment_ids)
+    
+    def _untraced_context(self, request: ChatRequest) -> Optional[Callable[[], Any]]:
+        """
+        Context turning tracing off for a request's graph run, or None when the request is sampled.
+        
+        A request that opted out leaves no trace. One that was not sampled only
+        traces its failed and slow model calls.
+        """
+        from .gemini_langsmith_wrapper import no_tracing, unsampled
+        
+        if not request.trace:
+            return no_tracing
+        return None if self.trace_sampler.sample() else unsampled
+    
+    def _tracing(self, untraced_context: Optional[Callable[[], Any]]) -> Any:
+        """Context for running a request's graph, see `_untraced_context`."""
+        return nullcontext() if untraced_context is None else untraced_context()
+    
+    async def _astream(
+        self,
+        graph: Any,
+        initial_state: Dict[str, Any],
+        config: Dict[str, Any],
+        untraced_context: Optional[Callable[[], Any]],
+        **kwargs,
+    ) -> AsyncIterator[Any]:
+        """graph.astream, with tracing off for every step unless the request was sampled."""
+        from .gemini_langsmith_wrapper import untraced
         
-        initial_state = {"messages": langchain_messages}
+        stream = graph.astream(initial_state, config, **kwargs)
+        # Steps may run in different tasks (see cancel_on_disconnect), so a block around the loop is not enough
+        if untraced_context is not None:
+            stream = untraced(stream, untraced_context)
+        try:
+            async with aclosing(stream):
+                async for item in stream:
+                    yield item
+        finally:
+            self._cancel_eager_calls(config)
+    
+    @staticmethod
+    def _cancel_eager_calls(config: Dict[str, Any]) -> None:
+        """Stop tool calls started early for a tools step the run never reached (e.g. it was cancelled)."""
+        eager = config["configurable"].get(EAGER_TOOL_CALLS_KEY)
+        if eager is not None:
+            eager.cancel()
+    
+    def _build_config(self, request: ChatRequest, sync: bool = False) -> Dict[str, Any]:
+        if request.thread_id is None:
+            config = {"configurable": {}}
+        else:
+            config = self.store.config_for(request.thread_id)
+        config["configurable"]["bypass_cache"] = request.bypass_cache
+        # Sync runs call the model without streaming, so nothing could start early
+        if self.eager_tool_calls and not sync:
+            config["configurable"][EAGER_TOOL_CALLS_KEY] = self.tool_node.eager_calls()
+        if request.model_route is not None:
+            config["configurable"][MODEL_ROUTE_KEY] = request.model_route
+        config["callbacks"] = [GraphMetrics()]
+        return config
+    
+    async def _prepare_run(self, request: ChatRequest) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+        config = self._build_config(request)
+        if request.thread_id is None:
+            return self.graph, self._build_input(request, False), config
+        has_thread = await self.store.alookup(request.thread_id)
+        return self.threaded_graph, self._build_input(request, has_thread), config
+    
+    def _prepare_run_sync(self, request: ChatRequest) -> Tuple[Any, Dict[str, Any], Dict[str, Any]]:
+        config = self._build_config(request, sync=True)
+        if request.thread_id is None:
+            return self.graph, self._build_input(request, False), config
+        has_thread = self.store.lookup(request.thread_id)
+        return self.threaded_graph, self._build_input(request, has_thread), config
+    
+    async def chat(self, request: ChatRequest) -> ChatResponse:
+        graph, initial_state, config = await self._prepare_run(request)
         
-        result = await self.graph.ainvoke(initial_state)
+        try:
+            with self._tracing(self._untraced_context(request)):
+                result = await graph.ainvoke(initial_state, config)
+        finally:
+            self._cancel_eager_calls(config)
         
         all_messages = result["messages"]
         
@@ -123,60 +728,170 @@ class LangGraphChatbot:
         
         return ChatResponse(
             response=bot_response,
-            conversation_history=updated_conversation
+            conversation_history=updated_conversation,
+            thread_id=request.thread_id,
+            context_tokens_saved=result.get("context_tokens_saved", 0),
+            phase=result.get("phase"),
         )
     
     async def stream_chat(self, request: ChatStreamRequest) -> AsyncIterator[str]:
-        langchain_messages = self._convert_to_langchain_messages(request.conversation_history)
-        langchain_messages.append(HumanMessage(content=request.message))
+        """
+        Stream a chat turn as Server-Sent Events frames.
         
-        initial_state = {"messages": langchain_messages}
+        Token events are coalesced and framed by SSEStream; see stream_events
+        for the event payloads.
+        """
+        async with aclosing(SSEStream(self.stream_events(request)).__aiter__()) as frames:
+            async for frame in frames:
+                yield frame
+    
+    async def stream_events(self, request: ChatStreamRequest) -> AsyncIterator[Dict[str, Any]]:
+        graph, initial_state, config = await self._prepare_run(request)
+        untraced_context = self._untraced_context(request)
         
         if request.stream_mode == "messages":
-            async for message_chunk, _ in self.graph.astream(
-                initial_state, 
-                stream_mode="messages"
+            # "custom" carries the sections of documents written in parallel, as each one completes
+            async for mode, payload in self._astream(
+                graph,
+                initial_state,
+                config,
+                untraced_context,
+                stream_mode=["messages", "custom"]
             ):
+                if mode == "custom":
+                    yield payload
+                    continue
+                message_chunk, metadata = payload
+                if metadata.get("langgraph_node") == "merge":
+                    # The merged document repeats the sections already sent
+                    continue
                 if hasattr(message_chunk, 'content') and message_chunk.content:
-                    yield f"data: {json.dumps({'type': 'token', 'content': message_chunk.content})}\n\n"
+                    yield {'type': 'token', 'content': message_chunk.content}
             
-            yield f"data: {json.dumps({'type': 'done'})}\n\n"
+            yield {'type': 'done'}
         
         elif request.stream_mode == "updates":
                 # Stream node updates
-                async for chunk in self.graph.astream(
-                    initial_state, 
+                async for chunk in self._astream(
+                    graph,
+                    initial_state,
+                    config,
+                    untraced_context,
                     stream_mode="updates"
                 ):
                     # Serialize the chunk to handle non-JSON serializable objects
                     serialized_chunk = self._serialize_chunk(chunk)
-                    chunk_data = {
+                    yield {
                         "type": "update",
                         "content": serialized_chunk
                     }
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
                 
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield {'type': 'done'}
         
         elif request.stream_mode == "values":
                 # Stream full state values
-                async for chunk in self.graph.astream(
-                    initial_state, 
+                async for chunk in self._astream(
+                    graph,
+                    initial_state,
+                    config,
+                    untraced_context,
                     stream_mode="values"
                 ):
                     # Convert messages to serializable format
                     serializable_chunk = self._serialize_state_for_streaming(chunk)
-                    chunk_data = {
+                    yield {
                         "type": "values",
                         "content": serializable_chunk
                     }
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
                 
-                yield f"data: {json.dumps({'type': 'done'})}\n\n"
+                yield {'type': 'done'}
+        
+        elif request.stream_mode == "deltas":
+                # Stream only what changed in the state since the previous frame
+                encoder = StateDeltaEncoder(request.snapshot_interval)
+                if request.thread_id is not None:
+                    self.delta_seqs.set(request.thread_id, 0)
+                async for chunk in self._astream(
+                    graph,
+                    initial_state,
+                    config,
+                    untraced_context,
+                    stream_mode="values"
+                ):
+                    frame = encoder.encode(chunk)
+                    if request.thread_id is not None:
+                        self.delta_seqs.set(request.thread_id, encoder.seq)
+                    yield frame
+                
+                yield {'type': 'done', 'seq': encoder.seq}
         
         else:
             raise ValueError(f"Unsupported stream mode: {request.stream_mode}")
     
+    async def thread_snapshot(self, thread_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Full state of a stored thread, in the "deltas" stream snapshot format.
+        
+        Its `seq` is that of the latest "deltas" frame sent for the thread, so
+        a client resumes by applying only the frames after it.
+        
+        Returns:
+            Snapshot frame, or None when the thread does not exist
+        """
+        state = await self.threaded_graph.aget_state(self.store.config_for(thread_id))
+        if not state.values:
+            return None
+        return encode_snapshot(state.values, self.delta_seqs.get(thread_id, 0))
+    
+    async def chat_batch(
+        self, request: BatchChatRequest, admission: Optional[AdmissionController] = None
+    ) -> AsyncIterator[str]:
+        """
+        Run a batch of chat requests, yielding one NDJSON line per finished request.
+        
+        See batch_events for the result payloads.
+        """
+        async with aclosing(self.batch_events(request, admission)) as results:
+            async for result in results:
+                yield dumps(result) + "\n"
+    
+    async def batch_events(
+        self, request: BatchChatRequest, admission: Optional[AdmissionController] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run the requests of a batch concurrently and yield results in completion order.
+        
+        Each result carries the `index` of its request. A failed request yields an
+        error result and does not stop the rest of the batch. With `admission`,
+        each request takes its own "batch" slot while it runs, and a request that
+        is not admitted yields a rejected result.
+        """
+        limit = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+        if request.max_concurrency is not None:
+            limit = min(request.max_concurrency, limit)
+        semaphore = asyncio.Semaphore(max(limit, 1))
+        
+        async def run(index: int, chat_request: ChatRequest) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    async with await admission.acquire("batch") if admission else nullcontext():
+                        response = await self.chat(chat_request)
+                except AdmissionRejected as e:
+                    return {"index": index, "status": "rejected", "error": str(e), "retry_after": e.retry_after}
+                except Exception as e:
+                    return {"index": index, "status": "error", "error": f"{type(e).__name__}: {e}"}
+            return {"index": index, "status": "ok", "response": response.model_dump()}
+        
+        tasks = [asyncio.create_task(run(index, r)) for index, r in enumerate(request.requests)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # The client went away: stop the requests that have not finished
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
     def _serialize_state_for_streaming(self, state: Dict[str, Any]) -> Dict[str, Any]:
         serialized = {}
         for key, value in state.items():
@@ -202,13 +917,7 @@ class LangGraphChatbot:
         Returns:
             JSON-serializable dictionary
         """
-        if isinstance(chunk, dict):
-            serialized = {}
-            for key, value in chunk.items():
-                serialized[key] = self._serialize_value(value)
-            return serialized
-        else:
-            return self._serialize_value(chunk)
+        return serialize(chunk)
     
     def _serialize_value(self, value: Any) -> Any:
         """
@@ -220,73 +929,13 @@ class LangGraphChatbot:
         Returns:
             JSON-serializable value
         """
-        # Handle None
-        if value is None:
-            return None
-            
-        # Handle basic JSON-serializable types
-        elif isinstance(value, (str, int, float, bool)):
-            return value
-            
-        # Handle LangChain messages
-        elif hasattr(value, '__class__') and 'Message' in value.__class__.__name__:
-            return {
-                "type": value.__class__.__name__,
-                "content": getattr(value, 'content', ''),
-                "role": getattr(value, 'type', 'unknown'),
-                "additional_kwargs": getattr(value, 'additional_kwargs', {}),
-                "id": getattr(value, 'id', None)
-            }
-            
-        # Handle lists
-        elif isinstance(value, (list, tuple)):
-            return [self._serialize_value(item) for item in value]
-            
-        # Handle dictionaries
-        elif isinstance(value, dict):
-            return {k: self._serialize_value(v) for k, v in value.items()}
-            
-        # Handle sets
-        elif isinstance(value, set):
-            return list(value)
-            
-        # Handle datetime objects
-        elif hasattr(value, 'isoformat'):
-            return value.isoformat()
-            
-        # Handle UUID objects
-        elif hasattr(value, 'hex'):
-            return str(value)
-            
-        # Handle objects with __dict__ (custom classes)
-        elif hasattr(value, '__dict__'):
-            try:
-                return {
-                    "type": value.__class__.__name__,
-                    "data": self._serialize_value(value.__dict__)
-                }
-            except:
-                return str(value)
-                
-        # Handle callable objects
-        elif callable(value):
-            return f"<function: {getattr(value, '__name__', str(value))}>"
-            
-        # Fallback: convert to string representation
-        else:
-            try:
-                # Try to convert to string, but handle potential encoding issues
-                return str(value)
-            except Exception as e:
-                return f"<non-serializable: {type(value).__name__}>"
+        return serialize(value)
     
     def chat_sync(self, request: ChatRequest) -> ChatResponse:
-        langchain_messages = self._convert_to_langchain_messages(request.conversation_history)
-        langchain_messages.append(HumanMessage(content=request.message))
-        
-        initial_state = {"messages": langchain_messages}
+        graph, initial_state, config = self._prepare_run_sync(request)
         
-        result = self.graph.invoke(initial_state)
+        with self._tracing(self._untraced_context(request)):
+            result = graph.invoke(initial_state, config)
         
         all_messages = result["messages"]
         
@@ -296,5 +945,8 @@ class LangGraphChatbot:
         
         return ChatResponse(
             response=bot_response,
-            conversation_history=updated_conversation
+            conversation_history=updated_conversation,
+            thread_id=request.thread_id,
+            context_tokens_saved=result.get("context_tokens_saved", 0),
+            phase=result.get("phase"),
         )
\ No newline at end of file
@@ -0,0 +1,223 @@
+import abc
+import asyncio
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage
+from pydantic import BaseModel
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class Attachment(BaseModel):
+    id: str  # sha256 of the content
+    size: int
+    mime_type: str
+
+
+class AttachmentTooLarge(ValueError):
+    pass
+
+
+class UnknownAttachment(KeyError):
+    pass
+
+
+class FileUploader(abc.ABC):
+    """Uploads attachments to the model provider, so model calls refer to them by URI."""
+
+    @abc.abstractmethod
+    def upload(self, path: Path, mime_type: str) -> Tuple[str, float]:
+        """
+        Upload a file.
+
+        Returns:
+            (file URI, expiry as a Unix timestamp)
+        """
+
+
+class GeminiFileUploader(FileUploader):
+    """Uploads attachments with the Gemini Files API; files are kept for 48 hours."""
+
+    TTL_SECONDS = 48 * 3600
+
+    def __init__(self, client: Any = None) -> None:
+        self._client = client
+
+    def upload(self, path: Path, mime_type: str) -> Tuple[str, float]:
+        from google import genai
+        from google.genai import types
+
+        if self._client is None:
+            self._client = genai.Client()
+        uploaded = self._client.files.upload(file=str(path), config=types.UploadFileConfig(mime_type=mime_type))
+        if uploaded.expiration_time is not None:
+            return uploaded.uri, uploaded.expiration_time.timestamp()
+        return uploaded.uri, time.time() + self.TTL_SECONDS
+
+
+class AttachmentStore:
+    """Content-addressed blob store for message attachments.
+
+    Blobs live at `root/<id[:2]>/<id>` where the ID is the sha256 of the
+    content, so the same file uploaded twice is stored once. Messages only
+    carry attachment IDs; `materialize` turns them into content blocks when a
+    model call is built.
+
+    With an `uploader`, each blob is uploaded to the provider once, on its
+    first model call, and later calls only send the file URI (kept next to the
+    blob until shortly before it expires). Without one, the bytes are sent
+    inline.
+    """
+
+    def __init__(
+        self, root: Path, max_bytes: int = 20 * 1024 * 1024, uploader: Optional[FileUploader] = None
+    ) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.uploader = uploader
+        self.uploads = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._uris: Dict[str, Tuple[str, float]] = {}
+        self._upload_lock = threading.Lock()
+
+    def path(self, attachment_id: str) -> Path:
+        if not _DIGEST.match(attachment_id):
+            raise UnknownAttachment(attachment_id)
+        return self.root / attachment_id[:2] / attachment_id
+
+    def get(self, attachment_id: str) -> Optional[Attachment]:
+        try:
+            meta = self.path(attachment_id).with_suffix(".json").read_text(encoding="utf-8")
+        except (FileNotFoundError, UnknownAttachment):
+            return None
+        return Attachment(id=attachment_id, **json.loads(meta))
+
+    def check(self, attachment_ids: List[str]) -> None:
+        """Raise UnknownAttachment for the first ID that is not stored."""
+        for attachment_id in attachment_ids:
+            if self.get(attachment_id) is None:
+                raise UnknownAttachment(attachment_id)
+
+    def _commit(self, tmp_path: str, digest: str, size: int, mime_type: str) -> Attachment:
+        path = self.path(digest)
+        path.parent.mkdir(exist_ok=True)
+        if path.exists():
+            os.unlink(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+        # Written last: an attachment exists once its metadata does
+        path.with_suffix(".json").write_text(json.dumps({"size": size, "mime_type": mime_type}), encoding="utf-8")
+        return Attachment(id=digest, size=size, mime_type=mime_type)
+
+    async def asave(self, chunks: AsyncIterator[bytes], mime_type: str) -> Attachment:
+        """
+        Store an upload streamed in chunks, hashing it while it is written.
+
+        File writes run in worker threads, off the event loop.
+
+        Raises:
+            AttachmentTooLarge: When the upload exceeds max_bytes
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = await asyncio.to_thread(tempfile.mkstemp, dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise AttachmentTooLarge(f"Attachment exceeds {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return await asyncio.to_thread(self._commit, tmp_path, digest.hexdigest(), size, mime_type)
+
+    def save(self, data: bytes, mime_type: str) -> Attachment:
+        if len(data) > self.max_bytes:
+            raise AttachmentTooLarge(f"Attachment exceeds {self.max_bytes} bytes")
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self._commit(tmp_path, hashlib.sha256(data).hexdigest(), len(data), mime_type)
+
+    def read(self, attachment_id: str) -> bytes:
+        return self.path(attachment_id).read_bytes()
+
+    def file_uri(self, attachment: Attachment) -> str:
+        """Provider URI of an attachment, uploading it unless a live upload is known."""
+        record = self.path(attachment.id).with_suffix(".upload.json")
+        with self._upload_lock:
+            uri, expires_at = self._uris.get(attachment.id, ("", 0.0))
+            if not uri and record.exists():
+                uploaded = json.loads(record.read_text(encoding="utf-8"))
+                uri, expires_at = uploaded["uri"], uploaded["expires_at"]
+            # Uploaded again an hour before the provider deletes the file
+            if not uri or expires_at - 3600 <= time.time():
+                uri, expires_at = self.uploader.upload(self.path(attachment.id), attachment.mime_type)
+                self.uploads += 1
+                record.write_text(json.dumps({"uri": uri, "expires_at": expires_at}), encoding="utf-8")
+            self._uris[attachment.id] = (uri, expires_at)
+        return uri
+
+    def _block(self, attachment: Attachment) -> Dict[str, Any]:
+        if self.uploader is not None:
+            return {"type": "media", "mime_type": attachment.mime_type, "file_uri": self.file_uri(attachment)}
+        return {"type": "media", "mime_type": attachment.mime_type, "data": self.read(attachment.id)}
+
+    def materialize(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Replace attachment references by media content blocks for a model call.
+
+        Each attachment is looked up once per call, however many messages refer
+        to it. The blocks refer to uploaded files, or carry the bytes without an
+        uploader.
+        """
+        blobs: Dict[str, Dict[str, Any]] = {}
+        materialized = []
+        for message in messages:
+            attachment_ids = message.additional_kwargs.get("attachments")
+            if not attachment_ids:
+                materialized.append(message)
+                continue
+            for attachment_id in attachment_ids:
+                if attachment_id not in blobs:
+                    attachment = self.get(attachment_id)
+                    if attachment is None:
+                        raise UnknownAttachment(attachment_id)
+                    blobs[attachment_id] = self._block(attachment)
+            content = [{"type": "text", "text": message.content}] if message.content else []
+            content.extend(blobs[attachment_id] for attachment_id in attachment_ids)
+            materialized.append(HumanMessage(content=content, id=message.id))
+        return materialized
+
+    async def amaterialize(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """`materialize`, with the file reads and uploads in a worker thread."""
+        if not any(message.additional_kwargs.get("attachments") for message in messages):
+            return messages
+        return await asyncio.to_thread(self.materialize, messages)
+
+
+def create_attachment_store() -> AttachmentStore:
+    """
+    Build the attachment store from the ATTACHMENT_* environment variables.
+
+    ATTACHMENT_UPLOAD is "gemini" (Gemini Files API) or "none" (bytes sent inline).
+    """
+    upload = os.getenv("ATTACHMENT_UPLOAD", "gemini")
+    if upload not in ("gemini", "none"):
+        raise ValueError(f"Unsupported attachment upload backend: {upload}")
+    return AttachmentStore(
+        Path(os.getenv("ATTACHMENT_STORE_PATH", "attachments")),
+        max_bytes=int(os.getenv("ATTACHMENT_MAX_BYTES", str(20 * 1024 * 1024))),
+        uploader=GeminiFileUploader() if upload == "gemini" else None,
+    )
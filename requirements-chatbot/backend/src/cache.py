@@ -0,0 +1,363 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Collection, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+_MISSING = object()
+# Read-only tools whose results may be reused; tools changing the graph state never are
+DEFAULT_CACHED_TOOLS = ("tavily_search",)
+
+
+def normalize_text(value: str, casefold: bool = True) -> str:
+    """Collapse whitespace (and case) so near-identical strings share a key."""
+    value = " ".join(value.split())
+    return value.casefold() if casefold else value
+
+
+def _normalize(value: Any, casefold_keys: Collection[str] = (), casefold: bool = False) -> Any:
+    if isinstance(value, str):
+        return normalize_text(value, casefold)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v, casefold_keys, str(k) in casefold_keys) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, casefold_keys, casefold) for item in value]
+    return value
+
+
+def make_cache_key(
+    namespace: str, payload: Any, normalize: bool = True, casefold_keys: Collection[str] = ()
+) -> str:
+    """
+    Stable hash of `payload` (JSON-encoded with sorted keys) under a namespace.
+
+    With `normalize`, whitespace in strings is collapsed, and strings under the
+    dict keys in `casefold_keys` are compared case-insensitively.
+    """
+    if normalize:
+        payload = _normalize(payload, casefold_keys)
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return f"{namespace}:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()}"
+
+
+class MemoryCache:
+    """Size-bounded LRU cache with an optional per-entry TTL."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        if expires_at is None and self.ttl is not None:
+            expires_at = self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """On-disk cache tier with TTL and LRU eviction, values stored as JSON."""
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 10000,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);
+            """
+        )
+
+    def get_with_expiry(self, key: str) -> Tuple[Any, Optional[float]]:
+        """Return `(value, expires_at)`, or `(_MISSING, None)` when absent or expired."""
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return _MISSING, None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return _MISSING, None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(value), expires_at
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value, _ = self.get_with_expiry(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        now = self.clock()
+        if expires_at is None and self.ttl is not None:
+            expires_at = now + self.ttl
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+            if count > self.max_entries:
+                overflow = count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM cache WHERE key IN "
+                    "(SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.evictions += overflow
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+class TieredCache:
+    """Memory cache in front of an optional SQLite tier, with hit/miss counters.
+
+    Disk hits are promoted to the memory tier with their remaining TTL.
+    """
+
+    def __init__(self, memory: MemoryCache, disk: Optional[SQLiteCache] = None) -> None:
+        self.memory = memory
+        self.disk = disk
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = self.memory.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        if self.disk is not None:
+            value, expires_at = self.disk.get_with_expiry(key)
+            if value is not _MISSING:
+                self.hits += 1
+                self.disk_hits += 1
+                self.memory.set(key, value, expires_at)
+                return value
+        self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        # Only the SQLite tier does blocking I/O, keep it off the event loop
+        if self.disk is None:
+            return self.get(key, default)
+        return await asyncio.to_thread(self.get, key, default)
+
+    async def aset(self, key: str, value: Any) -> None:
+        if self.disk is None:
+            return self.set(key, value)
+        return await asyncio.to_thread(self.set, key, value)
+
+    def clear(self) -> None:
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "ttl": self.memory.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.memory.evictions,
+        }
+        if self.disk is not None:
+            stats["disk_entries"] = len(self.disk)
+            stats["disk_hits"] = self.disk_hits
+        return stats
+
+
+class ToolResultCache(TieredCache):
+    """Cache of the results of read-only tools, keyed on the tool name and normalized arguments.
+
+    Only the tools named in `tools` are cached. Whitespace in string arguments
+    is collapsed; the arguments named in `casefold_args` (search queries) also
+    ignore case. Error results are never stored.
+    """
+
+    def __init__(
+        self,
+        memory: MemoryCache,
+        disk: Optional[SQLiteCache] = None,
+        tools: Collection[str] = DEFAULT_CACHED_TOOLS,
+        casefold_args: Collection[str] = ("query",),
+    ) -> None:
+        super().__init__(memory, disk)
+        self.tools = frozenset(tools)
+        self.casefold_args = frozenset(casefold_args)
+
+    def caches(self, tool_name: str) -> bool:
+        return tool_name in self.tools
+
+    def key_for(self, tool_name: str, args: Any) -> str:
+        return make_cache_key("tool", {"name": tool_name, "args": args}, casefold_keys=self.casefold_args)
+
+    @staticmethod
+    def storable(result: Any) -> bool:
+        """False for error payloads, which tools such as TavilySearch return instead of raising."""
+        return not (isinstance(result, dict) and "error" in result)
+
+
+class LLMResponseCache(TieredCache):
+    """Cache of chat model responses keyed on the exact message list and model settings."""
+
+    def key_for(self, messages: List[BaseMessage], scope: Dict[str, Any]) -> str:
+        payload = {
+            "scope": scope,
+            "messages": [
+                {
+                    "type": message.type,
+                    "content": message.content,
+                    "tool_calls": getattr(message, "tool_calls", None),
+                    "tool_call_id": getattr(message, "tool_call_id", None),
+                    # Content hashes of the attached files, which the model sees but `content` does not hold
+                    "attachments": message.additional_kwargs.get("attachments"),
+                }
+                for message in messages
+            ],
+        }
+        return make_cache_key("llm", payload, normalize=False)
+
+    def get_message(self, key: str) -> Optional[BaseMessage]:
+        data = self.get(key)
+        return self._restore(data) if data is not None else None
+
+    async def aget_message(self, key: str) -> Optional[BaseMessage]:
+        data = await self.aget(key)
+        return self._restore(data) if data is not None else None
+
+    def set_message(self, key: str, message: BaseMessage) -> None:
+        self.set(key, message_to_dict(message))
+
+    async def aset_message(self, key: str, message: BaseMessage) -> None:
+        await self.aset(key, message_to_dict(message))
+
+    @staticmethod
+    def _restore(data: Dict[str, Any]) -> BaseMessage:
+        message = messages_from_dict([data])[0]
+        # A fresh ID, otherwise add_messages would overwrite the earlier copy in the thread
+        message.id = None
+        return message
+
+
+def create_tool_cache(
+    ttl: Optional[float] = None,
+    max_entries: Optional[int] = None,
+    path: Optional[str] = None,
+) -> Optional[ToolResultCache]:
+    """
+    Build the tool result cache, or None when TOOL_CACHE is disabled.
+
+    Unset arguments are read from the TOOL_CACHE* environment variables; the
+    SQLite tier is only used when a path is configured. TOOL_CACHE_TOOLS lists
+    the (read-only) tools whose results are cached.
+    """
+    if os.getenv("TOOL_CACHE", "true").lower() != "true":
+        return None
+    tools = [name.strip() for name in os.getenv("TOOL_CACHE_TOOLS", ",".join(DEFAULT_CACHED_TOOLS)).split(",")]
+    # 0 is a valid TTL (entries expire at once), so only None falls back to the environment
+    ttl = ttl if ttl is not None else float(os.getenv("TOOL_CACHE_TTL_SECONDS", "3600"))
+    max_entries = max_entries if max_entries is not None else int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "512"))
+    path = path or os.getenv("TOOL_CACHE_PATH")
+    disk = SQLiteCache(path, ttl=ttl) if path else None
+    return ToolResultCache(MemoryCache(max_entries=max_entries, ttl=ttl), disk, tools=[name for name in tools if name])
+
+
+def create_llm_cache(
+    backend: Optional[str] = None,
+    max_entries: Optional[int] = None,
+    path: Optional[str] = None,
+) -> Optional[LLMResponseCache]:
+    """
+    Build the LLM response cache, or None unless LLM_CACHE is enabled (opt-in).
+
+    `backend` is "memory" or "sqlite"; the SQLite backend keeps a memory tier in front.
+    Unset arguments are read from the LLM_CACHE* environment variables.
+    """
+    if os.getenv("LLM_CACHE", "false").lower() != "true":
+        return None
+    backend = backend or os.getenv("LLM_CACHE_BACKEND", "memory")
+    max_entries = max_entries if max_entries is not None else int(os.getenv("LLM_CACHE_MAX_ENTRIES", "256"))
+    ttl = float(os.environ["LLM_CACHE_TTL_SECONDS"]) if os.getenv("LLM_CACHE_TTL_SECONDS") else None
+    if backend == "memory":
+        disk = None
+    elif backend == "sqlite":
+        path = path or os.getenv("LLM_CACHE_PATH", "llm.cache.sqlite")
+        disk = SQLiteCache(path, ttl=ttl)
+    else:
+        raise ValueError(f"Unsupported LLM cache backend: {backend}")
+    return LLMResponseCache(MemoryCache(max_entries=max_entries, ttl=ttl), disk)
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.constants import TAG_NOSTREAM
+
+from .cache import MemoryCache
+
+SUMMARY_INSTRUCTIONS = """You maintain a running summary of a software planning conversation \
+between a user and an assistant. Merge the new messages into the existing summary. Keep every \
+decision, requirement, design choice, open question and the user's language preference. \
+Reply with the updated summary only."""
+
+
+class ContextWindowManager:
+    """Keeps the model context within a token budget by folding old turns into a summary.
+
+    The messages in the graph state are never removed. The manager only records
+    where the context window starts (`summary_upto`) and the summary of
+    everything before it. Folding is incremental: only messages between the
+    previous and the new window start are sent to the summarizer. Summaries
+    are also cached by a rolling hash of the folded messages, so requests that
+    resend their history reuse them instead of summarizing again.
+    """
+
+    def __init__(
+        self,
+        summarizer: Any,
+        token_budget: int = 16000,
+        keep_ratio: float = 0.5,
+        cache_entries: int = 1024,
+    ) -> None:
+        self.summarizer = summarizer
+        self.token_budget = token_budget
+        # After folding, the window is cut down to this share of the budget so
+        # the next turns fit without summarizing again
+        self.keep_ratio = keep_ratio
+        self.summaries = MemoryCache(max_entries=cache_entries)
+        self.turns = 0
+        self.summarizations = 0
+        self.tokens_saved = 0
+
+    @staticmethod
+    def _prefix_hashes(messages: List[BaseMessage]) -> List[str]:
+        """Rolling hashes: element k identifies messages[:k + 1]."""
+        hashes = []
+        digest = b""
+        for message in messages:
+            encoded = json.dumps(
+                [message.type, message.content, getattr(message, "tool_calls", None)],
+                sort_keys=True,
+                default=str,
+            )
+            digest = hashlib.sha256(digest + encoded.encode("utf-8")).digest()
+            hashes.append(digest.hex())
+        return hashes
+
+    def _window_start(self, messages: List[BaseMessage], summary_upto: int) -> int:
+        """Index of the first kept message, on a human turn so tool call pairs stay together."""
+        target = int(self.token_budget * self.keep_ratio)
+        tokens = 0
+        start = len(messages)
+        for index in range(len(messages) - 1, summary_upto - 1, -1):
+            tokens += count_tokens_approximately([messages[index]])
+            if tokens > target:
+                break
+            start = index
+        for index in range(start, len(messages)):
+            if isinstance(messages[index], HumanMessage):
+                return index
+        # Always keep the latest human turn
+        for index in range(len(messages) - 1, summary_upto - 1, -1):
+            if isinstance(messages[index], HumanMessage):
+                return index
+        return summary_upto
+
+    def _cached_summary(
+        self, messages: List[BaseMessage], hashes: List[str], summary: str, summary_upto: int
+    ) -> Tuple[str, int]:
+        if summary_upto:
+            return summary, summary_upto
+        for index in range(len(messages) - 1, 0, -1):
+            cached = self.summaries.get(hashes[index - 1])
+            if cached is not None:
+                return cached, index
+        return "", 0
+
+    def _summary_request(self, summary: str, messages: List[BaseMessage]) -> List[BaseMessage]:
+        transcript = "\n".join(f"{message.type}: {message.content}" for message in messages)
+        return [
+            SystemMessage(content=SUMMARY_INSTRUCTIONS),
+            HumanMessage(content=f"Current summary:\n{summary or '(empty)'}\n\nNew messages:\n{transcript}"),
+        ]
+
+    def _plan(self, state: Dict[str, Any]) -> Tuple[Optional[Tuple[int, int]], Dict[str, Any]]:
+        """
+        Work out which messages to fold for this turn.
+
+        Returns:
+            ((fold_from, fold_to) or None when nothing needs folding, state fields so far)
+        """
+        messages = state["messages"]
+        hashes = self._prefix_hashes(messages)
+        summary, summary_upto = self._cached_summary(
+            messages, hashes, state.get("summary", ""), state.get("summary_upto", 0)
+        )
+        fields = {"summary": summary, "summary_upto": summary_upto, "_hashes": hashes}
+        window_tokens = count_tokens_approximately(messages[summary_upto:])
+        if self.token_budget <= 0 or window_tokens <= self.token_budget:
+            return None, fields
+        start = self._window_start(messages, summary_upto)
+        if start <= summary_upto:
+            return None, fields
+        return (summary_upto, start), fields
+
+    def _finish(self, state: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        hashes = fields.pop("_hashes")
+        if fields["summary_upto"]:
+            self.summaries.set(hashes[fields["summary_upto"] - 1], fields["summary"])
+        full_tokens = count_tokens_approximately(messages)
+        context_tokens = count_tokens_approximately(self.context_messages({**state, **fields}))
+        fields["context_tokens_saved"] = max(full_tokens - context_tokens, 0)
+        self.turns += 1
+        self.tokens_saved += fields["context_tokens_saved"]
+        return fields
+
+    async def anode(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        fold, fields = self._plan(state)
+        if fold is not None:
+            request = self._summary_request(fields["summary"], state["messages"][fold[0]:fold[1]])
+            response = await self.summarizer.ainvoke(request, config={"tags": [TAG_NOSTREAM]})
+            fields["summary"], fields["summary_upto"] = response.content, fold[1]
+            self.summarizations += 1
+        return self._finish(state, fields)
+
+    def node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        fold, fields = self._plan(state)
+        if fold is not None:
+            request = self._summary_request(fields["summary"], state["messages"][fold[0]:fold[1]])
+            response = self.summarizer.invoke(request, config={"tags": [TAG_NOSTREAM]})
+            fields["summary"], fields["summary_upto"] = response.content, fold[1]
+            self.summarizations += 1
+        return self._finish(state, fields)
+
+    @staticmethod
+    def context_messages(state: Dict[str, Any]) -> List[BaseMessage]:
+        """The messages to send to the model: summary of older turns plus the window."""
+        messages = state["messages"][state.get("summary_upto", 0):]
+        if summary := state.get("summary"):
+            return [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"), *messages]
+        return list(messages)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "token_budget": self.token_budget,
+            "turns": self.turns,
+            "summarizations": self.summarizations,
+            "tokens_saved": self.tokens_saved,
+            "cached_summaries": len(self.summaries),
+        }
+
+
+def create_context_window_manager(summarizer: Any) -> Optional[ContextWindowManager]:
+    """
+    Build the context window manager, or None when CONTEXT_TOKEN_BUDGET is 0.
+    """
+    token_budget = int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000"))
+    if token_budget <= 0:
+        return None
+    keep_ratio = float(os.getenv("CONTEXT_KEEP_RATIO", "0.5"))
+    return ContextWindowManager(summarizer, token_budget=token_budget, keep_ratio=keep_ratio)
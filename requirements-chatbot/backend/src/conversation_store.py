@@ -0,0 +1,176 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_MAX_THREADS = 1000
+DEFAULT_SQLITE_PATH = "conversations.sqlite"
+
+
+class LRUInMemorySaver(InMemorySaver):
+    """In-memory checkpointer that keeps at most `max_threads` threads.
+
+    Threads are ordered by last access; once the limit is exceeded the least
+    recently used thread is deleted together with its writes and blobs.
+    """
+
+    def __init__(self, max_threads: int = DEFAULT_MAX_THREADS, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.evictions = 0
+        self._order: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.RLock()
+
+    def _touch(self, thread_id: str) -> None:
+        with self._lock:
+            self._order[thread_id] = None
+            self._order.move_to_end(thread_id)
+            while len(self._order) > self.max_threads:
+                evicted, _ = self._order.popitem(last=False)
+                super().delete_thread(evicted)
+                self.evictions += 1
+
+    def get_tuple(self, config: RunnableConfig):
+        checkpoint_tuple = super().get_tuple(config)
+        if checkpoint_tuple is not None:
+            self._touch(str(config["configurable"]["thread_id"]))
+        return checkpoint_tuple
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self._lock:
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            self._touch(str(config["configurable"]["thread_id"]))
+        return next_config
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            super().delete_thread(thread_id)
+            self._order.pop(thread_id, None)
+
+    def has_thread(self, thread_id: str) -> bool:
+        return thread_id in self._order
+
+    def thread_count(self) -> int:
+        return len(self._order)
+
+
+class SQLiteWALSaver(SqliteSaver):
+    """SQLite checkpointer (WAL journal) usable from both sync and async graph runs.
+
+    The stock `SqliteSaver` only implements the sync interface; the async methods
+    here run the sync ones in a worker thread, the connection being shared
+    behind the saver's own lock.
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, **kwargs) -> None:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        super().__init__(conn, **kwargs)
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = ""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def has_thread(self, thread_id: str) -> bool:
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT 1 FROM checkpoints WHERE thread_id = ? LIMIT 1", (thread_id,))
+            return cur.fetchone() is not None
+
+    def thread_count(self) -> int:
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints")
+            return cur.fetchone()[0]
+
+
+class ConversationStore:
+    """Server-side conversation state keyed by thread ID.
+
+    Wraps a LangGraph checkpointer and keeps hit/miss counters for thread lookups.
+    """
+
+    def __init__(self, checkpointer: BaseCheckpointSaver, backend: str = "memory") -> None:
+        self.checkpointer = checkpointer
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def config_for(thread_id: str) -> Dict[str, Any]:
+        return {"configurable": {"thread_id": thread_id}}
+
+    def lookup(self, thread_id: str) -> bool:
+        """Return whether the thread has stored state, recording a hit or a miss."""
+        found = self.checkpointer.has_thread(thread_id)
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return found
+
+    async def alookup(self, thread_id: str) -> bool:
+        if isinstance(self.checkpointer, InMemorySaver):
+            return self.lookup(thread_id)
+        return await asyncio.to_thread(self.lookup, thread_id)
+
+    def delete(self, thread_id: str) -> None:
+        self.checkpointer.delete_thread(thread_id)
+
+    def size(self) -> int:
+        return self.checkpointer.thread_count()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": self.backend,
+            "threads": self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+        if isinstance(self.checkpointer, LRUInMemorySaver):
+            stats["max_threads"] = self.checkpointer.max_threads
+            stats["evictions"] = self.checkpointer.evictions
+        return stats
+
+
+def create_conversation_store(
+    backend: Optional[str] = None,
+    max_threads: Optional[int] = None,
+    path: Optional[str] = None,
+) -> ConversationStore:
+    """
+    Build a conversation store for the given backend ("memory" or "sqlite").
+    
+    Unset arguments are read from the CONVERSATION_STORE* environment variables.
+    """
+    backend = backend or os.getenv("CONVERSATION_STORE", "memory")
+    if backend == "memory":
+        max_threads = max_threads or int(os.getenv("CONVERSATION_STORE_MAX_THREADS", DEFAULT_MAX_THREADS))
+        return ConversationStore(LRUInMemorySaver(max_threads=max_threads), backend)
+    if backend == "sqlite":
+        path = path or os.getenv("CONVERSATION_STORE_PATH", DEFAULT_SQLITE_PATH)
+        return ConversationStore(SQLiteWALSaver(path), backend)
+    raise ValueError(f"Unsupported conversation store backend: {backend}")
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import tool
+from langgraph.config import get_stream_writer
+from langgraph.constants import TAG_NOSTREAM
+from langgraph.types import Send
+from pydantic import BaseModel, Field
+
+WRITE_DOCUMENT = "write_document"
+
+WRITE_SECTION_INSTRUCTIONS = """Write section {number} of {count} of the document "{title}": {section}.
+{brief}
+
+Outline of the whole document:
+{outline}
+
+The other sections are written separately. Cover only this one, starting with its "## {section}" \
+heading, and do not repeat content the outline assigns to other sections. Do not call tools."""
+
+
+class OutlineSection(BaseModel):
+    title: str = Field(description="Section heading")
+    brief: str = Field(description="What the section must cover")
+
+
+@tool(WRITE_DOCUMENT)
+def write_document(title: str, sections: List[OutlineSection]) -> str:
+    """Write a long document, such as a complete design or implementation plan, from its outline. The sections are written in parallel and merged in outline order, which is much faster than writing the document yourself. Use it instead of answering with the document; the merged document becomes your answer."""
+    # The sections are written by the graph's write_section nodes
+    return f"Writing {len(sections)} sections."
+
+
+def merge_drafts(left: Optional[List[Dict[str, Any]]], right: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """State reducer for sections written in parallel; an update of None clears them."""
+    if right is None:
+        return []
+    return [*(left or []), *right]
+
+
+def _outline_call(messages: List[Any]) -> Tuple[Optional[int], Optional[Dict[str, Any]]]:
+    """Position of the model message calling `write_document`, and the call, after its tools ran."""
+    for position in range(len(messages) - 1, -1, -1):
+        message = messages[position]
+        if isinstance(message, ToolMessage):
+            continue
+        for tool_call in getattr(message, "tool_calls", None) or ():
+            if tool_call["name"] == WRITE_DOCUMENT:
+                return position, tool_call
+        break
+    return None, None
+
+
+class DocumentWriter:
+    """Writes the sections of a long document concurrently and merges them.
+
+    The model answers with an outline by calling `write_document`. `fan_out`
+    turns it into one `Send` per section; each write_section node writes its
+    section with the same prompts and context as the calling node, and the
+    merge node joins the sections in outline order into one answer. At most
+    `max_concurrency` sections are written at a time, across all runs.
+
+    Each finished section is also written to the "custom" stream, so a
+    streaming client can show sections as they complete.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        context: Callable[[Dict[str, Any]], Tuple[str, str, List]],
+        max_concurrency: int = 4,
+    ) -> None:
+        self.model = model
+        # state -> (system prefix, prefix hash, messages), as for the calling node
+        self.context = context
+        self.max_concurrency = max_concurrency
+        self._async_limit: Optional[asyncio.Semaphore] = None
+        self._sync_limit = threading.BoundedSemaphore(max_concurrency)
+
+    def fan_out(self, state: Dict[str, Any]) -> List[Send]:
+        """One write_section task per outline section, or none when the last tool calls hold no outline."""
+        position, tool_call = _outline_call(state["messages"])
+        if tool_call is None:
+            return []
+        sections = [OutlineSection.model_validate(section) for section in tool_call["args"].get("sections") or ()]
+        title = tool_call["args"].get("title") or ""
+        outline = "\n".join(f"{number}. {section.title}: {section.brief}" for number, section in enumerate(sections, 1))
+        # The sections are written from the conversation up to the outline call
+        base = {**state, "messages": state["messages"][:position]}
+        return [
+            Send(
+                "write_section",
+                {
+                    **base,
+                    "draft": {
+                        "index": index,
+                        "count": len(sections),
+                        "title": title,
+                        "section": section.title,
+                        "brief": section.brief,
+                        "outline": outline,
+                    },
+                },
+            )
+            for index, section in enumerate(sections)
+        ]
+
+    def _request(self, state: Dict[str, Any]) -> List[Any]:
+        draft = state["draft"]
+        prefix, _, context = self.context(state)
+        instructions = WRITE_SECTION_INSTRUCTIONS.format(number=draft["index"] + 1, **draft)
+        return [SystemMessage(content=prefix), *context, HumanMessage(content=instructions)]
+
+    def _written(self, state: Dict[str, Any], text: str) -> Dict[str, Any]:
+        draft = state["draft"]
+        section = {"index": draft["index"], "title": draft["section"], "text": text.strip()}
+        get_stream_writer()({"type": "section", "count": draft["count"], **section})
+        return {"drafts": [section]}
+
+    async def anode(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if self._async_limit is None:
+            self._async_limit = asyncio.Semaphore(self.max_concurrency)
+        async with self._async_limit:
+            response = await self.model.ainvoke(self._request(state), config={"tags": [TAG_NOSTREAM]})
+        return self._written(state, response.text())
+
+    def node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        with self._sync_limit:
+            response = self.model.invoke(self._request(state), config={"tags": [TAG_NOSTREAM]})
+        return self._written(state, response.text())
+
+    @staticmethod
+    def merge(state: Dict[str, Any]) -> Dict[str, Any]:
+        """The written sections as one answer, in outline order."""
+        _, tool_call = _outline_call(state["messages"])
+        title = tool_call["args"].get("title") if tool_call else None
+        sections = [draft["text"] for draft in sorted(state.get("drafts") or (), key=lambda draft: draft["index"])]
+        document = "\n\n".join([f"# {title}", *sections] if title else sections)
+        return {"messages": [AIMessage(content=document)], "drafts": None}
+
+
+def create_document_writer(model: Any, context: Callable) -> Optional[DocumentWriter]:
+    """
+    Build the document writer, or None unless DOCUMENT_FANOUT_CONCURRENCY is set above 0.
+
+    Off by default: with fan-out the document is only streamed section by
+    section, after the outline call, so its first part arrives later than
+    the first token of an answer written in one call.
+    """
+    max_concurrency = int(os.getenv("DOCUMENT_FANOUT_CONCURRENCY", "0"))
+    if max_concurrency <= 0:
+        return None
+    return DocumentWriter(model, context, max_concurrency=max_concurrency)
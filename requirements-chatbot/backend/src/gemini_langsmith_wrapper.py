@@ -1,6 +1,25 @@
-from typing import Any, Dict, List, Optional, Union
-from langsmith import traceable
+import datetime
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import aclosing, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, ContextManager, Dict, Iterator, List, Optional, TypeVar
+
+from langsmith import utils as ls_utils
+from langsmith.run_helpers import get_current_run_tree, tracing_context
+from langsmith.run_trees import RunTree
+
+from .serializer import serialize
+
 KVMap = Dict[str, Any]
+T = TypeVar("T")
+logger = logging.getLogger(__name__)
 
 """
 Thanks to https://github.com/langchain-ai/langsmith-sdk/issues/1722#issuecomment-3146440473 and Claude Code
@@ -19,18 +38,262 @@ llm = wrap_gemini(ChatGoogleGenerativeAI(
 
 llm.invoke("Hellow world")
 
-# Or in a node of Langraph
-def _chatbot_node(self, state: State) -> Dict[str, Any]:
-        response = self.llm.invoke(state["messages"])
+# Or in an async node of Langraph
+async def _chatbot_node(self, state: State) -> Dict[str, Any]:
+        response = await self.llm.ainvoke(state["messages"])
         return {"messages": [response]}
+
+`ainvoke`, `stream` and `astream` are traced as well, with the call
+signatures of the wrapped model; streamed chunks are added one by one to a
+`GeminiStreamAggregator` (the "aggregator" option) and traced as a single
+response. `bind_tools`, `bind` and
+`with_config` return a wrapped runnable too, so the runnable that is
+actually called is the traced one.
+
+Traces are exported from a background thread. Whole requests are sampled up
+front with `TraceSampler.sample()` (GEMINI_TRACE_SAMPLE_RATE); run a request
+that is not sampled inside `unsampled()`, which still traces its failed and
+slow Gemini calls, or one that opted out inside `no_tracing()` (iterate a
+stream through `untraced()`), or pass `langsmith_extra={"trace": False}` to
+skip one call.
 """
 
+# Set by `unsampled()`: wrapped calls are buffered and traced only when they fail or are slow
+_forced_only: ContextVar[bool] = ContextVar("gemini_trace_forced_only", default=False)
+
+
+@contextmanager
+def no_tracing() -> Iterator[None]:
+    """Turn LangSmith tracing off inside the block (per-request opt-out).
+
+    Applies to LangChain's tracer as well as to wrapped Gemini calls, including
+    the tasks and threads a graph run starts inside the block.
+    """
+    with tracing_context(enabled=False):
+        yield
+
+
+@contextmanager
+def unsampled() -> Iterator[None]:
+    """Run a request that was not sampled: like `no_tracing()`, but wrapped Gemini
+    calls that fail or take at least the sampler's `slow_seconds` are still traced.
+    """
+    token = _forced_only.set(ls_utils.tracing_is_enabled())
+    try:
+        with no_tracing():
+            yield
+    finally:
+        _forced_only.reset(token)
+
+
+async def untraced(
+    iterator: AsyncIterator[T], context: Callable[[], ContextManager[Any]] = no_tracing
+) -> AsyncIterator[T]:
+    """Iterate an async stream inside `context` (tracing off) for every step, whichever task drives it."""
+    async with aclosing(iterator):
+        while True:
+            with context():
+                try:
+                    item = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+            yield item
+
+
+class TraceSampler:
+    """Decides which requests and calls are traced.
+
+    `sample` decides up front for a whole request: traced with probability
+    `rate`. `should_trace` decides after a single call: calls of sampled
+    requests are traced, and so are failed calls and calls taking at least
+    `slow_seconds` of requests that were not.
+    """
+
+    def __init__(self, rate: float = 1.0, slow_seconds: float = 10.0, rng: Callable[[], float] = random.random):
+        self.rate = rate
+        self.slow_seconds = slow_seconds
+        self.rng = rng
+
+    def sample(self) -> bool:
+        return self.rate >= 1.0 or self.rng() < self.rate
+
+    def should_trace(self, duration: float, error: Optional[BaseException], sampled: bool) -> bool:
+        return sampled or error is not None or duration >= self.slow_seconds
+
+
+def create_trace_sampler() -> TraceSampler:
+    """Sampler configured from GEMINI_TRACE_SAMPLE_RATE and GEMINI_TRACE_SLOW_SECONDS."""
+    return TraceSampler(
+        rate=float(os.getenv("GEMINI_TRACE_SAMPLE_RATE", "1.0")),
+        slow_seconds=float(os.getenv("GEMINI_TRACE_SLOW_SECONDS", "10")),
+    )
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def bound_payload(value: Any, max_chars: int) -> Any:
+    """Replace base64 data URLs by their hash and truncate strings longer than `max_chars`."""
+    if isinstance(value, str):
+        if value.startswith("data:") and ";base64," in value:
+            prefix = value.split(";base64,", 1)[0]
+            return f"{prefix};base64,<sha256:{_digest(value)}, {len(value)} chars>"
+        if len(value) > max_chars:
+            return f"{value[:max_chars]}...<truncated, sha256:{_digest(value)}, {len(value)} chars>"
+        return value
+    if isinstance(value, dict):
+        return {key: bound_payload(item, max_chars) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [bound_payload(item, max_chars) for item in value]
+    return value
+
+
+class TraceExporter:
+    """Exports sampled traces to LangSmith from a background thread.
+
+    Calls only put a record of references on a bounded queue; the input and
+    output processing, payload bounding and upload happen in batches on the
+    exporter thread. When the queue is full new records are dropped and
+    counted instead of slowing down the caller.
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 1000,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_payload_chars: int = 4000,
+        client: Any = None,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_payload_chars = max_payload_chars
+        self.client = client
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.submitted = 0
+        self.dropped = 0
+        self.exported = 0
+        self.failed = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, record: Dict[str, Any]) -> bool:
+        if self._thread is None:
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="gemini-trace-exporter", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            for record in batch:
+                try:
+                    self._export(record)
+                    self.exported += 1
+                except Exception:
+                    self.failed += 1
+                    logger.debug("Trace export failed", exc_info=True)
+                finally:
+                    self.queue.task_done()
+
+    def _process(self, fn: Optional[Callable[[KVMap], KVMap]], payload: KVMap) -> KVMap:
+        if fn is not None:
+            try:
+                payload = fn(payload)
+            except Exception:
+                logger.debug("Trace payload processing failed", exc_info=True)
+        return bound_payload(serialize(payload), self.max_payload_chars)
+
+    def _export(self, record: Dict[str, Any]) -> None:
+        options = record["options"]
+        output = record["output"]
+        if record["streaming"] and output is not None:
+            # The aggregator the chunks were added to while streaming
+            output = output.result()
+        inputs = self._process(options.get("process_inputs"), record["inputs"])
+        outputs = None
+        if record["error"] is None:
+            outputs = self._process(
+                options.get("process_outputs"),
+                output if isinstance(output, dict) else {"output": output},
+            )
+        # Forced: traced although its request was not sampled, because it failed or was slow
+        extra = {"metadata": {"sample_rate": record["sample_rate"], "forced": not record["sampled"]}}
+        invocation_params_fn = options.get("get_invocation_params")
+        if invocation_params_fn:
+            extra["invocation_params"] = invocation_params_fn(record["inputs"])
+        run_args = {
+            "name": options.get("name", "ChatGemini"),
+            "run_type": "llm",
+            "inputs": inputs,
+            "start_time": record["start_time"],
+            "extra": extra,
+        }
+        parent = record["parent"]
+        if parent is not None:
+            run = parent.create_child(**run_args)
+        else:
+            run = RunTree(**run_args, client=self.client) if self.client else RunTree(**run_args)
+        run.end(outputs=outputs, error=record["error"], end_time=record["end_time"])
+        run.post()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until queued records are exported; returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.queue.qsize(),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "exported": self.exported,
+            "failed": self.failed,
+        }
+
+
 class PatchedGeminiClient:
-    """Wrapper for Google GenAI client with LangSmith tracing."""
+    """Wrapper for a LangChain Gemini chat model with sampled LangSmith tracing.
+
+    The traced methods keep the model's call signatures. The wrapped call
+    itself is never delayed by tracing: the trace decision is made after the
+    call, and traced calls are handed to a TraceExporter. Inside `unsampled()`
+    calls are buffered and only handed over when they failed or were slow.
+    """
     
-    def __init__(self, original_client: Any, options: Optional[Dict[str, Any]] = None):
+    def __init__(
+        self,
+        original_client: Any,
+        options: Optional[Dict[str, Any]] = None,
+        sampler: Optional[TraceSampler] = None,
+        exporter: Optional[TraceExporter] = None,
+    ):
         self.original_client = original_client
         self.options = options or {}
+        self.sampler = sampler or TraceSampler()
+        self.exporter = exporter or TraceExporter()
         
         if hasattr(original_client.invoke, '_langsmith_traced'):
             raise ValueError(
@@ -38,37 +301,106 @@ class PatchedGeminiClient:
             )
         
         self.invoke = self._create_traced_generate_content()
+        self.ainvoke = self._create_traced_agenerate_content()
+        self.stream = self._create_traced_stream_generate_content()
+        self.astream = self._create_traced_astream_generate_content()
     
-    def _create_traced_generate_content(self):
-        """Create a traced version of the generate_content method."""
-        @traceable(
-            name="ChatGemini",
-            run_type="llm",
-            **self.options
+    def _rewrap(self, runnable: Any) -> "PatchedGeminiClient":
+        return PatchedGeminiClient(runnable, self.options, self.sampler, self.exporter)
+    
+    def bind_tools(self, tools: Any, **kwargs) -> "PatchedGeminiClient":
+        """Bind tools on the wrapped model; the returned binding is traced as well."""
+        return self._rewrap(self.original_client.bind_tools(tools, **kwargs))
+    
+    def bind(self, **kwargs) -> "PatchedGeminiClient":
+        return self._rewrap(self.original_client.bind(**kwargs))
+    
+    def with_config(self, config: Optional[Dict[str, Any]] = None, **kwargs) -> "PatchedGeminiClient":
+        return self._rewrap(self.original_client.with_config(config, **kwargs))
+    
+    def _model_name(self) -> Optional[str]:
+        # A RunnableBinding (bind_tools) keeps the model in `bound`
+        model = getattr(self.original_client, "bound", self.original_client)
+        return getattr(model, "model", None) or getattr(model, "model_name", None)
+    
+    def _build_request_params(self, input: Any, **kwargs) -> Dict[str, Any]:
+        return {
+            "messages": input,
+            "model": self._model_name(),
+            **kwargs
+        }
+    
+    @staticmethod
+    def _tracing_wanted(langsmith_extra: Optional[Dict[str, Any]]) -> bool:
+        if (langsmith_extra or {}).get("trace") is False:
+            return False
+        return ls_utils.tracing_is_enabled()
+    
+    def _begin(self, langsmith_extra: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Start a trace record for a call, or None when the call cannot be traced."""
+        if self._tracing_wanted(langsmith_extra):
+            sampled = True
+        elif (langsmith_extra or {}).get("trace") is not False and _forced_only.get():
+            sampled = False
+        else:
+            return None
+        return {
+            "started": time.perf_counter(),
+            "start_time": datetime.datetime.now(datetime.timezone.utc),
+            "sampled": sampled,
+            # The parent run is only visible on the calling thread/task; the
+            # graph run of an unsampled request is not traced
+            "parent": ((langsmith_extra or {}).get("run_tree") or get_current_run_tree()) if sampled else None,
+        }
+    
+    def _aggregator(self, record: Optional[Dict[str, Any]]) -> Any:
+        """Aggregator the chunks of a traced streamed call are added to as they arrive."""
+        if record is None:
+            return None
+        return self.options.get("aggregator", GeminiStreamAggregator)()
+    
+    def _finish(
+        self,
+        record: Optional[Dict[str, Any]],
+        request_params: Dict[str, Any],
+        output: Any,
+        error: Optional[BaseException],
+        streaming: bool = False,
+    ) -> None:
+        if record is None:
+            return
+        if not self.sampler.should_trace(time.perf_counter() - record.pop("started"), error, record["sampled"]):
+            return
+        record.update(
+            inputs=request_params,
+            output=output,
+            error=None if error is None else f"{type(error).__name__}: {error}",
+            end_time=datetime.datetime.now(datetime.timezone.utc),
+            streaming=streaming,
+            options=self.options,
+            sample_rate=self.sampler.rate,
         )
+        self.exporter.submit(record)
+    
+    def _create_traced_generate_content(self):
+        """Create a traced version of the invoke method."""
         def traced_generate_content(
-            contents: Union[str, List[Dict[str, Any]]],
-            model: str,
-            generation_config: Optional[Dict[str, Any]] = None,
+            input: Any,
+            config: Optional[Dict[str, Any]] = None,
+            *,
             langsmith_extra: Optional[Dict[str, Any]] = None,
             **kwargs
         ):
-            request_params = {
-                "contents": contents,
-                "model": model,
-                **kwargs
-            }
-            
-            if generation_config:
-                request_params["generation_config"] = generation_config
-            
-            # Add langsmith metadata if provided
-            if langsmith_extra:
-                # This would be handled by the traceable decorator
-                pass
+            request_params = self._build_request_params(input, **kwargs)
+            record = self._begin(langsmith_extra)
             
             # Call the original method
-            response = self.original_client.invoke(**request_params)
+            try:
+                response = self.original_client.invoke(input, config, **kwargs)
+            except Exception as e:
+                self._finish(record, request_params, None, e)
+                raise
+            self._finish(record, request_params, response, None)
             
             return response
         
@@ -77,59 +409,321 @@ class PatchedGeminiClient:
         
         return traced_generate_content
     
+    def _create_traced_agenerate_content(self):
+        """Create a traced version of the ainvoke method."""
+        async def traced_agenerate_content(
+            input: Any,
+            config: Optional[Dict[str, Any]] = None,
+            *,
+            langsmith_extra: Optional[Dict[str, Any]] = None,
+            **kwargs
+        ):
+            request_params = self._build_request_params(input, **kwargs)
+            record = self._begin(langsmith_extra)
+            try:
+                response = await self.original_client.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                self._finish(record, request_params, None, e)
+                raise
+            self._finish(record, request_params, response, None)
+            return response
+        
+        traced_agenerate_content._langsmith_traced = True
+        
+        return traced_agenerate_content
+    
+    def _create_traced_stream_generate_content(self):
+        """Create a traced version of the stream method."""
+        def traced_stream_generate_content(
+            input: Any,
+            config: Optional[Dict[str, Any]] = None,
+            *,
+            langsmith_extra: Optional[Dict[str, Any]] = None,
+            **kwargs
+        ):
+            request_params = self._build_request_params(input, **kwargs)
+            record = self._begin(langsmith_extra)
+            aggregator = self._aggregator(record)
+            try:
+                for chunk in self.original_client.stream(input, config, **kwargs):
+                    if aggregator is not None:
+                        aggregator.add(chunk)
+                    yield chunk
+            except Exception as e:
+                self._finish(record, request_params, aggregator, e, streaming=True)
+                raise
+            self._finish(record, request_params, aggregator, None, streaming=True)
+        
+        traced_stream_generate_content._langsmith_traced = True
+        
+        return traced_stream_generate_content
+    
+    def _create_traced_astream_generate_content(self):
+        """Create a traced version of the astream method."""
+        async def traced_astream_generate_content(
+            input: Any,
+            config: Optional[Dict[str, Any]] = None,
+            *,
+            langsmith_extra: Optional[Dict[str, Any]] = None,
+            **kwargs
+        ):
+            request_params = self._build_request_params(input, **kwargs)
+            record = self._begin(langsmith_extra)
+            aggregator = self._aggregator(record)
+            try:
+                async for chunk in self.original_client.astream(input, config, **kwargs):
+                    if aggregator is not None:
+                        aggregator.add(chunk)
+                    yield chunk
+            except Exception as e:
+                self._finish(record, request_params, aggregator, e, streaming=True)
+                raise
+            self._finish(record, request_params, aggregator, None, streaming=True)
+        
+        traced_astream_generate_content._langsmith_traced = True
+        
+        return traced_astream_generate_content
+    
     def __getattr__(self, name):
         """Delegate other attributes to the original client."""
         return getattr(self.original_client, name)
 
 
-def _combine_gemini_content_chunks(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Combine multiple Gemini response chunks into a single response."""
-    if not chunks:
-        return {"candidates": [{"content": {"parts": [{"text": ""}]}}]}
-    
-    aggregated_output = chunks[-1].copy()
-    combined_text = ""
-    
-    for chunk in chunks:
-        candidates = chunk.get("candidates", [])
-        if candidates and len(candidates) > 0:
-            content = candidates[0].get("content", {})
-            parts = content.get("parts", [])
-            for part in parts:
-                if "text" in part and part["text"]:
-                    combined_text += part["text"]
-    
-    # Update the final chunk with the combined text
-    if (aggregated_output.get("candidates") and 
-        len(aggregated_output["candidates"]) > 0 and
-        aggregated_output["candidates"][0].get("content", {}).get("parts")):
-        aggregated_output["candidates"][0]["content"]["parts"] = [{"text": combined_text}]
-    
-    return aggregated_output
+class _FunctionCall:
+    def __init__(self, name: str, call_id: Optional[str]):
+        self.name = name
+        self.id = call_id
+        self.args: Dict[str, Any] = {}
+        self.arg_fragments: List[str] = []
+
+    def add_args(self, args: Any) -> None:
+        if isinstance(args, dict):
+            self.args.update(args)
+        elif isinstance(args, str):
+            self.arg_fragments.append(args)
 
+    def merged_args(self) -> Any:
+        if not self.arg_fragments:
+            return self.args
+        text = "".join(self.arg_fragments)
+        try:
+            return {**self.args, **json.loads(text)}
+        except (ValueError, TypeError):
+            return text
 
-def gemini_aggregator(chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
-    return _combine_gemini_content_chunks(chunks)
+
+class _Candidate:
+    def __init__(self):
+        self.text: List[str] = []
+        self.calls: List[_FunctionCall] = []
+        self.calls_by_id: Dict[str, _FunctionCall] = {}
+        self.role = "model"
+        self.finish_reason = None
+
+    def add_function_call(self, function_call: Dict[str, Any]) -> None:
+        name = function_call.get("name")
+        call_id = function_call.get("id")
+        if call_id and call_id in self.calls_by_id:
+            call = self.calls_by_id[call_id]
+        elif name or not self.calls:
+            call = _FunctionCall(name or "", call_id)
+            self.calls.append(call)
+            if call_id:
+                self.calls_by_id[call_id] = call
+        else:
+            # A fragment without a name continues the previous call
+            call = self.calls[-1]
+        call.add_args(function_call.get("args"))
+
+
+class GeminiStreamAggregator:
+    """Combines the streamed chunks of one Gemini call into one response.
+
+    The traced stream methods `add` each chunk as it arrives, so a call's
+    chunks are not kept, and `result` is built on the exporter thread;
+    `gemini_aggregator` does the same for a list of chunks. Text parts are
+    collected in lists and joined once; function call parts are merged per
+    call (a part with an unseen name or ID starts a call, other parts extend
+    its args). The latest finish reason and
+    top-level fields are kept, and usage is the last cumulative Gemini count
+    or the sum of LangChain usage deltas. Accepts Gemini REST dicts and
+    LangChain message chunks; the chunks themselves are never modified.
+    """
+
+    def __init__(self):
+        self._candidates: Dict[int, _Candidate] = {}
+        # Top-level fields other than candidates and usage (modelVersion, responseId, ...)
+        self._fields: Dict[str, Any] = {}
+        self._usage = None
+        self._message_chunks = False
+        self._content: List[str] = []
+        self._tool_calls: Dict[int, Dict[str, Any]] = {}
+        self._response_metadata: Dict[str, Any] = {}
+
+    def _candidate(self, index: int) -> _Candidate:
+        candidate = self._candidates.get(index)
+        if candidate is None:
+            candidate = self._candidates[index] = _Candidate()
+        return candidate
+
+    def add(self, chunk: Any) -> None:
+        if chunk.__class__ is not dict:
+            self._add_message_chunk(chunk)
+            return
+        # Most chunks only hold candidates; others also carry usage or top-level fields
+        if len(chunk) != 1 or "candidates" not in chunk:
+            self._add_fields(chunk)
+        position = 0
+        for data in chunk.get("candidates") or ():
+            index = data.get("index", position)
+            position += 1
+            candidate = self._candidates.get(index) or self._candidate(index)
+            if "finishReason" in data and data["finishReason"]:
+                candidate.finish_reason = data["finishReason"]
+            content = data.get("content")
+            if not content:
+                continue
+            if "role" in content:
+                candidate.role = content["role"]
+            text = candidate.text
+            for part in content.get("parts") or ():
+                if "text" in part:
+                    if part["text"]:
+                        text.append(part["text"])
+                else:
+                    function_call = part.get("functionCall") or part.get("function_call")
+                    if function_call:
+                        candidate.add_function_call(function_call)
+
+    def _add_fields(self, chunk: Dict[str, Any]) -> None:
+        for key, value in chunk.items():
+            if key not in ("candidates", "usageMetadata", "usage_metadata"):
+                self._fields[key] = value
+        usage = chunk.get("usageMetadata") or chunk.get("usage_metadata")
+        if usage:
+            # Gemini reports cumulative usage, the last one is the total
+            self._usage = usage
+
+    def _add_message_chunk(self, chunk: Any) -> None:
+        self._message_chunks = True
+        content = chunk.content
+        if content.__class__ is str:
+            if content:
+                self._content.append(content)
+        else:
+            for block in content:
+                text = block if isinstance(block, str) else block.get("text")
+                if text:
+                    self._content.append(text)
+        tool_call_chunks = getattr(chunk, "tool_call_chunks", None)
+        if tool_call_chunks:
+            for tool_call in tool_call_chunks:
+                index = tool_call.get("index")
+                if index is None:
+                    index = len(self._tool_calls)
+                merged = self._tool_calls.setdefault(index, {"name": None, "id": None, "args": []})
+                merged["name"] = merged["name"] or tool_call.get("name")
+                merged["id"] = merged["id"] or tool_call.get("id")
+                if tool_call.get("args"):
+                    merged["args"].append(tool_call["args"])
+        usage = getattr(chunk, "usage_metadata", None)
+        if usage:
+            from langchain_core.messages.ai import add_usage
+
+            # LangChain chunks carry usage deltas
+            self._usage = add_usage(self._usage, usage)
+        metadata = chunk.response_metadata
+        if metadata:
+            self._response_metadata.update(metadata)
+
+    def result(self) -> Any:
+        if self._message_chunks:
+            return self._message_result()
+        if not self._candidates:
+            return {"candidates": [{"content": {"parts": [{"text": ""}]}}]}
+        candidates = []
+        for index in sorted(self._candidates):
+            candidate = self._candidates[index]
+            parts: List[Dict[str, Any]] = []
+            if candidate.text:
+                parts.append({"text": "".join(candidate.text)})
+            for call in candidate.calls:
+                function_call = {"name": call.name, "args": call.merged_args()}
+                if call.id:
+                    function_call["id"] = call.id
+                parts.append({"functionCall": function_call})
+            data: Dict[str, Any] = {"index": index, "content": {"role": candidate.role, "parts": parts}}
+            if candidate.finish_reason:
+                data["finishReason"] = candidate.finish_reason
+            candidates.append(data)
+        aggregated = {**self._fields, "candidates": candidates}
+        if self._usage:
+            aggregated["usageMetadata"] = self._usage
+        return aggregated
+
+    def _message_result(self) -> Any:
+        from langchain_core.messages import AIMessageChunk
+
+        return AIMessageChunk(
+            content="".join(self._content),
+            tool_call_chunks=[
+                {
+                    "name": call["name"],
+                    "id": call["id"],
+                    "args": "".join(call["args"]),
+                    "index": index,
+                }
+                for index, call in sorted(self._tool_calls.items())
+            ],
+            usage_metadata=self._usage,
+            response_metadata=self._response_metadata,
+        )
+
+
+def gemini_aggregator(chunks: List[Any]) -> Any:
+    """Combine streamed Gemini chunks into a single response."""
+    aggregator = GeminiStreamAggregator()
+    for chunk in chunks:
+        aggregator.add(chunk)
+    return aggregator.result()
 
 
 def process_gemini_completion(outputs: KVMap) -> KVMap:
     """Process Gemini completion outputs for LangSmith."""
-    gemini_response = outputs.get("outputs", {})
+    gemini_response = outputs.get("outputs", outputs)
+    message = gemini_response.get("output")
+    if hasattr(message, "tool_calls"):
+        # LangChain message returned by a wrapped chat model
+        content = message.content
+        if not isinstance(content, str):
+            content = "".join(block if isinstance(block, str) else block.get("text", "") for block in content)
+        result = {"content": content, "role": "assistant"}
+        if message.tool_calls:
+            result["tool_calls"] = [{"name": call["name"], "args": call["args"]} for call in message.tool_calls]
+        if message.usage_metadata:
+            result["usage_metadata"] = dict(message.usage_metadata)
+        return result
     
-    # Extract the text content from the response
+    # Extract the text content and function calls from the response
     text_content = ""
+    tool_calls = []
     candidates = gemini_response.get("candidates", [])
     if candidates and len(candidates) > 0:
         content = candidates[0].get("content", {})
         parts = content.get("parts", [])
-        if parts and len(parts) > 0:
-            text_content = parts[0].get("text", "")
+        text_content = "".join(part["text"] for part in parts if part.get("text"))
+        tool_calls = [
+            {"name": part["functionCall"].get("name"), "args": part["functionCall"].get("args", {})}
+            for part in parts if part.get("functionCall")
+        ]
     
     # Return in chat-like format that LangSmith expects
     result = {
         "content": text_content,
         "role": "assistant"
     }
+    if tool_calls:
+        result["tool_calls"] = tool_calls
     
     # Add usage metadata if available
     usage_metadata = gemini_response.get("usageMetadata") or gemini_response.get("usage_metadata")
@@ -148,6 +742,15 @@ def process_gemini_completion(outputs: KVMap) -> KVMap:
 
 def process_gemini_inputs(inputs: KVMap) -> KVMap:
     """Process Gemini inputs for LangSmith."""
+    if "messages" in inputs:
+        # LangChain input of a wrapped chat model: a string, messages or a prompt value
+        from langchain_core.messages import convert_to_openai_messages
+
+        messages = inputs["messages"]
+        if hasattr(messages, "to_messages"):
+            messages = messages.to_messages()
+        return {"messages": convert_to_openai_messages(messages), "model": inputs.get("model")}
+    
     contents = inputs.get("contents")
     
     if not contents or not isinstance(contents, list):
@@ -212,7 +815,7 @@ def get_invocation_params(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         return None
     
     # Extract stop sequences if they exist in generation config
-    ls_stop = None
+    ls_stop = payload.get("stop")
     generation_config = payload.get("generation_config", {})
     if generation_config and "stop_sequences" in generation_config:
         ls_stop = generation_config["stop_sequences"]
@@ -227,10 +830,34 @@ def get_invocation_params(payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     }
 
 
-def wrap_gemini(gemini_client: Any, options: Optional[Dict[str, Any]] = None) -> PatchedGeminiClient:
+_default_exporter: Optional[TraceExporter] = None
+
+
+def default_trace_exporter() -> TraceExporter:
+    """Process-wide exporter, configured from the GEMINI_TRACE_* environment variables."""
+    global _default_exporter
+    if _default_exporter is None:
+        _default_exporter = TraceExporter(
+            max_queue=int(os.getenv("GEMINI_TRACE_QUEUE_SIZE", "1000")),
+            batch_size=int(os.getenv("GEMINI_TRACE_BATCH_SIZE", "50")),
+            flush_interval=float(os.getenv("GEMINI_TRACE_FLUSH_SECONDS", "1")),
+            max_payload_chars=int(os.getenv("GEMINI_TRACE_MAX_PAYLOAD_CHARS", "4000")),
+        )
+    return _default_exporter
+
+
+def wrap_gemini(
+    gemini_client: Any,
+    options: Optional[Dict[str, Any]] = None,
+    sampler: Optional[TraceSampler] = None,
+    exporter: Optional[TraceExporter] = None,
+) -> PatchedGeminiClient:
+    # Requests are sampled up front, so every call of a sampled request is traced; the
+    # sampler's `slow_seconds` picks the calls of unsampled requests traced anyway
+    sampler = sampler or create_trace_sampler()
     # Merge default options
     default_options = {
-        "aggregator": gemini_aggregator,
+        "aggregator": GeminiStreamAggregator,
         "process_inputs": process_gemini_inputs,
         "process_outputs": process_gemini_completion,
         "get_invocation_params": get_invocation_params,
@@ -239,4 +866,4 @@ def wrap_gemini(gemini_client: Any, options: Optional[Dict[str, Any]] = None) ->
     if options:
         default_options.update(options)
     
-    return PatchedGeminiClient(gemini_client, default_options)
\ No newline at end of file
+    return PatchedGeminiClient(gemini_client, default_options, sampler, exporter or default_trace_exporter())
\ No newline at end of file
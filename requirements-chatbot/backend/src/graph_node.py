@@ -1,24 +1,117 @@
+import asyncio
 import json
+from typing import Any, Dict, List, Optional
 
 from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from .cache import ToolResultCache
+from .metrics import EAGER_TOOL_CALLS
+
+# Config key of the EagerToolCalls of a graph run
+EAGER_TOOL_CALLS_KEY = "eager_tool_calls"
+
+
+class StreamingToolCalls:
+    """Finds the tool calls of a streamed model response whose arguments are complete.
+
+    Tool call chunks are merged per index. A call is complete once it has a
+    name and an ID and its argument fragments join into a JSON object: any
+    further fragment would make that JSON invalid.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Any, Dict[str, Any]] = {}
+
+    def add(self, chunk: Any) -> List[dict]:
+        """Add a message chunk; return the tool calls it completed."""
+        changed = []
+        for position, tool_call_chunk in enumerate(getattr(chunk, "tool_call_chunks", None) or ()):
+            index = tool_call_chunk.get("index")
+            if index is None:
+                index = tool_call_chunk.get("id") or (id(chunk), position)
+            call = self._calls.setdefault(index, {"name": None, "id": None, "args": [], "done": False})
+            if call["done"]:
+                continue
+            call["name"] = call["name"] or tool_call_chunk.get("name")
+            call["id"] = call["id"] or tool_call_chunk.get("id")
+            if tool_call_chunk.get("args"):
+                call["args"].append(tool_call_chunk["args"])
+            changed.append(call)
+        completed = []
+        for call in changed:
+            if call["done"] or not call["name"] or not call["id"] or not call["args"]:
+                continue
+            args = "".join(call["args"])
+            if not args.rstrip().endswith("}"):
+                continue
+            try:
+                parsed = json.loads(args)
+            except ValueError:
+                continue
+            if isinstance(parsed, dict):
+                call["done"] = True
+                completed.append({"name": call["name"], "args": parsed, "id": call["id"], "type": "tool_call"})
+        return completed
+
+
+class EagerToolCalls:
+    """Tool calls of one graph run started while the model is still streaming."""
+
+    def __init__(self, max_concurrency: Optional[int] = None) -> None:
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+    def cancel(self) -> None:
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
 
 
 class BasicToolNode:
-    """A node that runs the tools requested in the last AIMessage."""
+    """A node that runs the tools requested in the last AIMessage.
+
+    Called synchronously the tools run one after another. The async entry point
+    (`acall`) runs them concurrently, at most `max_concurrency` at a time, and
+    turns a tool that fails or exceeds its timeout into an error ToolMessage.
+    Successful results of the tools `cache` covers are memoized in it, when one is given.
 
-    def __init__(self, tools: list) -> None:
+    Tool calls started early with `start` (while the model is still
+    streaming) are picked up by `acall` instead of being run again.
+    """
+
+    def __init__(
+        self,
+        tools: list,
+        max_concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        timeouts: Optional[Dict[str, float]] = None,
+        cache: Optional[ToolResultCache] = None,
+    ) -> None:
         self.tools_by_name = {tool.name: tool for tool in tools}
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        # Per-tool overrides of the default timeout, keyed by tool name
+        self.timeouts = timeouts or {}
+        self.cache = cache
 
-    def __call__(self, inputs: dict):
+    def _last_message(self, inputs: dict):
         if messages := inputs.get("messages", []):
-            message = messages[-1]
-        else:
-            raise ValueError("No message found in input")
+            return messages[-1]
+        raise ValueError("No message found in input")
+
+    def __call__(self, inputs: dict):
+        message = self._last_message(inputs)
         outputs = []
         for tool_call in message.tool_calls:
-            tool_result = self.tools_by_name[tool_call["name"]].invoke(
-                tool_call["args"]
-            )
+            key = self._cache_key(tool_call)
+            tool_result = self.cache.get(key) if key else None
+            if tool_result is None:
+                tool_result = self.tools_by_name[tool_call["name"]].invoke(
+                    tool_call["args"]
+                )
+                if key and self.cache.storable(tool_result):
+                    self.cache.set(key, tool_result)
             outputs.append(
                 ToolMessage(
                     content=json.dumps(tool_result),
@@ -27,3 +120,84 @@ class BasicToolNode:
                 )
             )
         return {"messages": outputs}
+
+    def eager_calls(self) -> "EagerToolCalls":
+        return EagerToolCalls(self.max_concurrency)
+
+    def start(self, tool_call: dict, eager: "EagerToolCalls") -> None:
+        """Start running a tool call in the background, before the tools node runs."""
+        if tool_call["name"] not in self.tools_by_name or tool_call["id"] in eager.tasks:
+            return
+
+        async def run() -> ToolMessage:
+            if eager.semaphore is None:
+                return await self._arun_tool_call(tool_call)
+            async with eager.semaphore:
+                return await self._arun_tool_call(tool_call)
+
+        eager.tasks[tool_call["id"]] = asyncio.create_task(run())
+        EAGER_TOOL_CALLS.inc(outcome="started")
+
+    async def acall(self, inputs: dict, config: Optional[RunnableConfig] = None):
+        message = self._last_message(inputs)
+        eager = (config or {}).get("configurable", {}).get(EAGER_TOOL_CALLS_KEY)
+        if eager is not None:
+            # Shared with the calls started early, so they count against the same limit
+            semaphore = eager.semaphore
+        else:
+            semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+
+        async def run(tool_call: dict) -> ToolMessage:
+            task = eager.tasks.pop(tool_call["id"], None) if eager is not None else None
+            if task is not None:
+                EAGER_TOOL_CALLS.inc(outcome="reused")
+                return await task
+            if semaphore is None:
+                return await self._arun_tool_call(tool_call)
+            async with semaphore:
+                return await self._arun_tool_call(tool_call)
+
+        # gather keeps the results in tool_calls order
+        outputs = await asyncio.gather(*(run(tool_call) for tool_call in message.tool_calls))
+        if eager is not None:
+            # Started for a call the final message does not carry
+            eager.cancel()
+        return {"messages": list(outputs)}
+
+    async def _arun_tool_call(self, tool_call: dict) -> ToolMessage:
+        name = tool_call["name"]
+        timeout = self.timeouts.get(name, self.timeout)
+        if name not in self.tools_by_name:
+            return self._error_message(tool_call, "unknown_tool", f"Unknown tool '{name}'")
+        key = self._cache_key(tool_call)
+        tool_result = await self.cache.aget(key) if key else None
+        if tool_result is None:
+            try:
+                tool_result = await asyncio.wait_for(
+                    self.tools_by_name[name].ainvoke(tool_call["args"]), timeout
+                )
+            except asyncio.TimeoutError:
+                return self._error_message(tool_call, "timeout", f"Tool '{name}' timed out after {timeout}s")
+            except Exception as e:
+                return self._error_message(tool_call, "tool_error", str(e))
+            if key and self.cache.storable(tool_result):
+                await self.cache.aset(key, tool_result)
+        return ToolMessage(
+            content=json.dumps(tool_result),
+            name=name,
+            tool_call_id=tool_call["id"],
+        )
+
+    def _cache_key(self, tool_call: dict) -> Optional[str]:
+        """Cache key of a call, or None when its tool's results are not cached."""
+        if self.cache is None or not self.cache.caches(tool_call["name"]):
+            return None
+        return self.cache.key_for(tool_call["name"], tool_call["args"])
+
+    def _error_message(self, tool_call: dict, error_type: str, detail: str) -> ToolMessage:
+        return ToolMessage(
+            content=json.dumps({"error": error_type, "detail": detail}),
+            name=tool_call["name"],
+            tool_call_id=tool_call["id"],
+            status="error",
+        )
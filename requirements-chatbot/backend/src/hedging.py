@@ -0,0 +1,276 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackManager
+from langchain_core.runnables import ensure_config
+from langchain_core.tracers import BaseTracer
+
+from .metrics import HEDGE_DELAY, HEDGES
+
+
+class LatencyTracker:
+    """Recent latencies per key, for a percentile threshold."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(key, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, key: str, p: float) -> Optional[float]:
+        """The `p` percentile of the recent samples, or None until there are `min_samples`."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(int(len(samples) * p), len(samples) - 1)]
+
+
+class HedgeBudget:
+    """Token bucket capping hedges at `ratio` of all calls, saving up at most `burst` hedges."""
+
+    def __init__(self, ratio: float = 0.05, burst: float = 10.0) -> None:
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = 0.0
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.burst)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class _TokenGate:
+    """Holds back the token callbacks of an attempt until the race is decided.
+
+    The winner's held tokens are replayed in order and later ones go through;
+    a loser's are dropped.
+    """
+
+    def __init__(self) -> None:
+        self.state = "held"
+        self._held: List[Tuple[Any, tuple, dict]] = []
+        self._lock = threading.Lock()
+
+    def admit(self, handler: Any, args: tuple, kwargs: dict) -> bool:
+        """Whether a token event goes to `handler` now; held ones are kept for `open`."""
+        with self._lock:
+            if self.state == "held":
+                self._held.append((handler, args, kwargs))
+            return self.state == "open"
+
+    async def open(self) -> None:
+        with self._lock:
+            held, self._held, self.state = self._held, [], "open"
+        for handler, args, kwargs in held:
+            result = handler.on_llm_new_token(*args, **kwargs)
+            if asyncio.iscoroutine(result):
+                await result
+
+    def drop(self) -> None:
+        with self._lock:
+            self._held, self.state = [], "dropped"
+
+
+class _GatedHandler:
+    """Callback handler proxy sending token events through a `_TokenGate`, and every other event on."""
+
+    def __init__(self, handler: Any, gate: _TokenGate) -> None:
+        self.handler = handler
+        self.gate = gate
+        if asyncio.iscoroutinefunction(handler.on_llm_new_token):
+            self.on_llm_new_token = self._aon_llm_new_token
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.handler, name)
+
+    def on_llm_new_token(self, *args: Any, **kwargs: Any) -> Any:
+        if self.gate.admit(self.handler, args, kwargs):
+            return self.handler.on_llm_new_token(*args, **kwargs)
+
+    async def _aon_llm_new_token(self, *args: Any, **kwargs: Any) -> None:
+        if self.gate.admit(self.handler, args, kwargs):
+            await self.handler.on_llm_new_token(*args, **kwargs)
+
+
+def _gated_callbacks(gate: _TokenGate) -> Any:
+    """
+    The callbacks of the current run, with token events going through `gate`.
+
+    Only handlers that pass tokens on (such as the "messages" stream mode's)
+    are gated; tracers still record each attempt as it runs.
+    """
+    callbacks = ensure_config().get("callbacks")
+    if not callbacks:
+        return callbacks
+    proxies: Dict[int, Any] = {}
+
+    def gated(handler: Any) -> Any:
+        if isinstance(handler, BaseTracer):
+            return handler
+        if id(handler) not in proxies:
+            proxies[id(handler)] = _GatedHandler(handler, gate)
+        return proxies[id(handler)]
+
+    if isinstance(callbacks, BaseCallbackManager):
+        manager = callbacks.copy()
+        manager.handlers = [gated(handler) for handler in manager.handlers]
+        manager.inheritable_handlers = [gated(handler) for handler in manager.inheritable_handlers]
+        return manager
+    return [gated(handler) for handler in callbacks]
+
+
+class _Attempt:
+    def __init__(self, start: Callable[[Any], AsyncIterator[Any]]) -> None:
+        self.gate = _TokenGate()
+        stream = start(_gated_callbacks(self.gate))
+        self.stream = stream
+        self.started = time.perf_counter()
+        # The first chunk; StopAsyncIteration for an empty stream
+        self.first = asyncio.ensure_future(stream.__anext__())
+
+    def failed(self) -> bool:
+        error = self.first.exception()
+        return error is not None and not isinstance(error, StopAsyncIteration)
+
+    async def close(self) -> None:
+        self.first.cancel()
+        await asyncio.gather(self.first, return_exceptions=True)
+        aclose = getattr(self.stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+class LLMHedger:
+    """Sends a duplicate of a model call whose first token is late, and keeps the faster one.
+
+    A call is late when it has not streamed its first chunk after the
+    `percentile` of the recent times to first chunk of calls to the same
+    model. The duplicate (hedge) is only sent while the budget allows, at most
+    `budget_ratio` of all calls. Whichever attempt streams first wins and is
+    streamed to the caller; the other is cancelled. Token callbacks of each
+    attempt are held back until the race is decided, so only the winner's
+    tokens reach the "messages" stream mode, even when both attempts produce
+    their first chunk together. Until `min_samples` calls have been seen,
+    nothing is hedged.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 0.95,
+        budget_ratio: float = 0.05,
+        budget_burst: float = 10.0,
+        window: int = 200,
+        min_samples: int = 20,
+    ) -> None:
+        self.percentile = percentile
+        self.latencies = LatencyTracker(window=window, min_samples=min_samples)
+        self.budget = HedgeBudget(ratio=budget_ratio, burst=budget_burst)
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "fired": 0, "won": 0, "budget_exhausted": 0}
+
+    def _count(self, key: str, outcome: str) -> None:
+        if outcome != "calls":
+            HEDGES.inc(model=key, outcome=outcome)
+        with self._lock:
+            self._counts[outcome] += 1
+
+    async def _race(self, key: str, start: Callable[[Any], AsyncIterator[Any]], attempts: List[_Attempt]) -> _Attempt:
+        primary = attempts[0]
+        delay = self.latencies.percentile(key, self.percentile)
+        if delay is not None:
+            HEDGE_DELAY.set(delay, model=key)
+            done, _ = await asyncio.wait({primary.first}, timeout=delay)
+            if not done:
+                if self.budget.withdraw():
+                    self._count(key, "fired")
+                    attempts.append(_Attempt(start))
+                else:
+                    self._count(key, "budget_exhausted")
+        pending = {attempt.first for attempt in attempts}
+        while True:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # A failed attempt only loses while another one may still succeed
+            finished = [attempt for attempt in attempts if attempt.first in done]
+            for attempt in finished:
+                if not attempt.failed():
+                    return attempt
+            if not pending:
+                # Every attempt failed: the primary's error is raised
+                return primary
+
+    async def astream(self, key: str, start: Callable[[Any], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Stream the chunks of a model call, hedged.
+
+        Args:
+            key: Latency group of the call, e.g. the model name
+            start: Starts one attempt of the call with the given callbacks (to pass
+                as the call's config "callbacks") and returns its chunk stream
+        """
+        self._count(key, "calls")
+        self.budget.deposit()
+        attempts = [_Attempt(start)]
+        try:
+            winner = await self._race(key, start, attempts)
+            primary = attempts[0]
+            if not winner.failed():
+                # Samples are the primary attempts' times to first chunk; a beaten
+                # primary contributes the time it had been waiting, a lower bound
+                self.latencies.observe(key, time.perf_counter() - primary.started)
+            if len(attempts) > 1 and winner is not primary:
+                self._count(key, "won")
+            losers = [attempt for attempt in attempts if attempt is not winner]
+            for loser in losers:
+                loser.gate.drop()
+            await asyncio.shield(asyncio.ensure_future(self._close(losers)))
+            await winner.gate.open()
+            try:
+                chunk = winner.first.result()
+            except StopAsyncIteration:
+                return
+            yield chunk
+            async for chunk in winner.stream:
+                yield chunk
+        finally:
+            # Cancelled or closed early: stop every attempt still running
+            await asyncio.shield(asyncio.ensure_future(self._close(attempts)))
+
+    @staticmethod
+    async def _close(attempts: List[_Attempt]) -> None:
+        await asyncio.gather(*(attempt.close() for attempt in attempts), return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._counts)
+        return {**counts, "budget_tokens": round(self.budget.tokens, 3)}
+
+
+def create_llm_hedger() -> Optional[LLMHedger]:
+    """
+    Build the hedger, or None unless LLM_HEDGING is "true".
+    """
+    if os.getenv("LLM_HEDGING", "false").lower() != "true":
+        return None
+    return LLMHedger(
+        percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "0.95")),
+        budget_ratio=float(os.getenv("LLM_HEDGE_BUDGET_RATIO", "0.05")),
+        budget_burst=float(os.getenv("LLM_HEDGE_BUDGET_BURST", "10")),
+        window=int(os.getenv("LLM_HEDGE_WINDOW", "200")),
+        min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+    )
@@ -0,0 +1,330 @@
+import abc
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Exposition lines of the metric's samples."""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # Per label set: per-bucket (non-cumulative) counts, sum
+        self._values: Dict[LabelValues, Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * len(self.buckets), 0.0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text exposition format."""
+
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+NODE_DURATION = REGISTRY.histogram("chatbot_node_duration_seconds", "Graph node latency.", ["node", "status"])
+TOOL_DURATION = REGISTRY.histogram("chatbot_tool_duration_seconds", "Tool call latency.", ["tool", "status"])
+TTFT = REGISTRY.histogram(
+    "chatbot_llm_time_to_first_token_seconds", "Model time to first streamed token.", ["node"]
+)
+LLM_DURATION = REGISTRY.histogram("chatbot_llm_duration_seconds", "Model call latency.", ["node", "status"])
+TOKENS_PER_SECOND = REGISTRY.histogram(
+    "chatbot_llm_output_tokens_per_second", "Model output tokens per second.", ["node"], RATE_BUCKETS
+)
+TOKENS = REGISTRY.counter("chatbot_llm_tokens_total", "Model input and output tokens.", ["node", "type"])
+TOOL_LOOPS = REGISTRY.histogram("chatbot_tool_loop_iterations", "Tool node runs per request.", [], COUNT_BUCKETS)
+GRAPH_DURATION = REGISTRY.histogram(
+    "chatbot_graph_run_duration_seconds", "Graph run latency per request.", ["status"]
+)
+RUNS_IN_FLIGHT = REGISTRY.gauge("chatbot_graph_runs_in_flight", "Graph runs in progress.")
+EAGER_TOOL_CALLS = REGISTRY.counter(
+    "chatbot_eager_tool_calls_total", "Tool calls started while the model streams, and reused.", ["outcome"]
+)
+MODEL_ROUTE_DURATION = REGISTRY.histogram(
+    "chatbot_model_route_duration_seconds", "Model call latency per route.", ["route", "model", "status"]
+)
+MODEL_ROUTE_COST = REGISTRY.counter(
+    "chatbot_model_route_cost_usd_total", "Estimated model cost per route, in USD.", ["route", "model"]
+)
+MODEL_ESCALATIONS = REGISTRY.counter(
+    "chatbot_model_escalations_total", "Model answers retried on the strong model.", ["route", "reason"]
+)
+HEDGES = REGISTRY.counter(
+    "chatbot_llm_hedges_total", "Hedged model calls: fired, won by the hedge, or skipped for lack of budget.",
+    ["model", "outcome"],
+)
+HEDGE_DELAY = REGISTRY.gauge(
+    "chatbot_llm_hedge_delay_seconds", "Time to first token after which a model call is hedged.", ["model"]
+)
+
+
+def _status(error: BaseException) -> str:
+    return "cancelled" if isinstance(error, (asyncio.CancelledError, GeneratorExit)) else "error"
+
+
+class GraphMetrics(BaseCallbackHandler):
+    """LangChain callback handler recording per-node, per-tool and model metrics.
+
+    One handler is attached to each graph run through its config. The run of
+    the graph itself (no parent run) is the request; graph node runs are
+    recognized by their `langgraph_node` metadata matching the run name. Time
+    to first token is only seen on streamed model calls.
+
+    Model and tool calls cancelled with the graph run get no end callback;
+    they are recorded as "cancelled" when the graph run ends.
+    """
+
+    # Handlers only update in-memory metrics, so they run inline
+    run_inline = True
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._root: Optional[UUID] = None
+        self._started = 0.0
+        self._tool_loops = 0
+        self._nodes: Dict[UUID, Tuple[str, float]] = {}
+        self._tools: Dict[UUID, Tuple[str, float]] = {}
+        self._llms: Dict[UUID, Dict[str, Any]] = {}
+
+    # Graph and nodes
+
+    def on_chain_start(
+        self,
+        serialized: Dict[str, Any],
+        inputs: Dict[str, Any],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        if parent_run_id is None:
+            self._root = run_id
+            self._started = time.perf_counter()
+            RUNS_IN_FLIGHT.inc()
+            return
+        node = (metadata or {}).get("langgraph_node")
+        # Node runs are direct children of the graph run; the runnable wrapped
+        # by a node shares its name and runs one level below
+        if node and kwargs.get("name") == node and parent_run_id == self._root:
+            with self._lock:
+                self._nodes[run_id] = (node, time.perf_counter())
+
+    def _end_chain(self, run_id: UUID, status: str) -> None:
+        now = time.perf_counter()
+        if run_id == self._root:
+            self._root = None
+            with self._lock:
+                tools, self._tools = self._tools, {}
+                llms, self._llms = self._llms, {}
+            for name, started in tools.values():
+                TOOL_DURATION.observe(now - started, tool=name, status="cancelled")
+            for llm in llms.values():
+                LLM_DURATION.observe(now - llm["started"], node=llm["node"], status="cancelled")
+            RUNS_IN_FLIGHT.dec()
+            GRAPH_DURATION.observe(now - self._started, status=status)
+            TOOL_LOOPS.observe(self._tool_loops)
+            return
+        with self._lock:
+            node = self._nodes.pop(run_id, None)
+        if node is not None:
+            NODE_DURATION.observe(now - node[1], node=node[0], status=status)
+            if node[0] == "tools":
+                self._tool_loops += 1
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id, "ok")
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id, _status(error))
+
+    # Tools
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any) -> None:
+        name = kwargs.get("name") or (serialized or {}).get("name", "unknown")
+        with self._lock:
+            self._tools[run_id] = (name, time.perf_counter())
+
+    def _end_tool(self, run_id: UUID, status: str) -> None:
+        with self._lock:
+            tool = self._tools.pop(run_id, None)
+        if tool is not None:
+            TOOL_DURATION.observe(time.perf_counter() - tool[1], tool=tool[0], status=status)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_tool(run_id, "ok")
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_tool(run_id, _status(error))
+
+    # Model calls
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[Any]],
+        *,
+        run_id: UUID,
+        metadata: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node", "")
+        with self._lock:
+            self._llms[run_id] = {"node": node, "started": time.perf_counter(), "first_token": None}
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        llm = self._llms.get(run_id)
+        if llm is not None and llm["first_token"] is None:
+            llm["first_token"] = time.perf_counter()
+            TTFT.observe(llm["first_token"] - llm["started"], node=llm["node"])
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        now = time.perf_counter()
+        with self._lock:
+            llm = self._llms.pop(run_id, None)
+        if llm is None:
+            return
+        node = llm["node"]
+        LLM_DURATION.observe(now - llm["started"], node=node, status="ok")
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if not usage:
+            return
+        TOKENS.inc(usage.get("input_tokens", 0), node=node, type="input")
+        TOKENS.inc(usage.get("output_tokens", 0), node=node, type="output")
+        generating = now - (llm["first_token"] or llm["started"])
+        if usage.get("output_tokens") and generating > 0:
+            TOKENS_PER_SECOND.observe(usage["output_tokens"] / generating, node=node)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            llm = self._llms.pop(run_id, None)
+        if llm is not None:
+            LLM_DURATION.observe(time.perf_counter() - llm["started"], node=llm["node"], status=_status(error))
@@ -0,0 +1,142 @@
+import json
+from typing import Any, Dict, List, Literal, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import tool
+
+from .sections import affected, apply_edit, as_sections, link_sections, render, split_sections
+
+PhaseName = Literal["requirements", "analysis", "design", "tasks"]
+
+# Shared guide (identity, language, verification rules), sent with every phase prompt
+CORE_PROMPT = "system_prompt"
+ADVANCE_PHASE = "advance_phase"
+EDIT_SECTION = "edit_section"
+
+
+class Phase:
+    """One step of the planning workflow: its prompt file and the artifacts it reads."""
+
+    def __init__(self, name: str, prompt: str, needs: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.prompt = prompt
+        # Artifacts of earlier phases included in this phase's model calls
+        self.needs = needs
+
+    @property
+    def prompts(self) -> Tuple[str, ...]:
+        return (CORE_PROMPT, self.prompt)
+
+
+PHASES: Dict[str, Phase] = {
+    phase.name: phase
+    for phase in (
+        Phase("requirements", "requirements"),
+        Phase("analysis", "follow_up_questions", needs=("requirements",)),
+        Phase("design", "design", needs=("requirements", "analysis")),
+        Phase("tasks", "task", needs=("requirements", "design")),
+    )
+}
+PHASE_ORDER: Tuple[str, ...] = tuple(PHASES)
+FIRST_PHASE = PHASE_ORDER[0]
+
+
+def next_phase(phase: str) -> Optional[str]:
+    index = PHASE_ORDER.index(phase)
+    return PHASE_ORDER[index + 1] if index + 1 < len(PHASE_ORDER) else None
+
+
+@tool(ADVANCE_PHASE)
+def advance_phase() -> str:
+    """Move the planning workflow to its next phase. Only call this after the user has explicitly approved the document of the current phase."""
+    # The phase change itself is applied to the graph state by the tools node
+    return "Moved to the next phase."
+
+
+@tool(EDIT_SECTION)
+def edit_section(section_id: str, text: str) -> str:
+    """Replace one section of an approved planning document, e.g. when the user changes a requirement. `section_id` is the id of a <section> of an approved document and `text` its complete new Markdown, heading included. Sections of later documents that depend on it are updated automatically; do not rewrite them yourself."""
+    # The edit itself is applied to the graph state by the tools node
+    return "Section updated."
+
+
+def artifacts_message(phase: str, artifacts: Dict[str, List[Dict[str, Any]]]) -> Optional[SystemMessage]:
+    """The approved documents of earlier phases that `phase` works from, as one message."""
+    artifacts = as_sections(artifacts)
+    documents = [
+        f"## Approved {name} document\n\n{render(artifacts[name], with_ids=True)}"
+        for name in PHASES[phase].needs
+        if artifacts.get(name)
+    ]
+    if not documents:
+        return None
+    return SystemMessage(content="\n\n".join(documents))
+
+
+def advance(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    State update for an `advance_phase` call: record the approved artifact, move on.
+
+    The artifact is the last answer without tool calls given before the user's
+    latest message, i.e. the document the user approved. It is stored as
+    sections linked to the sections of earlier artifacts they cite.
+    """
+    phase = state.get("phase") or FIRST_PHASE
+    artifacts = as_sections(state.get("artifacts") or {})
+    upstream = [section for name in PHASES[phase].needs for section in artifacts.get(name, [])]
+    sections = link_sections(split_sections(phase, _approved_document(state["messages"])), upstream)
+    # The last phase stays current once its document is approved
+    return {"phase": next_phase(phase) or phase, "artifacts": {**artifacts, phase: sections}}
+
+
+def edit(state: Dict[str, Any], messages: List[BaseMessage]) -> Dict[str, Any]:
+    """
+    State update for `edit_section` calls: apply the edits to the artifacts.
+
+    The tool messages of the edits in `messages` are replaced by ones listing
+    the sections now due for regeneration, or the error for an unknown id.
+    """
+    artifacts = as_sections(state.get("artifacts") or {})
+    edits = {
+        tool_call["id"]: tool_call["args"]
+        for tool_call in state["messages"][-1].tool_calls
+        if tool_call["name"] == EDIT_SECTION
+    }
+    results = []
+    for message in messages:
+        args = edits.get(getattr(message, "tool_call_id", None))
+        if args is None or getattr(message, "status", None) == "error":
+            results.append(message)
+            continue
+        try:
+            artifacts = apply_edit(artifacts, args["section_id"], args["text"])
+        except KeyError:
+            content, status = {"error": "unknown_section", "detail": f"No approved section '{args['section_id']}'"}, "error"
+        else:
+            content, status = {"updated": args["section_id"], "regenerating": affected(artifacts, [args["section_id"]])}, "success"
+        results.append(
+            ToolMessage(content=json.dumps(content), name=EDIT_SECTION, tool_call_id=message.tool_call_id, status=status)
+        )
+    return {"messages": results, "artifacts": artifacts}
+
+
+def _approved_document(messages: List[BaseMessage]) -> str:
+    seen_user = False
+    for message in reversed(messages):
+        if isinstance(message, HumanMessage):
+            seen_user = True
+        elif seen_user and isinstance(message, AIMessage) and not message.tool_calls and message.content:
+            return message.text()
+    return ""
+
+
+def _calls(message: Any, name: str) -> bool:
+    return any(tool_call["name"] == name for tool_call in getattr(message, "tool_calls", None) or ())
+
+
+def calls_advance(message: Any) -> bool:
+    return _calls(message, ADVANCE_PHASE)
+
+
+def calls_edit(message: Any) -> bool:
+    return _calls(message, EDIT_SECTION)
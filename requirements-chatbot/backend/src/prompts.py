@@ -0,0 +1,286 @@
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from string import Template
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger(__name__)
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+# Order of the static system prefix: workflow guide first, then the phase playbooks
+DEFAULT_SYSTEM_PROMPTS = ("system_prompt", "requirements", "design", "task", "follow_up_questions")
+
+
+class _Prompt:
+    def __init__(self, path: Path, mtime_ns: int, text: str) -> None:
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.text = text
+
+
+class PromptRegistry:
+    """Loads `prompts/*.md` once and reloads a file only when its mtime changes.
+
+    Prompts are `string.Template` texts rendered with `variables`; unknown
+    placeholders are left untouched. File mtimes are checked at most once per
+    `check_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        prompts_dir: Path = PROMPTS_DIR,
+        variables: Optional[Dict[str, str]] = None,
+        check_interval: float = 1.0,
+    ) -> None:
+        self.prompts_dir = Path(prompts_dir)
+        self.variables = variables or {}
+        self.check_interval = check_interval
+        self.reloads = 0
+        self._prompts: Dict[str, _Prompt] = {}
+        self._last_check = 0.0
+        self._prefixes: Dict[Tuple[str, ...], Tuple[Tuple[int, ...], Tuple[str, str]]] = {}
+        self._lock = threading.Lock()
+        for path in sorted(self.prompts_dir.glob("*.md")):
+            self._prompts[path.stem] = self._load(path)
+        self._last_check = time.monotonic()
+
+    def _load(self, path: Path) -> _Prompt:
+        mtime_ns = path.stat().st_mtime_ns
+        text = Template(path.read_text(encoding="utf-8")).safe_substitute(self.variables)
+        return _Prompt(path, mtime_ns, text)
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            self._last_check = now
+            for name, prompt in list(self._prompts.items()):
+                try:
+                    mtime_ns = prompt.path.stat().st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                if mtime_ns != prompt.mtime_ns:
+                    self._prompts[name] = self._load(prompt.path)
+                    self.reloads += 1
+                    logger.info("Reloaded prompt %s", name)
+
+    def names(self) -> List[str]:
+        return list(self._prompts)
+
+    def get(self, name: str) -> str:
+        self._refresh()
+        if name not in self._prompts:
+            raise KeyError(f"Unknown prompt: {name}")
+        return self._prompts[name].text
+
+    def system_prefix(self, names: Sequence[str] = DEFAULT_SYSTEM_PROMPTS) -> Tuple[str, str]:
+        """
+        Return the static system prefix built from `names` and its content hash.
+
+        Args:
+            names: Prompt names, in the order they appear in the prefix
+
+        Returns:
+            (prefix text, sha256 hex digest of the text)
+        """
+        self._refresh()
+        names = tuple(names)
+        versions = tuple(self._prompts[name].mtime_ns for name in names)
+        # One entry per prompt combination (e.g. one per planning phase), for its current versions
+        cached = self._prefixes.get(names)
+        if cached is None or cached[0] != versions:
+            text = "\n\n".join(self._prompts[name].text for name in names)
+            cached = (versions, (text, hashlib.sha256(text.encode("utf-8")).hexdigest()))
+            self._prefixes[names] = cached
+        return cached[1]
+
+
+class ContextCache(abc.ABC):
+    """Maps a (model, system prefix, tools) combination to a provider-side cache name.
+
+    Names are created once per content hash and recreated shortly before they
+    expire; after a failed creation the prompt is sent inline until
+    `retry_after` seconds have passed. Prefixes below `min_tokens(model)` are
+    always sent inline. `create` is the provider-specific part.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600, retry_after: float = 300.0) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.retry_after = retry_after
+        self.creates = 0
+        self.hits = 0
+        self.failures = 0
+        self._names: Dict[str, Tuple[Optional[str], float]] = {}
+        self._lock = threading.Lock()
+
+    @abc.abstractmethod
+    def create(self, model: str, system_instruction: str, tools: List[Dict[str, Any]]) -> str:
+        """Store the system instruction and tool declarations provider-side; return the cache name."""
+
+    def min_tokens(self, model: str) -> int:
+        """Smallest prefix, in tokens, the provider accepts for caching."""
+        return 0
+
+    @staticmethod
+    def _key(model: str, prefix_hash: str, tools: Sequence[Any]) -> str:
+        return f"{model}:{prefix_hash}:{','.join(sorted(tool.name for tool in tools))}"
+
+    def _lookup(self, key: str) -> Tuple[bool, Optional[str]]:
+        entry = self._names.get(key)
+        # Refresh a minute before the provider drops the cache
+        if entry is not None and entry[1] - 60 > time.time():
+            if entry[0] is not None:
+                self.hits += 1
+            return True, entry[0]
+        return False, None
+
+    def get_or_create(
+        self,
+        model: str,
+        system_instruction: str,
+        prefix_hash: str,
+        tools: Sequence[Any] = (),
+    ) -> Optional[str]:
+        """Return the cache name for the prefix, or None when caching is unavailable."""
+        key = self._key(model, prefix_hash, tools)
+        found, name = self._lookup(key)
+        if found:
+            return name
+        with self._lock:
+            found, name = self._lookup(key)
+            if found:
+                return name
+            declarations = [convert_to_openai_tool(t) for t in tools]
+            tokens = count_tokens_approximately([SystemMessage(content=system_instruction)])
+            tokens += len(json.dumps(declarations)) // 4
+            if tokens < self.min_tokens(model):
+                # The provider would reject it; checked again once the TTL has passed
+                self._names[key] = (None, time.time() + self.ttl_seconds)
+                return None
+            try:
+                name = self.create(model, system_instruction, declarations)
+            except Exception:
+                self.failures += 1
+                logger.exception("Context cache creation failed, sending the prompt inline")
+                self._names[key] = (None, time.time() + self.retry_after + 60)
+                return None
+            self.creates += 1
+            self._names[key] = (name, time.time() + self.ttl_seconds)
+            return name
+
+    async def aget_or_create(
+        self,
+        model: str,
+        system_instruction: str,
+        prefix_hash: str,
+        tools: Sequence[Any] = (),
+    ) -> Optional[str]:
+        found, name = self._lookup(self._key(model, prefix_hash, tools))
+        if found:
+            return name
+        # Creation is a blocking API call
+        return await asyncio.to_thread(self.get_or_create, model, system_instruction, prefix_hash, tools)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self).__name__,
+            "entries": len(self._names),
+            "creates": self.creates,
+            "hits": self.hits,
+            "failures": self.failures,
+        }
+
+
+class GeminiContextCache(ContextCache):
+    """Context cache backed by the Gemini `caches` API."""
+
+    # Minimum cached content size per model family; other models use DEFAULT_MIN_TOKENS
+    MIN_TOKENS = {"gemini-2.5-flash": 1024, "gemini-2.5-pro": 4096}
+    DEFAULT_MIN_TOKENS = 4096
+
+    def __init__(self, ttl_seconds: int = 3600, client: Any = None) -> None:
+        super().__init__(ttl_seconds)
+        self._client = client
+
+    def min_tokens(self, model: str) -> int:
+        name = model.removeprefix("models/")
+        for family, tokens in self.MIN_TOKENS.items():
+            if name.startswith(family):
+                return tokens
+        return self.DEFAULT_MIN_TOKENS
+
+    def create(self, model: str, system_instruction: str, tools: List[Dict[str, Any]]) -> str:
+        from google import genai
+        from google.genai import types
+
+        if self._client is None:
+            self._client = genai.Client()
+        # Requests using a cache may not carry tools themselves, so they are cached too
+        declarations = [
+            types.FunctionDeclaration(
+                name=tool["function"]["name"],
+                description=tool["function"].get("description"),
+                parameters_json_schema=tool["function"].get("parameters"),
+            )
+            for tool in tools
+        ]
+        cache = self._client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name="requirements-chatbot-system-prefix",
+                system_instruction=system_instruction,
+                tools=[types.Tool(function_declarations=declarations)] if declarations else None,
+                ttl=f"{self.ttl_seconds}s",
+            ),
+        )
+        return cache.name
+
+
+class LocalContextCache(ContextCache):
+    """In-process stand-in for the Gemini context cache, for tests and benchmarks.
+
+    `contents` maps each created cache name to the system instruction and tools
+    it holds, so a fake model can resolve `cached_content`.
+    """
+
+    def __init__(self, ttl_seconds: int = 3600) -> None:
+        super().__init__(ttl_seconds)
+        self.contents: Dict[str, Dict[str, Any]] = {}
+
+    def create(self, model: str, system_instruction: str, tools: List[Dict[str, Any]]) -> str:
+        name = f"cachedContents/local-{len(self.contents)}"
+        self.contents[name] = {
+            "model": model,
+            "system_instruction": system_instruction,
+            "tools": tools,
+        }
+        return name
+
+
+def create_context_cache(backend: Optional[str] = None) -> Optional[ContextCache]:
+    """
+    Build the context cache for the static system prefix.
+
+    `backend` is "gemini", "local" or "none"; unset arguments are read from the
+    PROMPT_CONTEXT_CACHE* environment variables.
+    """
+    backend = backend or os.getenv("PROMPT_CONTEXT_CACHE", "gemini")
+    ttl_seconds = int(os.getenv("PROMPT_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+    if backend == "gemini":
+        return GeminiContextCache(ttl_seconds)
+    if backend == "local":
+        return LocalContextCache(ttl_seconds)
+    if backend == "none":
+        return None
+    raise ValueError(f"Unsupported context cache backend: {backend}")
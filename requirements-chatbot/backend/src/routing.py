@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from .metrics import MODEL_ESCALATIONS, MODEL_ROUTE_COST, MODEL_ROUTE_DURATION, _status
+
+RouteName = Literal["auto", "fast", "strong"]
+# RunnableConfig "configurable" key carrying a request's route
+MODEL_ROUTE_KEY = "model_route"
+
+GEMINI_FLASH_LITE = "gemini-2.0-flash-lite"
+# USD per million input and output tokens
+MODEL_PRICES = {
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-pro": (1.25, 10.00),
+}
+# Turns asking for a document or an analysis go to the strong model however short they are
+COMPLEX_TURN = re.compile(
+    r"\b(design|architecture|requirements?|plan|tasks?|document|write|rewrite|generate|draft|refactor|"
+    r"diagram|analy[sz]e|compare|explain|why)\b",
+    re.IGNORECASE,
+)
+# Gemini finish reasons of an answer that is cut off, blocked or broken
+_FAILED_FINISH_REASONS = {
+    "MAX_TOKENS": "truncated",
+    "SAFETY": "blocked",
+    "RECITATION": "blocked",
+    "PROHIBITED_CONTENT": "blocked",
+    "BLOCKLIST": "blocked",
+    "SPII": "blocked",
+    "MALFORMED_FUNCTION_CALL": "invalid_tool_call",
+}
+
+
+class ModelRoute:
+    """One of the models a model call can be sent to."""
+
+    def __init__(self, name: str, model_name: str, chat_model: Any, llm: Any) -> None:
+        self.name = name
+        self.model_name = model_name
+        # Traced model without tools, for provider-cached requests; `llm` has the tools bound
+        self.chat_model = chat_model
+        self.llm = llm
+
+    def cost(self, message: Any) -> float:
+        """USD cost of a response from its usage metadata; 0 for models without a known price."""
+        usage = getattr(message, "usage_metadata", None) or {}
+        input_price, output_price = MODEL_PRICES.get(self.model_name, (0.0, 0.0))
+        return (usage.get("input_tokens", 0) * input_price + usage.get("output_tokens", 0) * output_price) / 1e6
+
+
+class ModelRouter:
+    """Picks the model for each model call: a fast, cheap one or a strong one.
+
+    "strong" and "fast" always use that model. "auto" sends a call to the fast
+    model when it answers a short user turn directly (no attachments, no code,
+    nothing that asks for a document or an analysis) and to the strong model
+    otherwise, including calls that continue after tool results such as a new
+    planning phase. A fast answer that fails validation (empty, cut off,
+    blocked or with a broken tool call) is escalated to the strong model.
+    Only these escalatable fast calls lose token streaming: the answer is
+    buffered until it passes validation, then emitted whole.
+
+    Latency and cost are recorded per route, in the Prometheus metrics and in
+    `stats`.
+    """
+
+    def __init__(
+        self,
+        fast: ModelRoute,
+        strong: ModelRoute,
+        default: RouteName = "strong",
+        max_fast_chars: int = 280,
+        tool_names: Sequence[str] = (),
+    ) -> None:
+        if default not in ("auto", "fast", "strong"):
+            raise ValueError(f"Unsupported model route: {default}")
+        self.fast = fast
+        self.strong = strong
+        self.default = default
+        self.max_fast_chars = max_fast_chars
+        self.tool_names = set(tool_names)
+        self._lock = threading.Lock()
+        self._calls = {name: {"calls": 0, "seconds": 0.0, "cost_usd": 0.0} for name in ("fast", "strong")}
+        self._escalations: Dict[str, int] = {}
+
+    def is_simple(self, messages: List[Any]) -> bool:
+        """Whether the next call answers a short, plain user turn directly."""
+        if not messages or not isinstance(messages[-1], HumanMessage):
+            return False
+        message = messages[-1]
+        text = message.text() if callable(getattr(message, "text", None)) else str(message.content)
+        return (
+            not message.additional_kwargs.get("attachments")
+            and len(text) <= self.max_fast_chars
+            and "```" not in text
+            and not COMPLEX_TURN.search(text)
+        )
+
+    def routes(self, messages: List[Any], config: Optional[Dict[str, Any]] = None) -> List[ModelRoute]:
+        """Routes to try in order: the chosen one first, then the one to escalate to, if any."""
+        mode = (config or {}).get("configurable", {}).get(MODEL_ROUTE_KEY) or self.default
+        if mode == "fast":
+            return [self.fast]
+        if mode == "auto" and self.is_simple(messages):
+            return [self.fast, self.strong]
+        return [self.strong]
+
+    def check(self, response: Any) -> Optional[str]:
+        """Why a response must be escalated, or None when it is usable."""
+        if not isinstance(response, AIMessage):
+            return None
+        finish_reason = response.response_metadata.get("finish_reason")
+        if finish_reason in _FAILED_FINISH_REASONS:
+            return _FAILED_FINISH_REASONS[finish_reason]
+        if response.invalid_tool_calls:
+            return "invalid_tool_call"
+        if self.tool_names and any(call["name"] not in self.tool_names for call in response.tool_calls):
+            return "unknown_tool"
+        if not response.tool_calls and not response.text().strip():
+            return "empty"
+        return None
+
+    def escalate(self, route: ModelRoute, reason: str) -> None:
+        MODEL_ESCALATIONS.inc(route=route.name, reason=reason)
+        with self._lock:
+            self._escalations[reason] = self._escalations.get(reason, 0) + 1
+
+    def _record(self, route: ModelRoute, seconds: float, cost: float) -> None:
+        with self._lock:
+            totals = self._calls[route.name]
+            totals["calls"] += 1
+            totals["seconds"] += seconds
+            totals["cost_usd"] += cost
+
+    @contextmanager
+    def observe(self, route: ModelRoute) -> Iterator[Dict[str, Any]]:
+        """Time a call on `route`; set "response" in the yielded dict to record its cost."""
+        call: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            yield call
+        except BaseException as e:
+            seconds = time.perf_counter() - started
+            MODEL_ROUTE_DURATION.observe(seconds, route=route.name, model=route.model_name, status=_status(e))
+            self._record(route, seconds, 0.0)
+            raise
+        seconds = time.perf_counter() - started
+        cost = route.cost(call["response"]) if "response" in call else 0.0
+        MODEL_ROUTE_DURATION.observe(seconds, route=route.name, model=route.model_name, status="ok")
+        MODEL_ROUTE_COST.inc(cost, route=route.name, model=route.model_name)
+        self._record(route, seconds, cost)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "default": self.default,
+                "routes": {name: dict(totals) for name, totals in self._calls.items()},
+                "escalations": dict(self._escalations),
+            }
+
+
+def create_model_router(fast: ModelRoute, strong: ModelRoute, tool_names: Sequence[str]) -> ModelRouter:
+    return ModelRouter(
+        fast,
+        strong,
+        default=os.getenv("MODEL_ROUTING", "strong"),
+        max_fast_chars=int(os.getenv("MODEL_ROUTING_MAX_FAST_CHARS", "280")),
+        tool_names=tool_names,
+    )
@@ -0,0 +1,288 @@
+import asyncio
+import hashlib
+import re
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from langgraph.constants import TAG_NOSTREAM
+
+from .cache import MemoryCache, make_cache_key
+
+REGENERATE_INSTRUCTIONS = """You maintain one section of the {phase} document of a software \
+development plan. Sections it depends on have changed. Update the section so it is consistent \
+with them. Keep its heading, structure, wording and everything the changes do not affect. \
+Reply with the updated section in Markdown only."""
+
+_HEADING = re.compile(r"^#{1,3}\s+(.+?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+# "Requirement 3", "Requirements: 1.1, 2.3", "REQ-4", "FR-2.1"
+_REQUIREMENT_REFS = re.compile(
+    r"\b(?:requirements?\s*:?\s*|(?:req|fr|nfr)-)(\d+(?:\.\d+)*(?:\s*(?:,|and|&)\s*\d+(?:\.\d+)*)*)",
+    re.IGNORECASE,
+)
+_NUMBER = re.compile(r"\d+(?:\.\d+)*")
+
+
+def _hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _slug(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-") or "section"
+
+
+def _requirement_numbers(text: str) -> List[str]:
+    numbers = []
+    for match in _REQUIREMENT_REFS.finditer(text):
+        numbers.extend(_NUMBER.findall(match.group(1)))
+    return numbers
+
+
+def split_sections(phase: str, text: str) -> List[Dict[str, Any]]:
+    """
+    Split a Markdown document into sections at its level 1-3 headings.
+
+    Each section keeps its heading in `text`. Text before the first heading
+    is a "preamble" section. Headings inside code blocks are ignored.
+    """
+    chunks: List[List[str]] = [[]]
+    titles: List[str] = ["Preamble"]
+    in_fence = False
+    for line in text.splitlines():
+        if _FENCE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _HEADING.match(line)
+        if heading:
+            chunks.append([])
+            titles.append(heading.group(1).strip("*_ "))
+        chunks[-1].append(line)
+    sections = []
+    seen: Dict[str, int] = {}
+    for title, lines in zip(titles, chunks):
+        body = "\n".join(lines).strip()
+        if not body:
+            continue
+        slug = _slug(title)
+        seen[slug] = seen.get(slug, 0) + 1
+        if seen[slug] > 1:
+            slug = f"{slug}-{seen[slug]}"
+        numbers = _requirement_numbers(title)
+        sections.append({
+            "id": f"{phase}/{slug}",
+            "title": title,
+            "text": body,
+            "hash": _hash(body),
+            # The requirement number a section defines, cited by later phases
+            "ref": numbers[0] if numbers else None,
+        })
+    return sections
+
+
+def _cites(section: Dict[str, Any], upstream: List[Dict[str, Any]]) -> List[str]:
+    """IDs of the upstream sections a section refers to: by requirement number or by title."""
+    by_ref = {candidate["ref"]: candidate["id"] for candidate in upstream if candidate.get("ref")}
+    cites = []
+    for number in _requirement_numbers(section["text"]):
+        # "1.2" is an acceptance criterion of requirement "1" when it has no section of its own
+        while number not in by_ref and "." in number:
+            number = number.rsplit(".", 1)[0]
+        if number in by_ref and by_ref[number] not in cites:
+            cites.append(by_ref[number])
+    lowered = section["text"].lower()
+    for candidate in upstream:
+        title = candidate["title"].lower()
+        if candidate["id"] not in cites and len(title) >= 4 and title != "preamble" and title in lowered:
+            cites.append(candidate["id"])
+    # Nothing recognizable: depend on all of it rather than miss a change
+    return cites or [candidate["id"] for candidate in upstream]
+
+
+def link_sections(sections: List[Dict[str, Any]], upstream: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Record the upstream sections each section depends on, with their current hashes.
+
+    Args:
+        sections: Sections of one phase's document
+        upstream: Sections of the earlier phases that document is based on
+    """
+    hashes = {candidate["id"]: candidate["hash"] for candidate in upstream}
+    linked = []
+    for section in sections:
+        cites = _cites(section, upstream) if upstream else []
+        linked.append({**section, "deps": {cited: hashes[cited] for cited in cites}})
+    return linked
+
+
+def changed_deps(section: Dict[str, Any], hashes: Dict[str, str]) -> List[str]:
+    """Dependencies whose content changed since the section was written; removed ones are ignored."""
+    return [cited for cited, seen in section.get("deps", {}).items() if cited in hashes and hashes[cited] != seen]
+
+
+def render(sections: List[Dict[str, Any]], with_ids: bool = False) -> str:
+    if not with_ids:
+        return "\n\n".join(section["text"] for section in sections)
+    return "\n\n".join(f'<section id="{section["id"]}">\n{section["text"]}\n</section>' for section in sections)
+
+
+def as_sections(artifacts: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """Artifacts as section lists; threads saved before sections stored whole documents."""
+    return {
+        phase: split_sections(phase, document) if isinstance(document, str) else document
+        for phase, document in artifacts.items()
+    }
+
+
+def _all_sections(artifacts: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    return {section["id"]: section for sections in artifacts.values() for section in sections}
+
+
+def apply_edit(
+    artifacts: Dict[str, List[Dict[str, Any]]], section_id: str, text: str
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Replace the text of one section.
+
+    Raises:
+        KeyError: When no section has `section_id`
+    """
+    phase = section_id.split("/", 1)[0]
+    sections = artifacts.get(phase, [])
+    for index, section in enumerate(sections):
+        if section["id"] == section_id:
+            text = text.strip()
+            numbers = _requirement_numbers(text.splitlines()[0]) if text else []
+            edited = {**section, "text": text, "hash": _hash(text), "ref": numbers[0] if numbers else section["ref"]}
+            # The user's edit is taken as consistent with what it depends on
+            hashes = {cited: seen["hash"] for cited, seen in _all_sections(artifacts).items()}
+            edited["deps"] = {cited: hashes.get(cited, seen) for cited, seen in section.get("deps", {}).items()}
+            return {**artifacts, phase: [*sections[:index], edited, *sections[index + 1:]]}
+    raise KeyError(section_id)
+
+
+def affected(artifacts: Dict[str, List[Dict[str, Any]]], section_ids: List[str]) -> List[str]:
+    """IDs of the sections that depend on `section_ids`, directly or transitively."""
+    dependents: Dict[str, List[str]] = {}
+    for section in _all_sections(artifacts).values():
+        for cited in section.get("deps", {}):
+            dependents.setdefault(cited, []).append(section["id"])
+    found: List[str] = []
+    pending = list(section_ids)
+    while pending:
+        for dependent in dependents.get(pending.pop(), []):
+            if dependent not in found:
+                found.append(dependent)
+                pending.append(dependent)
+    return found
+
+
+class SectionRegenerator:
+    """Brings the sections of later planning documents up to date after an edit.
+
+    A section is out of date when a section it depends on no longer has the
+    hash recorded when it was written. Phases are processed in order, so a
+    regenerated design section in turn updates the tasks citing it; sections
+    of one phase are regenerated concurrently. Every other section keeps its
+    text. Results are cached by the section hash and the hashes of its changed
+    dependencies, so the same edit applied again (a retried request, another
+    thread of the same plan) costs no model calls.
+    """
+
+    def __init__(self, model: Any, phase_order: List[str], cache_entries: int = 512) -> None:
+        self.model = model
+        self.phase_order = list(phase_order)
+        self.cache = MemoryCache(max_entries=cache_entries)
+        self.regenerated = 0
+        self.reused = 0
+
+    def _plan(self, artifacts: Dict[str, List[Dict[str, Any]]], phase: str) -> List[Dict[str, Any]]:
+        hashes = {section_id: section["hash"] for section_id, section in _all_sections(artifacts).items()}
+        jobs = []
+        for index, section in enumerate(artifacts.get(phase, [])):
+            changed = changed_deps(section, hashes)
+            if not changed:
+                continue
+            key = make_cache_key(
+                "section", {"section": section["hash"], "changed": {cited: hashes[cited] for cited in changed}}, normalize=False
+            )
+            jobs.append({"index": index, "section": section, "changed": changed, "key": key})
+        return jobs
+
+    def _request(self, phase: str, job: Dict[str, Any], artifacts: Dict[str, List[Dict[str, Any]]]) -> List[Any]:
+        sections = _all_sections(artifacts)
+        changed = "\n\n".join(sections[cited]["text"] for cited in job["changed"])
+        return [
+            SystemMessage(content=REGENERATE_INSTRUCTIONS.format(phase=phase)),
+            HumanMessage(content=f"Updated sections it depends on:\n\n{changed}\n\nSection to update:\n\n{job['section']['text']}"),
+        ]
+
+    def _apply(
+        self, artifacts: Dict[str, List[Dict[str, Any]]], phase: str, results: List[tuple]
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        hashes = {section_id: section["hash"] for section_id, section in _all_sections(artifacts).items()}
+        sections = list(artifacts[phase])
+        for job, text in results:
+            section = job["section"]
+            text = text.strip()
+            sections[job["index"]] = {
+                **section,
+                "text": text,
+                "hash": _hash(text),
+                "deps": {cited: hashes.get(cited, seen) for cited, seen in section["deps"].items()},
+            }
+        return {**artifacts, phase: sections}
+
+    def _cached(self, job: Dict[str, Any]) -> Optional[str]:
+        text = self.cache.get(job["key"])
+        if text is not None:
+            self.reused += 1
+        return text
+
+    def _store(self, job: Dict[str, Any], text: str) -> str:
+        self.cache.set(job["key"], text)
+        self.regenerated += 1
+        return text
+
+    async def aregenerate(self, artifacts: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        for phase in self.phase_order:
+            jobs = self._plan(artifacts, phase)
+
+            async def run(job: Dict[str, Any]) -> str:
+                cached = self._cached(job)
+                if cached is not None:
+                    return cached
+                response = await self.model.ainvoke(
+                    self._request(phase, job, artifacts), config={"tags": [TAG_NOSTREAM]}
+                )
+                return self._store(job, response.text())
+
+            if jobs:
+                texts = await asyncio.gather(*(run(job) for job in jobs))
+                artifacts = self._apply(artifacts, phase, list(zip(jobs, texts)))
+        return artifacts
+
+    def regenerate(self, artifacts: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        for phase in self.phase_order:
+            results = []
+            for job in self._plan(artifacts, phase):
+                text = self._cached(job)
+                if text is None:
+                    response = self.model.invoke(self._request(phase, job, artifacts), config={"tags": [TAG_NOSTREAM]})
+                    text = self._store(job, response.text())
+                results.append((job, text))
+            if results:
+                artifacts = self._apply(artifacts, phase, results)
+        return artifacts
+
+    async def anode(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {"artifacts": await self.aregenerate(as_sections(state.get("artifacts") or {}))}
+
+    def node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {"artifacts": self.regenerate(as_sections(state.get("artifacts") or {}))}
+
+    def stale(self, artifacts: Dict[str, Any]) -> bool:
+        artifacts = as_sections(artifacts)
+        hashes = {section_id: section["hash"] for section_id, section in _all_sections(artifacts).items()}
+        return any(changed_deps(section, hashes) for section in _all_sections(artifacts).values())
+
+    def stats(self) -> Dict[str, Any]:
+        return {"regenerated": self.regenerated, "reused": self.reused, "cached": len(self.cache)}
@@ -0,0 +1,176 @@
+import datetime
+import decimal
+import enum
+import uuid
+from typing import Any, Callable, Dict
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+from pydantic import BaseModel
+
+Encoder = Callable[["Serializer", Any], Any]
+
+# Returned as-is; checked inline to skip a dispatch per leaf value
+_PRIMITIVES = frozenset({str, int, float, bool, type(None)})
+
+
+class Serializer:
+    """JSON-safe serializer dispatching on the value's type.
+
+    Encoders are registered per type; the encoder for a class is resolved once
+    along its MRO and cached, so each value costs one dict lookup instead of a
+    chain of isinstance/hasattr checks.
+    """
+
+    def __init__(self) -> None:
+        self._registry: Dict[type, Encoder] = {}
+        self._cache: Dict[type, Encoder] = {}
+
+    def register(self, cls: type, encoder: Encoder) -> None:
+        self._registry[cls] = encoder
+        self._cache.clear()
+
+    def _resolve(self, cls: type) -> Encoder:
+        """Find and cache the encoder for a class not seen before."""
+        encoder = next((self._registry[base] for base in cls.__mro__ if base in self._registry), _encode_object)
+        self._cache[cls] = encoder
+        return encoder
+
+    def serialize(self, value: Any) -> Any:
+        cls = value.__class__
+        if cls in _PRIMITIVES:
+            return value
+        return (self._cache.get(cls) or self._resolve(cls))(self, value)
+
+
+def _identity(serializer: Serializer, value: Any) -> Any:
+    return value
+
+
+# Containers dispatch their items inline (plain loops, no nested serialize() or
+# comprehension frames): most of a graph update is small dicts and lists.
+def _encode_list(serializer: Serializer, value: Any) -> list:
+    cache = serializer._cache
+    encoded = []
+    append = encoded.append
+    for item in value:
+        cls = item.__class__
+        if cls in _PRIMITIVES:
+            append(item)
+        else:
+            append((cache.get(cls) or serializer._resolve(cls))(serializer, item))
+    return encoded
+
+
+def _encode_key(key: Any) -> str:
+    """Dict keys as json.dumps writes them, so non-str keys keep the former output."""
+    if key is True:
+        return "true"
+    if key is False:
+        return "false"
+    if key is None:
+        return "null"
+    return str(key)
+
+
+def _encode_dict(serializer: Serializer, value: dict) -> dict:
+    cache = serializer._cache
+    encoded = {}
+    for key, item in value.items():
+        if key.__class__ is not str:
+            key = _encode_key(key)
+        cls = item.__class__
+        if cls in _PRIMITIVES:
+            encoded[key] = item
+        else:
+            encoded[key] = (cache.get(cls) or serializer._resolve(cls))(serializer, item)
+    return encoded
+
+
+def _encode_message(serializer: Serializer, value: BaseMessage) -> dict:
+    content = value.content
+    additional_kwargs = value.additional_kwargs
+    return {
+        "type": value.__class__.__name__,
+        "content": content if content.__class__ is str else serializer.serialize(content),
+        "role": value.type,
+        "additional_kwargs": serializer.serialize(additional_kwargs) if additional_kwargs else {},
+        "id": value.id,
+    }
+
+
+def _encode_ai_message(serializer: Serializer, value: AIMessage) -> dict:
+    encoded = _encode_message(serializer, value)
+    tool_calls = []
+    for call in value.tool_calls:
+        args = call["args"]
+        tool_calls.append({
+            "name": call["name"],
+            "args": _encode_dict(serializer, args) if args.__class__ is dict else serializer.serialize(args),
+            "id": call.get("id"),
+        })
+    encoded["tool_calls"] = tool_calls
+    return encoded
+
+
+def _encode_tool_message(serializer: Serializer, value: ToolMessage) -> dict:
+    encoded = _encode_message(serializer, value)
+    encoded["tool_call_id"] = value.tool_call_id
+    encoded["name"] = value.name
+    return encoded
+
+
+def _encode_isoformat(serializer: Serializer, value: Any) -> str:
+    return value.isoformat()
+
+
+def _encode_str(serializer: Serializer, value: Any) -> str:
+    return str(value)
+
+
+def _encode_enum(serializer: Serializer, value: enum.Enum) -> Any:
+    return serializer.serialize(value.value)
+
+
+def _encode_pydantic(serializer: Serializer, value: BaseModel) -> Any:
+    return serializer.serialize(value.model_dump())
+
+
+def _encode_object(serializer: Serializer, value: Any) -> Any:
+    """Fallback for unregistered classes, same output as the former reflective chain."""
+    if hasattr(value, "__dict__") and not callable(value):
+        try:
+            return {"type": value.__class__.__name__, "data": serializer.serialize(value.__dict__)}
+        except Exception:
+            return str(value)
+    if callable(value):
+        return f"<function: {getattr(value, '__name__', str(value))}>"
+    try:
+        return str(value)
+    except Exception:
+        return f"<non-serializable: {type(value).__name__}>"
+
+
+def create_default_serializer() -> Serializer:
+    serializer = Serializer()
+    for cls in (type(None), str, int, float, bool):
+        serializer.register(cls, _identity)
+    for cls in (list, tuple, set, frozenset):
+        serializer.register(cls, _encode_list)
+    serializer.register(dict, _encode_dict)
+    serializer.register(BaseMessage, _encode_message)
+    serializer.register(AIMessage, _encode_ai_message)
+    serializer.register(ToolMessage, _encode_tool_message)
+    for cls in (datetime.datetime, datetime.date, datetime.time):
+        serializer.register(cls, _encode_isoformat)
+    for cls in (uuid.UUID, decimal.Decimal, bytes):
+        serializer.register(cls, _encode_str)
+    serializer.register(enum.Enum, _encode_enum)
+    serializer.register(BaseModel, _encode_pydantic)
+    return serializer
+
+
+default_serializer = create_default_serializer()
+
+
+# Serialize a value to a JSON-safe structure with the default serializer
+serialize = default_serializer.serialize
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional, the stdlib encoder is used instead
+    orjson = None
+
+
+def dumps(data: Any) -> str:
+    """Encode an event payload as compact JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode("utf-8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def format_event(data: Dict[str, Any], event_id: int) -> str:
+    return f"id: {event_id}\ndata: {dumps(data)}\n\n"
+
+
+# SSE comment line, ignored by clients but keeps proxies from closing an idle stream
+HEARTBEAT_FRAME = ": heartbeat\n\n"
+
+_END = object()
+
+
+class SSEStream:
+    """Turns an async iterator of event dicts into `text/event-stream` frames.
+
+    Consecutive `token` events are coalesced into one frame until
+    `flush_bytes` of content are buffered or `flush_interval` seconds have
+    passed since the oldest buffered token. The first token of a response is
+    sent right away so time-to-first-token is unaffected. Any other event
+    flushes pending tokens first. A heartbeat comment is written after
+    `heartbeat_interval` seconds without output.
+    """
+
+    def __init__(
+        self,
+        events: AsyncIterator[Dict[str, Any]],
+        flush_interval: Optional[float] = None,
+        flush_bytes: Optional[int] = None,
+        heartbeat_interval: Optional[float] = None,
+    ) -> None:
+        self.events = events
+        self.flush_interval = (
+            flush_interval
+            if flush_interval is not None
+            else float(os.getenv("SSE_FLUSH_INTERVAL_MS", "50")) / 1000
+        )
+        self.flush_bytes = flush_bytes if flush_bytes is not None else int(os.getenv("SSE_FLUSH_BYTES", "1024"))
+        self.heartbeat_interval = (
+            heartbeat_interval
+            if heartbeat_interval is not None
+            else float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+        )
+        self.event_id = 0
+        self.frames = 0
+        self._tokens: List[str] = []
+        self._buffered_bytes = 0
+        self._buffered_since = 0.0
+        self._sent_first_token = False
+
+    def _frame(self, data: Dict[str, Any]) -> str:
+        self.event_id += 1
+        self.frames += 1
+        return format_event(data, self.event_id)
+
+    def _flush(self) -> Optional[str]:
+        if not self._tokens:
+            return None
+        content = "".join(self._tokens)
+        self._tokens = []
+        self._buffered_bytes = 0
+        return self._frame({"type": "token", "content": content})
+
+    def _add_token(self, content: str) -> Optional[str]:
+        if not self._sent_first_token:
+            self._sent_first_token = True
+            return self._frame({"type": "token", "content": content})
+        if not self._tokens:
+            self._buffered_since = time.monotonic()
+        self._tokens.append(content)
+        self._buffered_bytes += len(content.encode("utf-8"))
+        if self._buffered_bytes >= self.flush_bytes:
+            return self._flush()
+        return None
+
+    def _timeout(self) -> Optional[float]:
+        timeouts = []
+        if self._tokens:
+            timeouts.append(max(self._buffered_since + self.flush_interval - time.monotonic(), 0))
+        if self.heartbeat_interval > 0:
+            timeouts.append(self.heartbeat_interval)
+        return min(timeouts) if timeouts else None
+
+    async def _pump(self, queue: asyncio.Queue) -> None:
+        try:
+            async for event in self.events:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(_END)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        # Bounded so a slow client applies backpressure to the graph run
+        queue: asyncio.Queue = asyncio.Queue(maxsize=64)
+        pump = asyncio.create_task(self._pump(queue))
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), self._timeout())
+                except asyncio.TimeoutError:
+                    frame = self._flush()
+                    yield frame if frame is not None else HEARTBEAT_FRAME
+                    continue
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if item.get("type") == "token" and isinstance(item.get("content"), str):
+                    frame = self._add_token(item["content"])
+                    if frame is not None:
+                        yield frame
+                    continue
+                frame = self._flush()
+                if frame is not None:
+                    yield frame
+                yield self._frame(item)
+            frame = self._flush()
+            if frame is not None:
+                yield frame
+        finally:
+            # Wait for the graph run to be torn down, so cancelled model and
+            # tool calls are finished when the stream closes
+            pump.cancel()
+            await asyncio.gather(pump, return_exceptions=True)
+
+
+async def cancel_on_disconnect(
+    iterator: AsyncIterator[Any],
+    disconnected: Awaitable[Any],
+    on_cancel: Optional[Callable[[], None]] = None,
+) -> AsyncIterator[Any]:
+    """
+    Yield from a streaming response until `disconnected` completes, then close it.
+
+    Closing the iterator cancels the graph run behind it, including in-flight
+    model and tool calls, even while nothing is being sent. `on_cancel` is
+    called when the stream ends before the iterator is exhausted: on
+    disconnect, or when the server cancels or stops reading the response.
+    """
+    watcher = asyncio.ensure_future(disconnected)
+    step: Optional[asyncio.Future] = None
+    finished = False
+    try:
+        while True:
+            step = asyncio.ensure_future(iterator.__anext__())
+            await asyncio.wait((step, watcher), return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                break
+            try:
+                item = step.result()
+            except StopAsyncIteration:
+                finished = True
+                break
+            except Exception:
+                finished = True
+                raise
+            step = None
+            yield item
+    finally:
+        watcher.cancel()
+        if not finished and on_cancel is not None:
+            on_cancel()
+        # Shielded: a server cancelling the response may cancel every await here
+        await asyncio.shield(asyncio.ensure_future(_close(iterator, step)))
+
+
+async def _close(iterator: AsyncIterator[Any], step: Optional[asyncio.Future]) -> None:
+    if step is not None and not step.done():
+        step.cancel()
+        await asyncio.gather(step, return_exceptions=True)
+    await iterator.aclose()
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StartupTimer:
+    """Records how long each named startup phase took."""
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "total_seconds": round(sum(self.phases.values()), 4),
+        }
+
+
+class LazyInstance(Generic[T]):
+    """Builds an object on first use, or ahead of time with `warmup`.
+
+    `factory` receives the StartupTimer so it can record its own phases.
+    Concurrent first uses wait for a single build.
+    """
+
+    def __init__(self, factory: Callable[[StartupTimer], T], timer: Optional[StartupTimer] = None) -> None:
+        self.factory = factory
+        self.timer = timer or StartupTimer()
+        self._instance: Optional[T] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._instance is not None
+
+    def get(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self.factory(self.timer)
+                    logger.info("Startup finished: %s", self.timer.report())
+        return self._instance
+
+    async def aget(self) -> T:
+        if self._instance is not None:
+            return self._instance
+        # Building imports modules and creates clients, keep it off the event loop
+        return await asyncio.to_thread(self.get)
+
+    async def warmup(self) -> None:
+        try:
+            await self.aget()
+        except Exception:
+            logger.exception("Warmup failed, retrying on first use")
+
+    def report(self) -> Dict[str, Any]:
+        return {"ready": self.ready, **self.timer.report()}
@@ -0,0 +1,75 @@
+from typing import Any, Dict, List, Optional
+
+from .serializer import serialize
+
+
+class StateDeltaEncoder:
+    """Encodes successive graph state values as deltas against the previous frame.
+
+    Each frame carries a sequence number `seq`. A `snapshot` frame holds the
+    full serialized state. A `delta` frame holds only what changed since frame
+    `seq - 1`:
+
+    - `messages.start`: index of the first message that was added or changed
+    - `messages.items`: serialized messages from that index on
+    - `fields`: other state keys whose value changed
+
+    A client rebuilds the state with `messages = messages[:start] + items` and
+    merging `fields`. It resynchronizes from the next snapshot if it misses a
+    frame. The first frame is always a snapshot, and every
+    `snapshot_interval`-th frame after that too (0 disables periodic snapshots).
+    """
+
+    def __init__(self, snapshot_interval: int = 0) -> None:
+        self.snapshot_interval = snapshot_interval
+        self.seq = 0
+        self._messages: List[Any] = []
+        self._fields: Dict[str, Any] = {}
+
+    @staticmethod
+    def _first_change(previous: List[Any], current: List[Any]) -> int:
+        for index, (old, new) in enumerate(zip(previous, current)):
+            # Unchanged messages are usually the same objects between steps
+            if old is not new and old != new:
+                return index
+        return min(len(previous), len(current))
+
+    def _remember(self, state: Dict[str, Any]) -> None:
+        self._messages = list(state.get("messages", []))
+        self._fields = {key: value for key, value in state.items() if key != "messages"}
+
+    def snapshot(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Full state frame; later deltas are relative to it."""
+        self.seq += 1
+        self._remember(state)
+        return {"type": "snapshot", "seq": self.seq, "content": serialize(state)}
+
+    def encode(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Frame for the next state value: a snapshot when due, otherwise a delta."""
+        if self.seq == 0 or (self.snapshot_interval and self.seq % self.snapshot_interval == 0):
+            return self.snapshot(state)
+        self.seq += 1
+        messages = state.get("messages", [])
+        start = self._first_change(self._messages, messages)
+        fields = {
+            key: serialize(value)
+            for key, value in state.items()
+            if key != "messages" and (key not in self._fields or self._fields[key] != value)
+        }
+        self._remember(state)
+        return {
+            "type": "delta",
+            "seq": self.seq,
+            "messages": {"start": start, "items": serialize(messages[start:])},
+            "fields": fields,
+        }
+
+
+def encode_snapshot(state: Optional[Dict[str, Any]], seq: int = 0) -> Dict[str, Any]:
+    """
+    Standalone snapshot frame, used to resynchronize outside of a stream.
+
+    `seq` should be the latest frame seq the client may have seen: deltas up to
+    it are already in `state`, later ones apply on top of it.
+    """
+    return {"type": "snapshot", "seq": seq, "content": serialize(state or {})}
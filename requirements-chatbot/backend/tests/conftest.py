@@ -0,0 +1,56 @@
+"""
+Shared fixtures: an offline environment and chatbots built on FakeGeminiChatModel.
+"""
+from typing import Any, Callable, List
+
+import pytest
+from langchain_core.messages import AIMessageChunk, BaseMessage
+
+from benchmarks.fakes import FakeGeminiChatModel
+
+OFFLINE_ENV = {
+    "GOOGLE_API_KEY": "offline",
+    "TAVILY_API_KEY": "offline",
+    "LANGSMITH_TRACING": "false",
+    "PROMPT_CONTEXT_CACHE": "none",
+    "TOOL_CACHE": "false",
+    "LLM_CACHE": "false",
+    "CONTEXT_TOKEN_BUDGET": "0",
+    "CONVERSATION_STORE": "memory",
+    "ATTACHMENT_UPLOAD": "none",
+}
+
+
+@pytest.fixture(autouse=True)
+def offline_env(monkeypatch: pytest.MonkeyPatch, tmp_path: Any) -> None:
+    for name, value in OFFLINE_ENV.items():
+        monkeypatch.setenv(name, value)
+    monkeypatch.setenv("ATTACHMENT_STORE_PATH", str(tmp_path / "attachments"))
+
+
+def fake_model(model_class: type = FakeGeminiChatModel, **kwargs: Any) -> Any:
+    """A FakeGeminiChatModel (or subclass) without the Gemini-like delays, unless given."""
+    return model_class(**{"latency": 0.0, "tokens_per_second": 1e6, "response_tokens": 8, **kwargs})
+
+
+class CountingModel(FakeGeminiChatModel):
+    """FakeGeminiChatModel counting the calls it answers."""
+
+    calls: int = 0
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        self.calls += 1
+        return super()._chunks(messages)
+
+
+@pytest.fixture
+def make_bot() -> Callable[..., Any]:
+    """Build a LangGraphChatbot on a fake model and no tools; keyword arguments are passed on."""
+    from src.agent import LangGraphChatbot
+
+    def make(**kwargs: Any) -> LangGraphChatbot:
+        kwargs.setdefault("chat_model", fake_model())
+        kwargs.setdefault("tools", [])
+        return LangGraphChatbot(**kwargs)
+
+    return make
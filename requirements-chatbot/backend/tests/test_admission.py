@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.admission import AdmissionController, AdmissionRejected, create_admission_controller
+
+
+def test_requests_wait_for_a_free_place() -> None:
+    async def run() -> None:
+        admission = AdmissionController(max_concurrency=1, max_queue=1)
+        slot = await admission.acquire("chat")
+        waiting = asyncio.create_task(admission.acquire("chat"))
+        await asyncio.sleep(0)
+        assert admission.queued == 1 and not waiting.done()
+
+        slot.release()
+        slot.release()
+        second = await waiting
+        assert (admission.in_flight, admission.queued, admission.admitted) == (1, 0, 2)
+        second.release()
+        assert admission.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_full_queue_and_late_requests_are_rejected() -> None:
+    async def run() -> None:
+        admission = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=0.01)
+        slot = await admission.acquire("chat")
+        waiting = asyncio.create_task(admission.acquire("chat"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as full:
+            await admission.acquire("chat")
+        with pytest.raises(AdmissionRejected) as late:
+            await waiting
+        assert (full.value.reason, late.value.reason) == ("queue_full", "timeout")
+        assert full.value.retry_after >= 1
+        assert admission.rejected == {"queue_full": 1, "timeout": 1}
+        assert (admission.in_flight, admission.queued) == (1, 0)
+        slot.release()
+
+    asyncio.run(run())
+
+
+def test_endpoint_limits_leave_room_for_other_endpoints() -> None:
+    async def run() -> None:
+        admission = AdmissionController(max_concurrency=3, queue_timeout=0.01, endpoint_limits={"batch": 1})
+        await admission.acquire("batch")
+
+        with pytest.raises(AdmissionRejected):
+            await admission.acquire("batch")
+        await admission.acquire("chat")
+        await admission.acquire("chat")
+        stats = admission.stats()
+        assert stats["in_flight"] == 3
+        assert stats["endpoints"]["batch"] == {"limit": 1, "in_flight": 1, "queued": 0, "admitted": 1}
+
+    asyncio.run(run())
+
+
+def test_streams_hold_their_slot_until_they_end() -> None:
+    async def tokens() -> AsyncIterator[str]:
+        yield "a"
+        yield "b"
+
+    async def run() -> None:
+        admission = AdmissionController(max_concurrency=1)
+        stream = admission.hold(await admission.acquire("stream"), tokens())
+
+        assert await stream.__anext__() == "a"
+        assert admission.in_flight == 1
+        await stream.aclose()
+        assert admission.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_controller_reads_the_environment(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("ADMISSION_MAX_CONCURRENCY", "4")
+    monkeypatch.setenv("ADMISSION_ENDPOINT_LIMITS", "stream=2, batch=1")
+
+    admission = create_admission_controller()
+
+    assert admission.max_concurrency == 4
+    assert admission.endpoint_limits == {"stream": 2, "batch": 1}
+
+
+def test_busy_server_answers_429(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    import main
+
+    admission = AdmissionController(max_concurrency=1, max_queue=0)
+    monkeypatch.setattr(main, "admission", admission)
+    monkeypatch.setattr(main.chatbot, "_instance", make_bot())
+    client = TestClient(main.app)
+
+    assert client.post("/chat", json={"message": "hi"}).status_code == 200
+    slot = asyncio.run(admission.acquire("chat"))
+    response = client.post("/chat", json={"message": "hi"})
+    slot.release()
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert admission.stats()["rejected"]["queue_full"] == 1
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from pathlib import Path
+from typing import AsyncIterator, List, Tuple
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.attachments import AttachmentStore, AttachmentTooLarge, FileUploader, UnknownAttachment
+
+
+class RecordingUploader(FileUploader):
+    """Returns a fake URI per upload and records the uploaded files."""
+
+    def __init__(self, ttl: float = 3600 * 48) -> None:
+        self.ttl = ttl
+        self.uploads: List[Tuple[str, str]] = []
+
+    def upload(self, path: Path, mime_type: str) -> Tuple[str, float]:
+        self.uploads.append((path.name, mime_type))
+        return f"files/{len(self.uploads)}", time.time() + self.ttl
+
+
+async def chunked(*chunks: bytes) -> AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+def referring(*attachment_ids: str) -> HumanMessage:
+    return HumanMessage(content="Review this", id="h1", additional_kwargs={"attachments": list(attachment_ids)})
+
+
+def test_same_content_is_stored_once(tmp_path: Path) -> None:
+    store = AttachmentStore(tmp_path)
+
+    first = asyncio.run(store.asave(chunked(b"page ", b"one"), "image/png"))
+    second = store.save(b"page one", "image/png")
+
+    assert first == second
+    assert store.read(first.id) == b"page one"
+    assert [path.name for path in tmp_path.rglob(first.id)] == [first.id]
+    assert not list(tmp_path.glob(".upload-*"))
+
+
+def test_too_large_uploads_leave_nothing_behind(tmp_path: Path) -> None:
+    store = AttachmentStore(tmp_path, max_bytes=4)
+
+    with pytest.raises(AttachmentTooLarge):
+        asyncio.run(store.asave(chunked(b"abc", b"def"), "image/png"))
+
+    assert not [path for path in tmp_path.rglob("*") if path.is_file()]
+
+
+def test_materialize_uploads_each_file_once(tmp_path: Path) -> None:
+    uploader = RecordingUploader()
+    store = AttachmentStore(tmp_path, uploader=uploader)
+    attachment = store.save(b"diagram", "image/png")
+    messages = [referring(attachment.id), AIMessage(content="Noted"), referring(attachment.id)]
+
+    first = store.materialize(messages)
+    second = asyncio.run(store.amaterialize(messages))
+
+    block = {"type": "media", "mime_type": "image/png", "file_uri": "files/1"}
+    assert first[0].content == [{"type": "text", "text": "Review this"}, block]
+    assert first[0].id == "h1"
+    assert first[1] is messages[1]
+    assert second == first
+    assert uploader.uploads == [(attachment.id, "image/png")]
+    # A restarted server reuses the upload
+    restarted = AttachmentStore(tmp_path, uploader=uploader)
+    assert restarted.materialize(messages)[0].content[1] == block
+    assert len(uploader.uploads) == 1
+
+
+def test_expiring_uploads_are_renewed(tmp_path: Path) -> None:
+    uploader = RecordingUploader(ttl=60)
+    store = AttachmentStore(tmp_path, uploader=uploader)
+    attachment = store.save(b"diagram", "image/png")
+
+    store.materialize([referring(attachment.id)])
+    renewed = store.materialize([referring(attachment.id)])
+
+    assert renewed[0].content[1]["file_uri"] == "files/2"
+    assert store.uploads == 2
+
+
+def test_materialize_sends_bytes_inline_without_an_uploader(tmp_path: Path) -> None:
+    store = AttachmentStore(tmp_path)
+    attachment = store.save(b"diagram", "image/png")
+    plain = [HumanMessage(content="Hello")]
+
+    materialized = store.materialize([referring(attachment.id)])
+
+    assert materialized[0].content[1] == {"type": "media", "mime_type": "image/png", "data": b"diagram"}
+    assert asyncio.run(store.amaterialize(plain)) is plain
+    with pytest.raises(UnknownAttachment):
+        store.materialize([referring("0" * 64)])
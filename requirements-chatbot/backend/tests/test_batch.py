@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any, List
+
+from src.admission import AdmissionController
+from src.agent import BatchChatRequest, ChatRequest
+
+
+def batch(size: int, **kwargs: Any) -> BatchChatRequest:
+    return BatchChatRequest(requests=[ChatRequest(message=f"question {i}") for i in range(size)], **kwargs)
+
+
+async def collect(bot: Any, request: BatchChatRequest, admission: AdmissionController) -> List[dict]:
+    return [result async for result in bot.batch_events(request, admission)]
+
+
+def test_each_batch_request_takes_an_admission_slot(make_bot: Any) -> None:
+    bot = make_bot()
+    chat = bot.chat
+    peak = 0
+
+    async def run() -> List[dict]:
+        admission = AdmissionController(max_concurrency=2)
+
+        async def counting_chat(request: ChatRequest) -> Any:
+            nonlocal peak
+            peak = max(peak, admission.in_flight)
+            await asyncio.sleep(0.01)
+            return await chat(request)
+
+        bot.chat = counting_chat
+        results = await collect(bot, batch(6, max_concurrency=6), admission)
+        assert admission.admitted == 6 and admission.in_flight == 0
+        return results
+
+    results = asyncio.run(run())
+
+    assert sorted(result["index"] for result in results) == list(range(6))
+    assert all(result["status"] == "ok" for result in results)
+    assert peak == 2
+
+
+def test_requests_not_admitted_are_rejected(make_bot: Any) -> None:
+    bot = make_bot()
+
+    async def run() -> List[dict]:
+        admission = AdmissionController(max_concurrency=1, max_queue=0)
+        slot = await admission.acquire("chat")
+        try:
+            return await collect(bot, batch(2), admission)
+        finally:
+            slot.release()
+
+    results = asyncio.run(run())
+
+    assert [result["status"] for result in results] == ["rejected", "rejected"]
+    assert all(result["retry_after"] >= 1 for result in results)
@@ -0,0 +1,163 @@
+import asyncio
+from typing import Any
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from src.cache import MemoryCache, SQLiteCache, TieredCache, ToolResultCache, create_tool_cache
+from src.graph_node import BasicToolNode
+
+
+class Clock:
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_memory_cache_evicts_least_recently_used() -> None:
+    cache = MemoryCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_memory_cache_expires_entries_after_ttl() -> None:
+    clock = Clock()
+    cache = MemoryCache(ttl=10, clock=clock)
+    cache.set("a", 1)
+
+    clock.now += 9.9
+    assert cache.get("a") == 1
+    clock.now += 0.1
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_sqlite_cache_expires_and_evicts(tmp_path: Any) -> None:
+    clock = Clock()
+    cache = SQLiteCache(str(tmp_path / "tools.sqlite"), max_entries=2, ttl=10, clock=clock)
+    cache.set("a", {"result": 1})
+    clock.now += 1
+    cache.set("b", 2)
+    clock.now += 1
+    cache.set("c", 3)
+
+    assert cache.get("a") is None
+    assert cache.evictions == 1
+    clock.now += 10
+    assert cache.get("c") is None
+
+
+def test_disk_hits_are_promoted_with_their_remaining_ttl(tmp_path: Any) -> None:
+    clock = Clock()
+    disk = SQLiteCache(str(tmp_path / "tools.sqlite"), ttl=10, clock=clock)
+    disk.set("a", "value")
+    cache = TieredCache(MemoryCache(ttl=10, clock=clock), disk)
+
+    clock.now += 6
+    assert cache.get("a") == "value"
+    assert cache.stats()["disk_hits"] == 1
+    disk.clear()
+    assert cache.get("a") == "value"
+    # The promoted entry keeps the disk entry's expiry, not a fresh TTL
+    clock.now += 4
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_tool_keys_ignore_whitespace_and_query_case() -> None:
+    cache = ToolResultCache(MemoryCache())
+
+    assert cache.key_for("search", {"query": "EARS  notation"}) == cache.key_for("search", {"query": "ears notation"})
+    assert cache.key_for("search", {"query": "a"}) != cache.key_for("other", {"query": "a"})
+    assert cache.key_for("edit", {"text": "Shall  X"}) == cache.key_for("edit", {"text": "Shall X"})
+    assert cache.key_for("edit", {"text": "Shall X"}) != cache.key_for("edit", {"text": "shall x"})
+
+
+def test_only_listed_tools_are_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TOOL_CACHE", "true")
+    monkeypatch.setenv("TOOL_CACHE_TOOLS", "tavily_search, lookup")
+
+    cache = create_tool_cache()
+
+    assert cache.caches("tavily_search") and cache.caches("lookup")
+    assert not cache.caches("advance_phase")
+
+
+def test_zero_ttl_is_kept(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TOOL_CACHE", "true")
+    monkeypatch.setenv("TOOL_CACHE_TTL_SECONDS", "3600")
+
+    cache = create_tool_cache(ttl=0)
+    cache.set("a", 1)
+
+    assert cache.memory.ttl == 0
+    assert cache.get("a") is None
+
+
+def test_tool_cache_can_be_disabled(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("TOOL_CACHE", "false")
+
+    assert create_tool_cache() is None
+
+
+def test_tool_node_reuses_cached_results() -> None:
+    calls = []
+
+    @tool
+    def search(query: str) -> str:
+        """Search the web."""
+        calls.append(query)
+        return f"results for {query}"
+
+    node = BasicToolNode([search], cache=ToolResultCache(MemoryCache(), tools={"search"}))
+
+    def turn(query: str) -> dict:
+        message = AIMessage(content="", tool_calls=[{"name": "search", "args": {"query": query}, "id": query}])
+        return {"messages": [message]}
+
+    first = asyncio.run(node.acall(turn("EARS")))
+    again = asyncio.run(node.acall(turn("ears ")))
+    node(turn("EARS"))
+
+    assert calls == ["EARS"]
+    assert first["messages"][0].content == again["messages"][0].content
+
+
+def test_tool_node_skips_uncached_tools_and_errors() -> None:
+    calls = []
+
+    @tool
+    def search(query: str) -> dict:
+        """Search the web."""
+        calls.append(query)
+        return {"error": "rate limited"}
+
+    @tool
+    def advance_phase(phase: str) -> str:
+        """Move to the next phase."""
+        calls.append(phase)
+        return phase
+
+    cache = ToolResultCache(MemoryCache(), tools={"search"})
+    node = BasicToolNode([search, advance_phase], cache=cache)
+
+    def turn(name: str, args: dict) -> dict:
+        message = AIMessage(content="", tool_calls=[{"name": name, "args": args, "id": name}])
+        return {"messages": [message]}
+
+    for _ in range(2):
+        asyncio.run(node.acall(turn("search", {"query": "EARS"})))
+        node(turn("advance_phase", {"phase": "drafting"}))
+
+    assert calls == ["EARS", "drafting", "EARS", "drafting"]
+    assert len(cache.memory) == 0
@@ -0,0 +1,96 @@
+import asyncio
+from typing import Any, List
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+
+from src.agent import ChatRequest
+from src.context_window import ContextWindowManager
+from tests.conftest import fake_model
+
+
+class Summarizer:
+    """Records the summary requests and answers "summary <n>"."""
+
+    def __init__(self) -> None:
+        self.requests: List[List[BaseMessage]] = []
+
+    def invoke(self, messages: List[BaseMessage], config: Any = None) -> AIMessage:
+        self.requests.append(messages)
+        return AIMessage(content=f"summary {len(self.requests)}")
+
+    async def ainvoke(self, messages: List[BaseMessage], config: Any = None) -> AIMessage:
+        return self.invoke(messages, config)
+
+
+def turns(start: int, count: int) -> List[BaseMessage]:
+    """`count` alternating user/assistant messages of about 100 tokens each."""
+    return [
+        (HumanMessage if index % 2 == 0 else AIMessage)(content=f"m{index} " + "x" * 400)
+        for index in range(start, start + count)
+    ]
+
+
+def test_history_within_budget_is_not_summarized() -> None:
+    summarizer = Summarizer()
+    manager = ContextWindowManager(summarizer, token_budget=5000)
+    state = {"messages": turns(0, 6)}
+
+    fields = manager.node(state)
+
+    assert summarizer.requests == []
+    assert fields["summary_upto"] == 0
+    assert manager.context_messages({**state, **fields}) == state["messages"]
+
+
+def test_old_turns_are_folded_incrementally() -> None:
+    summarizer = Summarizer()
+    manager = ContextWindowManager(summarizer, token_budget=500, keep_ratio=0.5)
+    messages = turns(0, 10)
+
+    first = asyncio.run(manager.anode({"messages": messages}))
+
+    assert (first["summary"], first["summary_upto"]) == ("summary 1", 8)
+    assert "m0 " in summarizer.requests[0][1].content and "m7 " in summarizer.requests[0][1].content
+    assert "m8 " not in summarizer.requests[0][1].content
+    context = manager.context_messages({"messages": messages, **first})
+    assert isinstance(context[0], SystemMessage) and "summary 1" in context[0].content
+    assert context[1:] == messages[8:]
+    assert first["context_tokens_saved"] > 0
+
+    # The next fold only sends the messages after the previous window start
+    messages = messages + turns(10, 4)
+    second = manager.node({"messages": messages, **first})
+
+    assert (second["summary"], second["summary_upto"]) == ("summary 2", 12)
+    request = summarizer.requests[1][1].content
+    assert "Current summary:\nsummary 1" in request
+    assert "m8 " in request and "m11 " in request and "m7 " not in request
+
+
+def test_resent_history_reuses_the_cached_summary() -> None:
+    summarizer = Summarizer()
+    manager = ContextWindowManager(summarizer, token_budget=500)
+    messages = turns(0, 10)
+    manager.node({"messages": messages})
+
+    # A client resending the full history, without the summary fields
+    fields = manager.node({"messages": list(messages)})
+
+    assert len(summarizer.requests) == 1
+    assert (fields["summary"], fields["summary_upto"]) == ("summary 1", 8)
+    assert manager.stats()["summarizations"] == 1
+
+
+def test_chatbot_sends_the_summary_instead_of_folded_turns(make_bot: Any) -> None:
+    summarizer = Summarizer()
+    bot = make_bot(
+        chat_model=fake_model(response_tokens=100),
+        context_window=ContextWindowManager(summarizer, token_budget=300),
+    )
+
+    for index in range(4):
+        response = asyncio.run(bot.chat(ChatRequest(message=f"question {index} " + "y" * 400, thread_id="t")))
+
+    assert summarizer.requests
+    assert response.context_tokens_saved > 0
+    assert len(response.conversation_history) == 8
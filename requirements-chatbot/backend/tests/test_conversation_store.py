@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any
+
+from src.agent import ChatRequest
+from src.conversation_store import create_conversation_store
+
+
+def test_threads_resume_without_resending_history(make_bot: Any) -> None:
+    bot = make_bot()
+
+    asyncio.run(bot.chat(ChatRequest(message="First question", thread_id="t1")))
+    second = asyncio.run(bot.chat(ChatRequest(message="Second question", thread_id="t1")))
+    other = bot.chat_sync(ChatRequest(message="Elsewhere", thread_id="t2"))
+
+    assert [m.content for m in second.conversation_history if m.role == "user"] == ["First question", "Second question"]
+    assert len(second.conversation_history) == 4
+    assert second.thread_id == "t1"
+    assert len(other.conversation_history) == 2
+    assert bot.store.stats()["hits"] == 1
+
+
+def test_least_recently_used_thread_is_evicted(make_bot: Any) -> None:
+    bot = make_bot(store=create_conversation_store("memory", max_threads=2))
+
+    for thread_id in ("a", "b", "a", "c"):
+        asyncio.run(bot.chat(ChatRequest(message=f"hello {thread_id}", thread_id=thread_id)))
+
+    assert not bot.store.checkpointer.has_thread("b")
+    assert bot.store.checkpointer.has_thread("a") and bot.store.checkpointer.has_thread("c")
+    assert bot.store.stats()["evictions"] == 1
+    # An evicted thread starts over
+    restarted = asyncio.run(bot.chat(ChatRequest(message="back", thread_id="b")))
+    assert len(restarted.conversation_history) == 2
+
+
+def test_sqlite_threads_survive_a_restart(make_bot: Any, tmp_path: Any) -> None:
+    path = str(tmp_path / "conversations.sqlite")
+    first = make_bot(store=create_conversation_store("sqlite", path=path))
+    asyncio.run(first.chat(ChatRequest(message="Remember me", thread_id="t")))
+
+    restarted = make_bot(store=create_conversation_store("sqlite", path=path))
+    response = asyncio.run(restarted.chat(ChatRequest(message="Still there?", thread_id="t")))
+
+    assert response.conversation_history[0].content == "Remember me"
+    assert restarted.store.size() == 1
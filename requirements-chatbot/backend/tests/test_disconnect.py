@@ -0,0 +1,89 @@
+import asyncio
+from typing import Any, AsyncIterator, List
+
+import pytest
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.tools import StructuredTool
+
+import main
+from benchmarks.fakes import FakeGeminiChatModel
+from src.admission import AdmissionController
+from src.agent import ChatStreamRequest
+from tests.conftest import fake_model
+
+
+class TrackedModel(FakeGeminiChatModel):
+    """FakeGeminiChatModel recording when its token stream starts and is cancelled."""
+
+    # Shared with the test, so not validated (pydantic would copy a list)
+    started: Any = None
+    cancelled: Any = None
+
+    async def _astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        try:
+            async for chunk in super()._astream(*args, **kwargs):
+                self.started.set()
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled.append("model")
+            raise
+
+
+class Client:
+    """The ASGI `receive` of a client that disconnects when told to."""
+
+    def __init__(self) -> None:
+        self.gone = asyncio.Event()
+
+    async def receive(self) -> dict:
+        await self.gone.wait()
+        return {"type": "http.disconnect"}
+
+
+def tracked_search(started: asyncio.Event, cancelled: List[str]) -> StructuredTool:
+    async def search(query: str) -> str:
+        started.set()
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            cancelled.append("tool")
+            raise
+        return "results"
+
+    return StructuredTool.from_function(coroutine=search, name="tavily_search", description="Search the web.")
+
+
+@pytest.mark.parametrize("busy", ["model", "tool"])
+def test_disconnect_cancels_the_run_and_frees_the_slot(
+    monkeypatch: pytest.MonkeyPatch, make_bot: Any, busy: str
+) -> None:
+    async def run() -> None:
+        admission = AdmissionController(max_concurrency=1)
+        monkeypatch.setattr(main, "admission", admission)
+        started, cancelled = asyncio.Event(), []
+        if busy == "model":
+            # A slow answer, still streaming when the client leaves
+            model = fake_model(TrackedModel, tokens_per_second=4.0, response_tokens=400, started=started, cancelled=cancelled)
+        else:
+            # A tool call right away, then the tool runs until the client leaves
+            model = fake_model(TrackedModel, tool_rate=1.0, started=asyncio.Event(), cancelled=cancelled)
+        bot = make_bot(chat_model=model, tools=[tracked_search(started, cancelled)])
+        client = Client()
+        slot = await admission.acquire("stream")
+        body = main.streamed(client, "stream", slot, bot.stream_chat(ChatStreamRequest(message="hi")))
+
+        async def consume() -> None:
+            async for _ in body:
+                pass
+
+        response = asyncio.create_task(consume())
+        await asyncio.wait_for(started.wait(), 5)
+        client.gone.set()
+        await asyncio.wait_for(response, 5)
+
+        assert cancelled == [busy]
+        assert admission.in_flight == 0
+        # The freed slot admits the next request right away
+        (await asyncio.wait_for(admission.acquire("stream"), 1)).release()
+
+    asyncio.run(run())
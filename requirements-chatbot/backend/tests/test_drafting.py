@@ -0,0 +1,73 @@
+import asyncio
+import json
+import re
+from typing import Any, Dict, List
+
+import pytest
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage
+
+from benchmarks.fakes import FakeGeminiChatModel
+from src.agent import ChatRequest, ChatStreamRequest
+
+SECTIONS = 3
+
+
+class OutlineModel(FakeGeminiChatModel):
+    """Answers with a `write_document` outline; the first sections take the longest to write."""
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        instructions = str(messages[-1].content) if isinstance(messages[-1], HumanMessage) else ""
+        if match := re.match(r"Write section (\d+)", instructions):
+            number = int(match.group(1))
+            filler = [AIMessageChunk(content=".") for _ in range((SECTIONS + 1 - number) * 4)]
+            return [AIMessageChunk(content=f"## Part {number}\n"), *filler]
+        outline = [{"title": f"Part {number}", "brief": "One component"} for number in range(1, SECTIONS + 1)]
+        return [AIMessageChunk(content="", tool_call_chunks=[{
+            "name": "write_document",
+            "args": json.dumps({"title": "Plan", "sections": outline}),
+            "id": "outline-1",
+            "index": 0,
+        }])]
+
+
+@pytest.fixture
+def writer_bot(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> Any:
+    monkeypatch.setenv("DOCUMENT_FANOUT_CONCURRENCY", "4")
+    return make_bot(chat_model=OutlineModel(latency=0.0, tokens_per_chunk=1, tokens_per_second=200))
+
+
+def test_fan_out_is_off_by_default(make_bot: Any) -> None:
+    bot = make_bot()
+
+    assert bot.document_writer is None
+    assert "write_document" not in bot.tool_node.tools_by_name
+
+
+def test_sections_are_written_by_the_traced_model(writer_bot: Any) -> None:
+    assert writer_bot.document_writer.model is writer_bot.traced_model
+
+
+def test_sections_are_merged_in_outline_order(writer_bot: Any) -> None:
+    response = asyncio.run(writer_bot.chat(ChatRequest(message="Write the plan")))
+
+    assert response.response == "# Plan\n\n" + "\n\n".join(
+        f"## Part {number}\n" + "." * ((SECTIONS + 1 - number) * 4) for number in range(1, SECTIONS + 1)
+    )
+
+
+def test_sections_stream_as_they_complete(writer_bot: Any) -> None:
+    async def run() -> List[Dict[str, Any]]:
+        request = ChatStreamRequest(message="Write the plan")
+        return [event async for event in writer_bot.stream_events(request)]
+
+    events = asyncio.run(run())
+    sections = [event for event in events if event["type"] == "section"]
+
+    # The last section is the shortest, so it completes first
+    assert [section["index"] for section in sections] == [2, 1, 0]
+    assert {section["count"] for section in sections} == {SECTIONS}
+    assert sections[0]["title"] == "Part 3"
+    assert sections[0]["text"] == "## Part 3\n...."
+    # The merged document is not streamed again
+    assert not [event for event in events if event["type"] == "token" and "## Part" in event["content"]]
+    assert events[-1] == {"type": "done"}
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Any, AsyncIterator, List
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from src.agent import ChatRequest
+from src.graph_node import EAGER_TOOL_CALLS_KEY
+from tests.conftest import fake_model
+
+
+class EmptyStream:
+    """A model (or a hedged call) whose stream ends before the first chunk."""
+
+    async def astream(self, messages: List[Any], **kwargs: Any) -> AsyncIterator[Any]:
+        return
+        yield
+
+
+def test_empty_stream_gives_an_empty_message(make_bot: Any) -> None:
+    bot = make_bot()
+    route = bot.router.routes([])[0]
+
+    response = asyncio.run(bot._astream_response(EmptyStream(), [], {}, route, bot.tool_node.eager_calls()))
+
+    assert isinstance(response, AIMessage) and response.content == ""
+
+
+def test_early_tool_calls_are_opt_in(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    request = ChatRequest(message="hi")
+    monkeypatch.delenv("EAGER_TOOL_CALLS", raising=False)
+    assert EAGER_TOOL_CALLS_KEY not in make_bot()._build_config(request)["configurable"]
+
+    monkeypatch.setenv("EAGER_TOOL_CALLS", "true")
+    bot = make_bot()
+    assert EAGER_TOOL_CALLS_KEY in bot._build_config(request)["configurable"]
+    assert EAGER_TOOL_CALLS_KEY not in bot._prepare_run_sync(request)[2]["configurable"]
+
+
+def test_early_tool_calls_run_each_tool_once(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    monkeypatch.setenv("EAGER_TOOL_CALLS", "true")
+    queries = []
+
+    @tool
+    def tavily_search(query: str) -> str:
+        """Search the web."""
+        queries.append(query)
+        return "results"
+
+    bot = make_bot(chat_model=fake_model(tool_rate=1.0, tool_call_tokens=8), tools=[tavily_search])
+
+    response = asyncio.run(bot.chat(ChatRequest(message="EARS notation")))
+
+    assert queries == ["EARS notation"]
+    assert response.response
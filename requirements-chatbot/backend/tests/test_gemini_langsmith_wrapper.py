@@ -0,0 +1,113 @@
+import asyncio
+from typing import Any, Iterator, List
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langsmith import tracing_context
+
+from src.gemini_langsmith_wrapper import (
+    GeminiStreamAggregator,
+    PatchedGeminiClient,
+    TraceExporter,
+    gemini_aggregator,
+    wrap_gemini,
+)
+from tests.conftest import fake_model
+
+
+@pytest.fixture
+def exporter() -> TraceExporter:
+    exporter = TraceExporter(client=MagicMock())
+    # Records stay queued, so the tests can look at them
+    exporter._start = lambda: None
+    return exporter
+
+
+@pytest.fixture
+def tracing_on() -> Iterator[None]:
+    # LangSmith caches its environment variables, the context overrides them; nothing is sent
+    with tracing_context(enabled=True, client=MagicMock()):
+        yield
+
+
+def test_keeps_the_chat_model_call_signatures(exporter: TraceExporter) -> None:
+    llm = wrap_gemini(fake_model(), exporter=exporter)
+
+    assert isinstance(llm.invoke("hi"), AIMessage)
+    assert isinstance(asyncio.run(llm.ainvoke([HumanMessage(content="hi")])), AIMessage)
+    assert "".join(chunk.content for chunk in llm.stream("hi", stop=["."]))
+
+    async def astream() -> list:
+        return [chunk async for chunk in llm.astream("hi", {"tags": ["test"]})]
+
+    assert asyncio.run(astream())
+
+
+def test_bound_runnable_is_traced(tracing_on: None, exporter: TraceExporter) -> None:
+    llm = wrap_gemini(fake_model(), exporter=exporter).bind_tools([])
+
+    assert isinstance(llm, PatchedGeminiClient)
+    asyncio.run(llm.ainvoke("hi"))
+
+    record = exporter.queue.get_nowait()
+    assert record["inputs"]["messages"] == "hi"
+    assert isinstance(record["output"], AIMessage)
+
+
+class RecordingAggregator(GeminiStreamAggregator):
+    added: List[Any] = []
+
+    def add(self, chunk: Any) -> None:
+        self.added.append(chunk)
+        super().add(chunk)
+
+
+def test_streamed_chunks_are_aggregated_as_they_arrive(tracing_on: None, exporter: TraceExporter) -> None:
+    RecordingAggregator.added = []
+    llm = wrap_gemini(fake_model(), {"aggregator": RecordingAggregator}, exporter=exporter)
+
+    async def run() -> List[Any]:
+        chunks = []
+        async for chunk in llm.astream("hi"):
+            chunks.append(chunk)
+            # Added before the chunk is handed on
+            assert RecordingAggregator.added == chunks
+        return chunks
+
+    chunks = asyncio.run(run())
+    sync_chunks = list(llm.stream("hi"))
+
+    for expected in (chunks, sync_chunks):
+        record = exporter.queue.get_nowait()
+        assert record["streaming"] and isinstance(record["output"], RecordingAggregator)
+        assert record["output"].result().content == "".join(chunk.content for chunk in expected)
+    exporter._export(record)
+    outputs = exporter.client.create_run.call_args.kwargs["outputs"]
+    assert outputs["content"] == "".join(chunk.content for chunk in sync_chunks)
+
+
+def test_calls_are_not_recorded_when_tracing_is_off(exporter: TraceExporter) -> None:
+    llm = wrap_gemini(fake_model(), exporter=exporter)
+
+    llm.invoke("hi")
+
+    assert exporter.queue.empty()
+
+
+def test_trailing_finish_reason_and_usage_chunks_are_kept() -> None:
+    usage = {"promptTokenCount": 12, "candidatesTokenCount": 4, "totalTokenCount": 16}
+    chunks = [
+        {"candidates": [{"content": {"role": "model", "parts": [{"text": "Hello"}]}}], "modelVersion": "gemini-2.0-flash"},
+        {"candidates": [{"content": {"role": "model", "parts": [{"text": " world"}]}}]},
+        {"candidates": [{"finishReason": "STOP"}]},
+        {"usageMetadata": usage},
+    ]
+
+    response = gemini_aggregator(chunks)
+
+    candidate = response["candidates"][0]
+    assert candidate["content"]["parts"] == [{"text": "Hello world"}]
+    assert candidate["finishReason"] == "STOP"
+    assert response["usageMetadata"] == usage
+    assert response["modelVersion"] == "gemini-2.0-flash"
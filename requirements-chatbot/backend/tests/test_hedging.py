@@ -0,0 +1,145 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, List, Optional
+
+import pytest
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, BaseCallbackHandler
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.runnables import RunnableLambda
+
+from benchmarks.fakes import FakeGeminiChatModel
+from src.agent import ChatStreamRequest
+from src.hedging import LLMHedger
+
+
+class TextModel(FakeGeminiChatModel):
+    """Streams `text` as one chunk, after `release` is set when given."""
+
+    text: str = ""
+    # Shared with the test, so not validated
+    release: Any = None
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        return [AIMessageChunk(content=self.text)]
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.release is not None:
+            await self.release.wait()
+        async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+            yield chunk
+
+
+class TokenRecorder(BaseCallbackHandler):
+    run_inline = True
+
+    def __init__(self) -> None:
+        self.tokens: List[str] = []
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.tokens.append(token)
+
+
+def starter(*models: TextModel, closed: List[str]) -> Callable[[Any], AsyncIterator[Any]]:
+    """Starts the primary attempt on the first model and the hedge on the second."""
+    queue = list(models)
+
+    async def stream(model: TextModel, callbacks: Any) -> AsyncIterator[Any]:
+        try:
+            async for chunk in model.astream("Hello", config={"callbacks": callbacks}):
+                yield chunk
+        finally:
+            closed.append(model.text)
+
+    return lambda callbacks: stream(queue.pop(0), callbacks)
+
+
+def primed_hedger(**kwargs: Any) -> LLMHedger:
+    """A hedger firing after 10 ms."""
+    hedger = LLMHedger(min_samples=1, **{"budget_ratio": 1.0, **kwargs})
+    hedger.latencies.observe("m", 0.01)
+    return hedger
+
+
+async def collect(hedger: LLMHedger, start: Callable[[Any], AsyncIterator[Any]]) -> str:
+    return "".join([chunk.content async for chunk in hedger.astream("m", start)])
+
+
+def test_late_calls_are_hedged_and_the_loser_cancelled() -> None:
+    hedger = primed_hedger()
+    closed: List[str] = []
+    start = starter(TextModel(text="primary", latency=5.0), TextModel(text="hedge", latency=0.0), closed=closed)
+
+    started = time.perf_counter()
+    text = asyncio.run(collect(hedger, start))
+
+    assert text == "hedge"
+    assert time.perf_counter() - started < 1.0
+    assert sorted(closed) == ["hedge", "primary"]
+    assert hedger.stats()["fired"] == 1
+    assert hedger.stats()["won"] == 1
+
+
+def test_budget_caps_the_hedges() -> None:
+    # Fires after the fastest recent call, however slow the unhedged calls were
+    hedger = primed_hedger(percentile=0.0, budget_ratio=0.5, budget_burst=1.0)
+
+    async def run() -> List[str]:
+        texts = []
+        for _ in range(3):
+            start = starter(TextModel(text="primary", latency=0.1), TextModel(text="hedge", latency=0.0), closed=[])
+            texts.append(await collect(hedger, start))
+        return texts
+
+    texts = asyncio.run(run())
+
+    # Half a hedge is earned per call: only the second call has a whole one
+    assert texts == ["primary", "hedge", "primary"]
+    assert hedger.stats() == {"calls": 3, "fired": 1, "won": 1, "budget_exhausted": 2, "budget_tokens": 0.5}
+
+
+def test_loser_tokens_never_reach_the_callbacks() -> None:
+    hedger = primed_hedger()
+    recorder = TokenRecorder()
+    closed: List[str] = []
+
+    async def body(_: Any) -> str:
+        # Both attempts stream their first chunk in the same event loop step
+        release = asyncio.Event()
+        models = [TextModel(text=text, latency=0.0, release=release) for text in ("primary", "hedge")]
+        start = starter(*models, closed=closed)
+
+        def start_and_release(callbacks: Any) -> AsyncIterator[Any]:
+            if hedger.stats()["fired"]:
+                # The hedge is starting
+                asyncio.get_running_loop().call_later(0.01, release.set)
+            return start(callbacks)
+
+        return await collect(hedger, start_and_release)
+
+    text = asyncio.run(RunnableLambda(body).ainvoke(None, config={"callbacks": [recorder]}))
+
+    assert text == "primary"
+    assert hedger.stats()["fired"] == 1
+    assert hedger.stats()["won"] == 0
+    assert recorder.tokens == ["primary"]
+    assert sorted(closed) == ["hedge", "primary"]
+
+
+def test_hedged_chat_streams_tokens(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    monkeypatch.setenv("LLM_HEDGING", "true")
+    bot = make_bot(chat_model=TextModel(text="Hello there", latency=0.0))
+
+    async def run() -> List[Any]:
+        return [event async for event in bot.stream_events(ChatStreamRequest(message="Hi"))]
+
+    events = asyncio.run(run())
+
+    assert [event for event in events if event["type"] == "token"] == [{"type": "token", "content": "Hello there"}]
+    assert bot.hedger.stats()["calls"] == 1
@@ -0,0 +1,86 @@
+import asyncio
+from typing import Any
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.agent import ChatRequest
+from src.cache import LLMResponseCache, MemoryCache, SQLiteCache, create_llm_cache
+from tests.conftest import CountingModel, fake_model
+
+SCOPE = {"model": "gemini-2.0-flash", "temperature": 0.5, "tools": [], "prompt": "abc"}
+
+
+def test_key_covers_messages_and_scope() -> None:
+    cache = LLMResponseCache(MemoryCache())
+    messages = [HumanMessage(content="Hello")]
+    key = cache.key_for(messages, SCOPE)
+
+    assert key == cache.key_for([HumanMessage(content="Hello")], dict(SCOPE))
+    # Unlike tool keys, message text is not normalized
+    assert key != cache.key_for([HumanMessage(content="hello")], SCOPE)
+    assert key != cache.key_for(messages, {**SCOPE, "model": "gemini-2.5-pro"})
+    assert key != cache.key_for(messages, {**SCOPE, "prompt": "def"})
+    tool_turn = [AIMessage(content="", tool_calls=[{"name": "search", "args": {"q": "a"}, "id": "1"}])]
+    assert cache.key_for([*tool_turn, ToolMessage(content="r", tool_call_id="1")], SCOPE) != cache.key_for(
+        [*tool_turn, ToolMessage(content="r", tool_call_id="2")], SCOPE
+    )
+
+
+def test_key_covers_attachments() -> None:
+    cache = LLMResponseCache(MemoryCache())
+
+    def message(*attachments: str) -> HumanMessage:
+        return HumanMessage(content="Review this", additional_kwargs={"attachments": list(attachments)})
+
+    assert cache.key_for([message("a" * 64)], SCOPE) == cache.key_for([message("a" * 64)], SCOPE)
+    assert cache.key_for([message("a" * 64)], SCOPE) != cache.key_for([message("b" * 64)], SCOPE)
+    assert cache.key_for([message("a" * 64)], SCOPE) != cache.key_for([HumanMessage(content="Review this")], SCOPE)
+
+
+def test_restored_messages_get_a_fresh_id(tmp_path: Any) -> None:
+    cache = LLMResponseCache(MemoryCache(), SQLiteCache(str(tmp_path / "llm.sqlite")))
+    message = AIMessage(content="Hi!", id="run-1", usage_metadata={"input_tokens": 1, "output_tokens": 2, "total_tokens": 3})
+    cache.set_message("key", message)
+    cache.memory.clear()
+
+    restored = asyncio.run(cache.aget_message("key"))
+
+    assert restored.content == "Hi!" and restored.usage_metadata == message.usage_metadata
+    assert restored.id is None
+
+
+def test_cache_is_opt_in(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("LLM_CACHE", "false")
+    assert create_llm_cache() is None
+
+    monkeypatch.setenv("LLM_CACHE", "true")
+    monkeypatch.setenv("LLM_CACHE_BACKEND", "redis")
+    with pytest.raises(ValueError):
+        create_llm_cache()
+
+
+def test_repeated_turn_is_answered_from_the_cache(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    monkeypatch.setenv("LLM_CACHE", "true")
+    model = fake_model(CountingModel)
+    bot = make_bot(chat_model=model)
+
+    first = asyncio.run(bot.chat(ChatRequest(message="Hello")))
+    again = asyncio.run(bot.chat(ChatRequest(message="Hello")))
+    bot.chat_sync(ChatRequest(message="Hello"))
+
+    assert model.calls == 1
+    assert again.response == first.response
+    assert bot.llm_cache.stats()["hits"] == 2
+
+
+def test_bypass_cache_calls_the_model(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    monkeypatch.setenv("LLM_CACHE", "true")
+    model = fake_model(CountingModel)
+    bot = make_bot(chat_model=model)
+
+    asyncio.run(bot.chat(ChatRequest(message="Hello")))
+    asyncio.run(bot.chat(ChatRequest(message="Hello", bypass_cache=True)))
+    asyncio.run(bot.chat(ChatRequest(message="Hello again")))
+
+    assert model.calls == 3
@@ -0,0 +1,83 @@
+import asyncio
+from typing import Any, Dict
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.agent import ChatRequest
+from src.metrics import MetricsRegistry, _Metric
+
+
+def samples(text: str) -> Dict[str, str]:
+    """Sample lines of an exposition, by name and labels."""
+    lines = [line for line in text.splitlines() if line and not line.startswith("#")]
+    return dict(line.rsplit(" ", 1) for line in lines)
+
+
+def test_counters_and_gauges_render_per_label_set() -> None:
+    registry = MetricsRegistry()
+    tokens = registry.counter("tokens_total", "Tokens.", ["node", "type"])
+    in_flight = registry.gauge("in_flight", "Runs in progress.")
+    tokens.inc(3, node="chatbot", type="input")
+    tokens.inc(2, node="chatbot", type="input")
+    tokens.inc(0.5, node='say "hi"\n', type="output")
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    text = registry.render()
+
+    assert text.startswith("# HELP tokens_total Tokens.\n# TYPE tokens_total counter\n")
+    assert "# TYPE in_flight gauge" in text
+    assert samples(text) == {
+        'tokens_total{node="chatbot",type="input"}': "5",
+        'tokens_total{node="say \\"hi\\"\\n",type="output"}': "0.5",
+        "in_flight": "1",
+    }
+    assert text.endswith("\n")
+
+
+def test_histograms_render_cumulative_buckets() -> None:
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "Latency.", ["node"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value, node="tools")
+
+    assert samples(registry.render()) == {
+        'latency_seconds_bucket{node="tools",le="0.1"}': "1",
+        'latency_seconds_bucket{node="tools",le="1"}': "3",
+        'latency_seconds_bucket{node="tools",le="+Inf"}': "4",
+        'latency_seconds_sum{node="tools"}': "4.25",
+        'latency_seconds_count{node="tools"}': "4",
+    }
+
+
+def test_registering_a_name_twice_returns_the_first_metric() -> None:
+    registry = MetricsRegistry()
+
+    first = registry.counter("requests_total", "Requests.")
+
+    assert registry.counter("requests_total", "Requests.") is first
+
+
+def test_metric_types_must_render_their_samples() -> None:
+    with pytest.raises(TypeError):
+        _Metric("base", "Not a metric type.")
+
+
+def test_metrics_endpoint_exposes_graph_run_metrics(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    import main
+
+    bot = make_bot()
+    monkeypatch.setattr(main.chatbot, "_instance", bot)
+    asyncio.run(bot.chat(ChatRequest(message="Hello")))
+    client = TestClient(main.app)
+
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"] == "text/plain; version=0.0.4; charset=utf-8"
+    values = samples(response.text)
+    assert int(values['chatbot_node_duration_seconds_count{node="chatbot",status="ok"}']) >= 1
+    assert int(values['chatbot_graph_run_duration_seconds_count{status="ok"}']) >= 1
+    assert values['chatbot_requests_in_flight{endpoint="all"}'] == "0"
+    assert "# TYPE chatbot_llm_time_to_first_token_seconds histogram" in response.text
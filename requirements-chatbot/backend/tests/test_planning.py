@@ -0,0 +1,74 @@
+import asyncio
+from typing import Any, Dict, List
+
+import pytest
+from langchain_core.messages import AIMessageChunk, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from benchmarks.fakes import FakeGeminiChatModel
+from src.agent import ChatRequest
+from src.planning import PHASES, next_phase
+
+REQUIREMENTS = "# Todo app\n### Requirement 1: Login\nUsers log in."
+
+
+class PlanningModel(FakeGeminiChatModel):
+    """Approves on "Approved", otherwise writes a document; records each call's system prompt."""
+
+    # Shared with the test, so not validated (pydantic would copy a list)
+    prompts: Any = None
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        self.prompts.append(messages[0].content if isinstance(messages[0], SystemMessage) else None)
+        last = messages[-1]
+        if isinstance(last, HumanMessage) and last.content == "Approved":
+            return [AIMessageChunk(content="", tool_call_chunks=[{"name": "advance_phase", "args": "{}", "id": "advance-1", "index": 0}])]
+        if isinstance(last, ToolMessage):
+            return [AIMessageChunk(content="Which users need accounts?")]
+        return [AIMessageChunk(content=REQUIREMENTS)]
+
+
+@pytest.fixture
+def phased_bot(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> Any:
+    monkeypatch.setenv("CHATBOT_WORKFLOW", "phased")
+    return make_bot(chat_model=PlanningModel(latency=0.0, prompts=[]))
+
+
+def prefix(bot: Any, phase: str) -> str:
+    return bot.prompts.system_prefix(PHASES[phase].prompts)[0]
+
+
+def test_phases_follow_each_other() -> None:
+    assert next_phase("requirements") == "analysis"
+    assert next_phase("design") == "tasks"
+    assert next_phase("tasks") is None
+
+
+def test_new_threads_start_in_the_first_phase(phased_bot: Any) -> None:
+    response = asyncio.run(phased_bot.chat(ChatRequest(message="A todo app", thread_id="t")))
+
+    assert response.phase == "requirements"
+    assert phased_bot.chat_model.prompts == [prefix(phased_bot, "requirements")]
+
+
+def test_approval_continues_the_turn_in_the_next_phase(phased_bot: Any) -> None:
+    prompts = phased_bot.chat_model.prompts
+    asyncio.run(phased_bot.chat(ChatRequest(message="A todo app", thread_id="t")))
+
+    response = asyncio.run(phased_bot.chat(ChatRequest(message="Approved", thread_id="t")))
+    state = asyncio.run(phased_bot.threaded_graph.aget_state(phased_bot.store.config_for("t"))).values
+
+    assert response.phase == "analysis"
+    assert response.response == "Which users need accounts?"
+    assert prompts[1:] == [prefix(phased_bot, "requirements"), prefix(phased_bot, "analysis")]
+    assert [section["id"] for section in state["artifacts"]["requirements"]][-1] == "requirements/requirement-1-login"
+
+    # The thread stays in its phase on later turns
+    asyncio.run(phased_bot.chat(ChatRequest(message="Only me", thread_id="t")))
+    assert prompts[-1] == prefix(phased_bot, "analysis")
+
+
+def test_requests_can_pick_the_phase(phased_bot: Any) -> None:
+    response = asyncio.run(phased_bot.chat(ChatRequest(message="Plan the tasks", phase="tasks")))
+
+    assert response.phase == "tasks"
+    assert phased_bot.chat_model.prompts == [prefix(phased_bot, "tasks")]
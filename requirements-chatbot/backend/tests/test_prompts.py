@@ -0,0 +1,38 @@
+from typing import Any, Dict, List
+
+import pytest
+
+from src.prompts import GeminiContextCache, LocalContextCache, create_context_cache
+
+
+class RecordingGeminiCache(GeminiContextCache):
+    """GeminiContextCache recording creations instead of calling the API."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.created: List[str] = []
+
+    def create(self, model: str, system_instruction: str, tools: List[Dict[str, Any]]) -> str:
+        self.created.append(model)
+        return f"cachedContents/{len(self.created)}"
+
+
+def test_gemini_context_cache_is_the_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("PROMPT_CONTEXT_CACHE")
+
+    assert isinstance(create_context_cache(), GeminiContextCache)
+    assert isinstance(create_context_cache("local"), LocalContextCache)
+    assert create_context_cache("none") is None
+
+
+def test_prefixes_below_the_minimum_are_sent_inline() -> None:
+    cache = RecordingGeminiCache()
+    short, long = "x" * 400, "x" * 4 * 5000
+
+    assert cache.get_or_create("gemini-2.0-flash", short, "short") is None
+    assert cache.get_or_create("gemini-2.0-flash", short, "short") is None
+    assert cache.get_or_create("gemini-2.0-flash", long, "long") == "cachedContents/1"
+    # Gemini 2.5 Flash accepts smaller prefixes
+    assert cache.get_or_create("models/gemini-2.5-flash", "x" * 4 * 2000, "medium") == "cachedContents/2"
+    assert cache.created == ["gemini-2.0-flash", "models/gemini-2.5-flash"]
+    assert cache.failures == 0
@@ -0,0 +1,76 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from langchain_core.messages import AIMessageChunk, BaseMessage
+
+from benchmarks.fakes import FakeGeminiChatModel
+from src.agent import ChatRequest, ChatStreamRequest
+from tests.conftest import CountingModel, fake_model
+
+
+class FastModel(FakeGeminiChatModel):
+    """Fast route answering in two chunks, finishing with `finish_reason`."""
+
+    finish_reason: str = "STOP"
+    calls: int = 0
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        self.calls += 1
+        return [
+            AIMessageChunk(content="quick "),
+            AIMessageChunk(content="answer", response_metadata={"finish_reason": self.finish_reason}),
+        ]
+
+
+@pytest.fixture
+def auto_routing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("MODEL_ROUTING", "auto")
+
+
+def tokens(bot: Any, message: str = "hi", **request: Any) -> str:
+    async def run() -> List[dict]:
+        return [event async for event in bot.stream_events(ChatStreamRequest(message=message, **request))]
+
+    events = asyncio.run(run())
+    assert events[-1]["type"] == "done"
+    return "".join(event["content"] for event in events if event["type"] == "token")
+
+
+def test_escalated_answer_is_the_only_one_streamed(auto_routing: None, make_bot: Any) -> None:
+    strong = fake_model(response_tokens=4, tokens_per_chunk=1)
+    bot = make_bot(chat_model=strong, fast_chat_model=fake_model(FastModel, finish_reason="MAX_TOKENS"))
+
+    assert tokens(bot) == "word0 word1 word2 word3 "
+    assert bot.router.stats()["escalations"] == {"truncated": 1}
+
+
+def test_accepted_fast_answer_is_streamed_once(auto_routing: None, make_bot: Any) -> None:
+    bot = make_bot(fast_chat_model=fake_model(FastModel))
+
+    assert tokens(bot) == "quick answer"
+    assert asyncio.run(bot.chat(ChatRequest(message="hi"))).response == "quick answer"
+
+
+def test_complex_turns_go_to_the_strong_model(auto_routing: None, make_bot: Any) -> None:
+    bot = make_bot(chat_model=fake_model(response_tokens=2, tokens_per_chunk=1), fast_chat_model=fake_model(FastModel))
+
+    assert tokens(bot, "Please write a design document for the export service") == "word0 word1 "
+
+
+def test_answers_are_cached_under_the_route_that_gave_them(
+    monkeypatch: pytest.MonkeyPatch, auto_routing: None, make_bot: Any
+) -> None:
+    monkeypatch.setenv("LLM_CACHE", "true")
+    strong = fake_model(CountingModel, response_tokens=2, tokens_per_chunk=1)
+    fast = fake_model(FastModel, finish_reason="MAX_TOKENS")
+    bot = make_bot(chat_model=strong, fast_chat_model=fast)
+
+    escalated = tokens(bot)
+    again = tokens(bot)
+    fast_only = tokens(bot, model_route="fast")
+
+    # The escalated answer is found again on the strong route, never returned for the fast one
+    assert escalated == again == "word0 word1 "
+    assert fast_only == "quick answer"
+    assert (fast.calls, strong.calls) == (2, 1)
@@ -0,0 +1,149 @@
+import asyncio
+import json
+from typing import Any, Dict, List
+
+import pytest
+from langchain_core.messages import AIMessageChunk, BaseMessage
+
+from benchmarks.fakes import FakeGeminiChatModel
+from src.agent import ChatRequest
+from src.sections import SectionRegenerator, affected, apply_edit, link_sections, split_sections
+
+PHASES = ["requirements", "design", "tasks"]
+REQUIREMENTS = """# Todo app
+Intro.
+### Requirement 1: Login
+Users log in.
+1.1 WHEN the password is wrong THEN the system SHALL reject it
+### Requirement 2: Export
+Users export CSV."""
+DESIGN = """## Auth
+Implements Requirements: 1.1
+## Export service
+Covers REQ-2
+## Overview
+General notes."""
+TASKS = """## 1. Build login
+Implement the Auth component.
+## 2. Build export
+Implement the Export service."""
+
+
+class SectionModel(FakeGeminiChatModel):
+    """Answers a regeneration request with the section's heading and a marker."""
+
+    # Shared with the test, so not validated (pydantic would copy a list)
+    updated: Any = None
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        heading = str(messages[-1].content).split("Section to update:\n\n")[1].splitlines()[0]
+        self.updated.append(heading)
+        return [AIMessageChunk(content=f"{heading}\nUpdated.")]
+
+
+def plan() -> Dict[str, List[Dict[str, Any]]]:
+    requirements = link_sections(split_sections("requirements", REQUIREMENTS), [])
+    design = link_sections(split_sections("design", DESIGN), requirements)
+    return {
+        "requirements": requirements,
+        "design": design,
+        "tasks": link_sections(split_sections("tasks", TASKS), design),
+    }
+
+
+def ids(sections: List[Dict[str, Any]]) -> List[str]:
+    return [section["id"] for section in sections]
+
+
+def test_documents_split_at_headings() -> None:
+    text = "Intro.\n# Plan\n```\n# not a heading\n```\n## Step\na\n## Step\nb"
+
+    sections = split_sections("design", text)
+
+    assert ids(sections) == ["design/preamble", "design/plan", "design/step", "design/step-2"]
+    assert "# not a heading" in sections[1]["text"]
+    assert [section["ref"] for section in split_sections("requirements", REQUIREMENTS)] == [None, "1", "2"]
+
+
+def test_sections_depend_on_what_they_cite() -> None:
+    artifacts = plan()
+    deps = {section["id"]: list(section["deps"]) for section in artifacts["design"] + artifacts["tasks"]}
+
+    # "1.1" is an acceptance criterion of requirement 1
+    assert deps["design/auth"] == ["requirements/requirement-1-login"]
+    assert deps["design/export-service"] == ["requirements/requirement-2-export"]
+    # Nothing recognizable: every upstream section
+    assert deps["design/overview"] == ids(artifacts["requirements"])
+    assert deps["tasks/1-build-login"] == ["design/auth"]
+
+
+def test_edits_mark_only_dependent_sections_stale() -> None:
+    artifacts = plan()
+    regenerator = SectionRegenerator(SectionModel(updated=[]), PHASES)
+    assert not regenerator.stale(artifacts)
+
+    edited = apply_edit(artifacts, "requirements/requirement-2-export", "### Requirement 2: Export\nUsers export JSON.")
+
+    assert regenerator.stale(edited)
+    assert affected(edited, ["requirements/requirement-2-export"]) == [
+        "design/export-service", "design/overview", "tasks/2-build-export",
+    ]
+    with pytest.raises(KeyError):
+        apply_edit(artifacts, "requirements/nope", "x")
+
+
+@pytest.mark.parametrize("run", ["sync", "async"])
+def test_regeneration_rewrites_dependents_in_phase_order(run: str) -> None:
+    updated: List[str] = []
+    regenerator = SectionRegenerator(SectionModel(latency=0.0, updated=updated), PHASES)
+    edited = apply_edit(plan(), "requirements/requirement-1-login", "### Requirement 1: Login\nUsers log in with SSO.")
+
+    def regenerate(artifacts: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+        return regenerator.regenerate(artifacts) if run == "sync" else asyncio.run(regenerator.aregenerate(artifacts))
+
+    result = regenerate(edited)
+
+    assert sorted(updated) == ["## 1. Build login", "## Auth", "## Overview"]
+    texts = {section["id"]: section["text"] for sections in result.values() for section in sections}
+    assert texts["design/auth"] == "## Auth\nUpdated."
+    assert texts["design/export-service"] == "## Export service\nCovers REQ-2"
+    assert texts["tasks/2-build-export"].endswith("Implement the Export service.")
+    assert not regenerator.stale(result)
+
+    # The same edit again is answered from the cache
+    regenerate(edited)
+    assert len(updated) == 3
+    assert regenerator.stats() == {"regenerated": 3, "reused": 3, "cached": 3}
+
+
+class EditingModel(SectionModel):
+    """Chat model of a phased bot: edits a requirement when asked, regenerates sections, else says "ok"."""
+
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        last = str(messages[-1].content)
+        if "Section to update:" in last:
+            return super()._chunks(messages)
+        if last.startswith("Use SSO"):
+            args = json.dumps({"section_id": "requirements/requirement-1-login", "text": "### Requirement 1: Login\nUsers log in with SSO."})
+            return [AIMessageChunk(content="", tool_call_chunks=[{"name": "edit_section", "args": args, "id": "edit-1", "index": 0}])]
+        return [AIMessageChunk(content="ok")]
+
+
+def test_edit_section_regenerates_the_plan(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    monkeypatch.setenv("CHATBOT_WORKFLOW", "phased")
+    updated: List[str] = []
+    bot = make_bot(chat_model=EditingModel(latency=0.0, updated=updated))
+    config = bot.store.config_for("plan")
+
+    async def run() -> Dict[str, Any]:
+        await bot.threaded_graph.aupdate_state(config, {"artifacts": plan(), "phase": "tasks"})
+        await bot.chat(ChatRequest(message="Use SSO for login", thread_id="plan"))
+        return (await bot.threaded_graph.aget_state(config)).values
+
+    state = asyncio.run(run())
+
+    texts = {section["id"]: section["text"] for sections in state["artifacts"].values() for section in sections}
+    assert texts["requirements/requirement-1-login"].endswith("with SSO.")
+    assert sorted(updated) == ["## 1. Build login", "## Auth", "## Overview"]
+    assert texts["tasks/1-build-login"] == "## 1. Build login\nUpdated."
+    assert not bot.sections.stale(state["artifacts"])
@@ -0,0 +1,53 @@
+import datetime
+import enum
+import json
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.serializer_benchmark import build_payloads, legacy_serialize_value
+from src.serializer import serialize
+
+
+class Phase(enum.Enum):
+    DESIGN = "design"
+
+
+def test_non_str_keys_are_written_like_json() -> None:
+    value = {7: "a", 2.5: "b", True: {None: "c"}}
+
+    assert serialize(value) == json.loads(json.dumps(value)) == {"7": "a", "2.5": "b", "true": {"null": "c"}}
+    assert serialize({Phase.DESIGN: "d"}) == {"Phase.DESIGN": "d"}
+
+
+def test_messages_keep_tool_calls_and_ids() -> None:
+    call = {"name": "search", "args": {"query": "EARS", "limit": 3}, "id": "call-1"}
+    ai, tool = serialize([AIMessage(content="", tool_calls=[call]), ToolMessage(content="r", tool_call_id="call-1", name="search")])
+
+    assert ai["type"] == "AIMessage" and ai["role"] == "ai"
+    assert ai["tool_calls"] == [call]
+    assert (tool["tool_call_id"], tool["name"]) == ("call-1", "search")
+    assert serialize(HumanMessage(content=[{"type": "text", "text": "hi"}]))["content"] == [{"type": "text", "text": "hi"}]
+
+
+def test_other_values_are_json_safe() -> None:
+    when = datetime.datetime(2026, 1, 2, 3, 4, 5)
+    run_id = uuid.uuid4()
+
+    assert serialize({"at": when, "id": run_id, "tags": {"a"}, "phase": Phase.DESIGN, "pair": (1, 2)}) == {
+        "at": when.isoformat(),
+        "id": str(run_id),
+        "tags": ["a"],
+        "phase": "design",
+        "pair": [1, 2],
+    }
+    assert serialize(len) == "<function: len>"
+
+
+def test_output_extends_the_legacy_output() -> None:
+    for name, payload in build_payloads(2).items():
+        legacy, encoded = legacy_serialize_value(payload), serialize(payload)
+        json.dumps(encoded)
+        assert encoded.keys() == legacy.keys(), name
+        for old, new in zip(legacy["messages"], encoded["messages"]):
+            assert old.items() <= new.items()
@@ -0,0 +1,95 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+import pytest
+
+from src.sse import HEARTBEAT_FRAME, SSEStream
+
+
+async def events(*items: Any) -> AsyncIterator[Dict[str, Any]]:
+    """Yield the event dicts; a number sleeps that many seconds instead."""
+    for item in items:
+        if isinstance(item, (int, float)):
+            await asyncio.sleep(item)
+        else:
+            yield item
+
+
+def collect(stream: SSEStream) -> List[str]:
+    async def run() -> List[str]:
+        return [frame async for frame in stream]
+
+    return asyncio.run(run())
+
+
+def parse(frame: str) -> Tuple[int, Dict[str, Any]]:
+    id_line, data_line = frame.strip().split("\n")
+    return int(id_line.removeprefix("id: ")), json.loads(data_line.removeprefix("data: "))
+
+
+def token(content: str) -> Dict[str, Any]:
+    return {"type": "token", "content": content}
+
+
+def test_tokens_are_coalesced_after_the_first() -> None:
+    stream = SSEStream(
+        events(token("Hel"), token("lo"), token(" wor"), token("ld"), {"type": "done"}),
+        flush_interval=10, flush_bytes=1024, heartbeat_interval=0,
+    )
+
+    frames = [parse(frame) for frame in collect(stream)]
+
+    assert frames == [
+        (1, token("Hel")),
+        (2, token("lo world")),
+        (3, {"type": "done"}),
+    ]
+
+
+def test_buffer_is_flushed_at_the_byte_limit_and_at_the_end() -> None:
+    stream = SSEStream(
+        events(token("a"), token("bc"), token("de"), token("f")),
+        flush_interval=10, flush_bytes=4, heartbeat_interval=0,
+    )
+
+    contents = [parse(frame)[1]["content"] for frame in collect(stream)]
+
+    assert contents == ["a", "bcde", "f"]
+    assert stream.frames == 3
+
+
+def test_buffer_is_flushed_after_the_interval() -> None:
+    stream = SSEStream(
+        events(token("a"), token("b"), 0.1, token("c")),
+        flush_interval=0.02, flush_bytes=1024, heartbeat_interval=0,
+    )
+
+    contents = [parse(frame)[1]["content"] for frame in collect(stream)]
+
+    assert contents == ["a", "b", "c"]
+
+
+def test_idle_stream_sends_heartbeats() -> None:
+    stream = SSEStream(
+        events(token("a"), 0.25, {"type": "done"}),
+        flush_interval=0.01, flush_bytes=1024, heartbeat_interval=0.05,
+    )
+
+    frames = collect(stream)
+
+    heartbeats = [frame for frame in frames if frame == HEARTBEAT_FRAME]
+    assert len(heartbeats) >= 2
+    assert parse(frames[0])[1] == token("a")
+    assert parse(frames[-1]) == (2, {"type": "done"})
+
+
+def test_errors_from_the_run_are_raised() -> None:
+    async def failing() -> AsyncIterator[Dict[str, Any]]:
+        yield token("a")
+        raise RuntimeError("boom")
+
+    stream = SSEStream(failing(), flush_interval=10, flush_bytes=1024, heartbeat_interval=0)
+
+    with pytest.raises(RuntimeError, match="boom"):
+        collect(stream)
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+import time
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.startup import LazyInstance, StartupTimer
+
+
+def test_timer_adds_up_repeated_phases() -> None:
+    timer = StartupTimer()
+
+    for _ in range(2):
+        with timer.phase("clients"):
+            time.sleep(0.01)
+    with pytest.raises(ValueError):
+        with timer.phase("graph_compile"):
+            raise ValueError("broken")
+
+    report = timer.report()
+    assert set(report["phases"]) == {"clients", "graph_compile"}
+    assert report["phases"]["clients"] >= 0.02
+    assert report["total_seconds"] == pytest.approx(sum(timer.phases.values()), abs=1e-3)
+
+
+def test_concurrent_first_uses_build_once() -> None:
+    builds = []
+
+    def factory(timer: StartupTimer) -> object:
+        with timer.phase("build"):
+            builds.append(threading.get_ident())
+            time.sleep(0.05)
+        return object()
+
+    lazy = LazyInstance(factory)
+    assert lazy.report()["ready"] is False
+
+    async def run() -> list:
+        return await asyncio.gather(*(lazy.aget() for _ in range(4)))
+
+    instances = asyncio.run(run())
+
+    assert len(builds) == 1
+    assert all(instance is instances[0] for instance in instances)
+    assert lazy.report()["ready"] is True
+    assert lazy.report()["phases"]["build"] >= 0.05
+
+
+def test_failed_warmup_is_retried_on_first_use() -> None:
+    attempts = []
+
+    def factory(timer: StartupTimer) -> str:
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("provider unavailable")
+        return "chatbot"
+
+    lazy = LazyInstance(factory)
+    asyncio.run(lazy.warmup())
+
+    assert not lazy.ready
+    assert lazy.get() == "chatbot"
+    assert len(attempts) == 2
+
+
+def test_startup_endpoint_reports_the_chatbot_phases(monkeypatch: pytest.MonkeyPatch, make_bot: Any) -> None:
+    import main
+
+    timer = StartupTimer()
+    timer.phases["app_import"] = 0.5
+    lazy = LazyInstance(lambda timer: make_bot(timer=timer), timer)
+    monkeypatch.setattr(main, "chatbot", lazy)
+    client = TestClient(main.app)
+
+    assert client.get("/startup").json() == {"ready": False, "phases": {"app_import": 0.5}, "total_seconds": 0.5}
+
+    lazy.get()
+    report = client.get("/startup").json()
+
+    assert report["ready"] is True
+    assert {"app_import", "import", "clients", "graph_compile"} <= set(report["phases"])
+    assert report["total_seconds"] == pytest.approx(sum(report["phases"].values()), abs=1e-3)
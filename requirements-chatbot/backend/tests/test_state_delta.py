@@ -0,0 +1,87 @@
+import asyncio
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.agent import ChatStreamRequest
+from src.serializer import serialize
+from src.state_delta import StateDeltaEncoder
+
+
+def apply(state: Dict[str, Any], frame: Dict[str, Any]) -> Dict[str, Any]:
+    """Client-side rebuild, as in the API documentation."""
+    if frame["type"] == "snapshot":
+        return dict(frame["content"])
+    messages = state["messages"][:frame["messages"]["start"]] + frame["messages"]["items"]
+    return {**state, **frame["fields"], "messages": messages}
+
+
+def states() -> List[Dict[str, Any]]:
+    human = HumanMessage(content="Plan a todo app", id="h1")
+    call = AIMessage(content="", id="a1", tool_calls=[{"name": "search", "args": {"query": "todo"}, "id": "c1"}])
+    result = ToolMessage(content="results", tool_call_id="c1", id="t1")
+    return [
+        {"messages": [human], "summary": "", "summary_upto": 0},
+        {"messages": [human, call], "summary": "", "summary_upto": 0},
+        {"messages": [human, call, result], "summary": "", "summary_upto": 0},
+        # A message replaced in place, and a changed field
+        {"messages": [human, call, result.model_copy(update={"content": "better results"})], "summary": "s", "summary_upto": 0},
+        {"messages": [human, call, result, AIMessage(content="Done", id="a2")], "summary": "s", "summary_upto": 1},
+    ]
+
+
+def test_deltas_rebuild_every_state() -> None:
+    encoder = StateDeltaEncoder()
+    rebuilt: Dict[str, Any] = {}
+
+    for seq, state in enumerate(states(), start=1):
+        frame = encoder.encode(state)
+        assert frame["seq"] == seq
+        rebuilt = apply(rebuilt, frame)
+        assert frame["type"] == ("snapshot" if seq == 1 else "delta")
+        assert rebuilt == serialize(state)
+
+
+def test_deltas_only_carry_changes() -> None:
+    encoder = StateDeltaEncoder()
+    history = states()
+    encoder.encode(history[0])
+    encoder.encode(history[1])
+
+    frame = encoder.encode(history[2])
+
+    assert frame["type"] == "delta"
+    assert frame["messages"]["start"] == 2
+    assert [item["content"] for item in frame["messages"]["items"]] == ["results"]
+    assert frame["fields"] == {}
+    assert encoder.encode(history[3])["fields"] == {"summary": "s"}
+
+
+def test_periodic_snapshots() -> None:
+    encoder = StateDeltaEncoder(snapshot_interval=2)
+
+    types = [encoder.encode(state)["type"] for state in states()]
+
+    assert types == ["snapshot", "delta", "snapshot", "delta", "snapshot"]
+
+
+def test_stream_rebuilds_the_thread_state_and_snapshot_resumes(make_bot: Any) -> None:
+    bot = make_bot()
+
+    async def run() -> List[Dict[str, Any]]:
+        request = ChatStreamRequest(message="Hello", thread_id="t", stream_mode="deltas")
+        return [event async for event in bot.stream_events(request)]
+
+    events = asyncio.run(run())
+    done = events.pop()
+    rebuilt: Dict[str, Any] = {}
+    for frame in events:
+        rebuilt = apply(rebuilt, frame)
+
+    snapshot = asyncio.run(bot.thread_snapshot("t"))
+
+    assert done["type"] == "done" and done["seq"] == events[-1]["seq"]
+    assert snapshot["seq"] == done["seq"]
+    assert rebuilt["messages"] == snapshot["content"]["messages"]
+    assert [message["type"] for message in rebuilt["messages"]] == ["HumanMessage", "AIMessage"]
+    assert asyncio.run(bot.thread_snapshot("unknown")) is None
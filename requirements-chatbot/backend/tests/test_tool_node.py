@@ -0,0 +1,82 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from src.graph_node import BasicToolNode
+
+running = 0
+peak = 0
+
+
+@tool
+async def wait(seconds: float) -> str:
+    """Wait, then say how long."""
+    global running, peak
+    running += 1
+    peak = max(peak, running)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        running -= 1
+    return f"waited {seconds}"
+
+
+@tool
+async def fail(reason: str) -> str:
+    """Always fails."""
+    raise RuntimeError(reason)
+
+
+def turn(*calls: Dict[str, Any]) -> dict:
+    tool_calls = [{"name": call["name"], "args": call["args"], "id": f"call-{index}"} for index, call in enumerate(calls)]
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+
+def run(node: BasicToolNode, inputs: dict) -> List[Any]:
+    global peak
+    peak = 0
+    return asyncio.run(node.acall(inputs))["messages"]
+
+
+def test_tools_run_concurrently_and_keep_call_order() -> None:
+    node = BasicToolNode([wait])
+    started = time.perf_counter()
+
+    messages = run(node, turn(*({"name": "wait", "args": {"seconds": s}} for s in (0.2, 0.05, 0.1))))
+
+    assert time.perf_counter() - started < 0.3
+    assert [m.tool_call_id for m in messages] == ["call-0", "call-1", "call-2"]
+    assert [json.loads(m.content) for m in messages] == ["waited 0.2", "waited 0.05", "waited 0.1"]
+    assert peak == 3
+
+
+def test_max_concurrency_bounds_running_tools() -> None:
+    node = BasicToolNode([wait], max_concurrency=2)
+
+    run(node, turn(*({"name": "wait", "args": {"seconds": 0.02}} for _ in range(5))))
+
+    assert peak == 2
+
+
+def test_per_tool_timeout_gives_an_error_message() -> None:
+    node = BasicToolNode([wait], timeout=5.0, timeouts={"wait": 0.05})
+
+    slow, fast = run(node, turn({"name": "wait", "args": {"seconds": 1.0}}, {"name": "wait", "args": {"seconds": 0.0}}))
+
+    assert slow.status == "error"
+    assert json.loads(slow.content)["error"] == "timeout"
+    assert fast.status == "success"
+
+
+def test_failures_become_error_tool_messages() -> None:
+    node = BasicToolNode([fail])
+
+    failed, unknown = run(node, turn({"name": "fail", "args": {"reason": "quota"}}, {"name": "nope", "args": {}}))
+
+    assert (failed.status, json.loads(failed.content)) == ("error", {"error": "tool_error", "detail": "quota"})
+    assert json.loads(unknown.content)["error"] == "unknown_tool"
+    assert unknown.tool_call_id == "call-1"
@@ -0,0 +1,132 @@
+import asyncio
+from typing import Any, Iterator, List, Tuple
+from unittest.mock import MagicMock
+
+import pytest
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langsmith import tracing_context
+
+from benchmarks.fakes import FakeGeminiChatModel
+from src import gemini_langsmith_wrapper
+from src.agent import ChatRequest, ChatStreamRequest
+from src.gemini_langsmith_wrapper import TraceExporter, TraceSampler
+from src.prompts import LocalContextCache
+from tests.conftest import fake_model
+
+
+@pytest.fixture
+def langsmith(monkeypatch: pytest.MonkeyPatch) -> Iterator[Tuple[MagicMock, TraceExporter]]:
+    """Tracing on, with a client and an exporter that record the runs instead of sending them."""
+    client = MagicMock()
+    exporter = TraceExporter(client=client)
+    exporter._start = lambda: None
+    monkeypatch.setattr(gemini_langsmith_wrapper, "_default_exporter", exporter)
+    with tracing_context(enabled=True, client=client):
+        yield client, exporter
+
+
+def traced_runs(client: MagicMock, exporter: TraceExporter) -> int:
+    return client.create_run.call_count + client.update_run.call_count + exporter.queue.qsize()
+
+
+async def stream(bot: Any, request: ChatStreamRequest) -> list:
+    return [event async for event in bot.stream_events(request)]
+
+
+def test_sampled_request_is_traced(langsmith: Tuple[MagicMock, TraceExporter], make_bot: Any) -> None:
+    client, exporter = langsmith
+    bot = make_bot()
+
+    asyncio.run(bot.chat(ChatRequest(message="hi")))
+
+    assert client.create_run.called
+    # The graph calls the wrapped, tool-bound model, so the Gemini wrapper traces it too
+    assert exporter.queue.qsize() == 1
+
+
+def test_provider_cached_calls_are_traced(langsmith: Tuple[MagicMock, TraceExporter], make_bot: Any) -> None:
+    client, exporter = langsmith
+    context_cache = LocalContextCache()
+    bot = make_bot(context_cache=context_cache)
+
+    asyncio.run(bot.chat(ChatRequest(message="hi")))
+
+    record = exporter.queue.get_nowait()
+    assert context_cache.creates == 1
+    assert record["inputs"]["cached_content"] == "cachedContents/local-0"
+
+
+def test_opted_out_request_produces_no_trace(langsmith: Tuple[MagicMock, TraceExporter], make_bot: Any) -> None:
+    bot = make_bot()
+
+    asyncio.run(bot.chat(ChatRequest(message="hi", trace=False)))
+    bot.chat_sync(ChatRequest(message="hi", trace=False))
+
+    assert traced_runs(*langsmith) == 0
+
+
+@pytest.mark.parametrize("stream_mode", ["messages", "updates"])
+def test_unsampled_stream_produces_no_trace(
+    langsmith: Tuple[MagicMock, TraceExporter], make_bot: Any, monkeypatch: pytest.MonkeyPatch, stream_mode: str
+) -> None:
+    monkeypatch.setenv("GEMINI_TRACE_SAMPLE_RATE", "0")
+    bot = make_bot()
+
+    events = asyncio.run(stream(bot, ChatStreamRequest(message="hi", stream_mode=stream_mode)))
+
+    assert events[-1]["type"] == "done"
+    assert traced_runs(*langsmith) == 0
+
+
+def test_sampler_traces_failed_and_slow_calls() -> None:
+    sampler = TraceSampler(rate=0.0, slow_seconds=5.0)
+
+    assert not sampler.sample()
+    assert sampler.should_trace(0.1, None, sampled=True)
+    assert not sampler.should_trace(0.1, None, sampled=False)
+    assert sampler.should_trace(0.1, RuntimeError("failed"), sampled=False)
+    assert sampler.should_trace(6.0, None, sampled=False)
+
+
+class FailingModel(FakeGeminiChatModel):
+    def _chunks(self, messages: List[BaseMessage]) -> List[AIMessageChunk]:
+        raise RuntimeError("quota exceeded")
+
+
+@pytest.mark.parametrize("stream_mode", ["messages", "updates"])
+def test_slow_calls_of_unsampled_requests_are_traced(
+    langsmith: Tuple[MagicMock, TraceExporter], make_bot: Any, monkeypatch: pytest.MonkeyPatch, stream_mode: str
+) -> None:
+    client, exporter = langsmith
+    monkeypatch.setenv("GEMINI_TRACE_SAMPLE_RATE", "0")
+    monkeypatch.setenv("GEMINI_TRACE_SLOW_SECONDS", "0.05")
+    bot = make_bot(chat_model=fake_model(latency=0.1))
+
+    events = asyncio.run(stream(bot, ChatStreamRequest(message="hi", stream_mode=stream_mode)))
+
+    assert events[-1]["type"] == "done"
+    # Only the slow model call, on its own: the graph run was not sampled
+    assert not client.create_run.called
+    record = exporter.queue.get_nowait()
+    assert exporter.queue.empty()
+    assert record["parent"] is None and not record["sampled"]
+    assert record["output"].content
+    assert record["error"] is None
+
+
+def test_failed_calls_of_unsampled_requests_are_traced(
+    langsmith: Tuple[MagicMock, TraceExporter], make_bot: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    client, exporter = langsmith
+    monkeypatch.setenv("GEMINI_TRACE_SAMPLE_RATE", "0")
+    bot = make_bot(chat_model=fake_model(FailingModel))
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(bot.chat(ChatRequest(message="hi")))
+    with pytest.raises(RuntimeError):
+        asyncio.run(bot.chat(ChatRequest(message="hi", trace=False)))
+
+    assert not client.create_run.called
+    record = exporter.queue.get_nowait()
+    assert exporter.queue.empty()
+    assert record["error"] == "RuntimeError: quota exceeded"